@@ -1,66 +1,106 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+"""AgriDrain web app: routes, template filters and CLI commands on one blueprint.
+
+``create_app()`` builds an app from it. Flask's CLI finds the factory
+(``FLASK_APP=app.py flask ...``) and wsgi.py calls it for production servers;
+``python app.py`` runs the development server. Building an app never opens
+the database except to migrate it, which ``AUTO_MIGRATE`` turns off for
+servers that migrate once before starting workers (see gunicorn.conf.py).
+"""
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, session, flash, jsonify, Response, abort
+import click
 import sqlite3, os
-from datetime import datetime
-
-app = Flask(__name__)
-app.secret_key = "secret123"
-
-
-# --- Database Setup ---
-def get_db():
-    conn = sqlite3.connect("agri_drain.db")
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def init_db():
-    conn = get_db()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS farmers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            mobile TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    """)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    """)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS farmer_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            soil_type TEXT,
-            water_level TEXT,
-            crop TEXT,
-            farm_address TEXT,
-            latitude REAL,
-            longitude REAL,
-            created_at TEXT,
-            feedback TEXT,
-            recommendation TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-
-# Initialize database
-init_db()
+import secrets
+from datetime import date, datetime, timedelta
+
+import archive
+import assets
+import bulkops
+import db
+import exports
+import feedback
+import geo
+import imports
+import knowledge
+import maps
+import metrics
+import migrations
+import pages
+import registry
+import reporting
+import rollups
+import schedules
+import scoring
+import search
+import snapshots
+import trends
+import writebehind
+from db import get_db
+
+bp = Blueprint('main', __name__, cli_group=None)
+
+DEFAULT_CONFIG = {
+    # Off for pre-fork servers: the master (or a deploy step) migrates once instead
+    'AUTO_MIGRATE': os.environ.get('AGRIDRAIN_AUTO_MIGRATE', '1') != '0',
+}
+SECRET_KEY_FILE = 'secret_key'
+
+
+# --- App Factory ---
+def create_app(config=None):
+    """Build the app; ``config`` overrides the defaults of every subsystem."""
+    app = Flask(__name__)
+    app.config.update(config or {})
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = os.environ.get('AGRIDRAIN_SECRET_KEY') or load_secret_key(app.instance_path)
+
+    db.init_app(app)
+    metrics.init_app(app)
+    archive.init_app(app)
+    assets.init_app(app)
+    writebehind.init_app(app)
+    pages.init_app(app)
+    reporting.init_app(app)
+    app.register_blueprint(bp)
+
+    # Bring the schema up to date (safe to run against existing agri_drain.db files)
+    if app.config['AUTO_MIGRATE']:
+        migrations.migrate_database(app.config['DATABASE'])
+    return app
+
+
+def load_secret_key(instance_path):
+    """Session signing key kept in the instance folder, created on first use.
+
+    Every worker process of a deployment must sign sessions with the same key,
+    so a random per-process key will not do. The file is published with an
+    atomic link, so workers starting together all read the same key.
+    """
+    path = os.path.join(instance_path, SECRET_KEY_FILE)
+    if not os.path.exists(path):
+        os.makedirs(instance_path, exist_ok=True)
+        staging = f"{path}.{os.getpid()}"
+        with open(os.open(staging, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(staging, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(staging)
+    with open(path) as f:
+        return f.read().strip()
 
 
 # --- Home ---
-@app.route('/')
+@bp.route('/')
 def home():
-    return render_template('index.html')
+    return pages.serve('index.html')
 
 
 # --- Farmer Registration ---
-@app.route('/farmer_register', methods=['GET', 'POST'])
+@bp.route('/farmer_register', methods=['GET', 'POST'])
 def farmer_register():
     if request.method == 'POST':
         name = request.form['name']
@@ -75,15 +115,13 @@ def farmer_register():
             message = "✅ Registration successful! Please log in."
         except sqlite3.IntegrityError:
             message = "⚠️ Mobile number already registered!"
-        finally:
-            conn.close()
 
         return render_template('farmer_register.html', message=message)
     return render_template('farmer_register.html')
 
 
 # --- Farmer Login ---
-@app.route('/farmer_login', methods=['GET', 'POST'])
+@bp.route('/farmer_login', methods=['GET', 'POST'])
 def farmer_login():
     if request.method == 'POST':
         name = request.form['name']
@@ -92,12 +130,12 @@ def farmer_login():
         conn = get_db()
         farmer = conn.execute("SELECT * FROM farmers WHERE name=? AND password=?",
                               (name, password)).fetchone()
-        conn.close()
 
         if farmer:
             session['farmer_logged_in'] = True
+            session['farmer_id'] = farmer['id']
             session['farmer_name'] = farmer['name']
-            return redirect(url_for('farmer'))
+            return redirect(url_for('main.farmer'))
         else:
             return render_template('farmer_login.html', error="Invalid credentials")
 
@@ -105,7 +143,7 @@ def farmer_login():
 
 
 # --- Admin Registration ---
-@app.route('/admin_register', methods=['GET', 'POST'])
+@bp.route('/admin_register', methods=['GET', 'POST'])
 def admin_register():
     if request.method == 'POST':
         username = request.form['username']
@@ -119,15 +157,13 @@ def admin_register():
             message = "✅ Admin registered successfully!"
         except sqlite3.IntegrityError:
             message = "⚠️ Username already exists!"
-        finally:
-            conn.close()
 
         return render_template('admin_register.html', message=message)
     return render_template('admin_register.html')
 
 
 # --- Admin Login ---
-@app.route('/admin_login', methods=['GET', 'POST'])
+@bp.route('/admin_login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form['username']
@@ -136,12 +172,11 @@ def admin_login():
         conn = get_db()
         admin = conn.execute("SELECT * FROM admins WHERE username=? AND password=?",
                              (username, password)).fetchone()
-        conn.close()
 
         if admin:
             session['admin_logged_in'] = True
             session['admin_name'] = admin['username']
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             return render_template('admin_login.html', error="Invalid credentials")
 
@@ -149,32 +184,51 @@ def admin_login():
 
 
 # -- Farmer Data ---
-@app.route("/farmer_data")
+@bp.route("/farmer_data")
 def farmer_data():
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
+
+    q = request.args.get('q', '').strip()
+    sort = request.args.get('sort', registry.DEFAULT_SORT)
+    if sort not in registry.SORTS:
+        sort = registry.DEFAULT_SORT
+    descending = request.args.get('order', 'asc') == 'desc'
+    per_page = request.args.get('per_page', registry.PER_PAGE, type=int)
 
     conn = get_db()
-    farmers = conn.execute("SELECT id, name, mobile, password FROM farmers").fetchall()
-    conn.close()
-    return render_template("farmer_data.html", farmers=farmers)
+    page = registry.fetch_page(conn, sort, descending, before=request.args.get('before', type=int),
+                               after=request.args.get('after', type=int), per_page=per_page, q=q)
+    return render_template(
+        "farmer_data.html",
+        farmers=page['rows'],
+        next_cursor=page['next_cursor'],
+        prev_cursor=page['prev_cursor'],
+        total=registry.get_total(conn, q),
+        sort=sort,
+        order='desc' if descending else 'asc',
+        q=q
+    )
 
-@app.route("/farmer", methods=["GET", "POST"])
+@bp.route("/farmer", methods=["GET", "POST"])
 def farmer():
     conn = get_db()
 
     # 🚫 Admin should never access this page
     if session.get("admin_logged_in"):
-        conn.close()
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
 
     # 🚫 Guests must log in first
     if not session.get("farmer_logged_in"):
-        conn.close()
-        return redirect(url_for("farmer_login"))
+        return redirect(url_for("main.farmer_login"))
 
     # ✅ If farmer logged in, show the page
     farmer_name = session["farmer_name"]
+    farmer_id = session.get("farmer_id")
+    if farmer_id is None:
+        # Sessions from before submissions were linked by id
+        row = conn.execute("SELECT MIN(id) FROM farmers WHERE name = ?", (farmer_name,)).fetchone()
+        farmer_id = session['farmer_id'] = row[0]
     message = None
     soil = ''
     water = ''
@@ -185,26 +239,32 @@ def farmer():
         water = request.form["water"]
         crop = request.form["crop"]
         farm_address = request.form.get("farm_address", "")
-        latitude = request.form.get("latitude", "")
-        longitude = request.form.get("longitude", "")
+        # Blank or invalid coordinates are stored as NULL, never as ''
+        latitude, longitude = geo.parse_lat_lon(request.form.get("latitude"), request.form.get("longitude"))
         created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # The suggestion page reads this stored payload, not the session
+        snapshot = snapshots.store(conn, soil, water, crop)
 
-        # Store in session for the suggestion page
-        session['soil_type'] = soil
-        session['water_level'] = water
-        session['selected_crop'] = crop
-        session['farm_address'] = farm_address
-        session['latitude'] = latitude
-        session['longitude'] = longitude
-
-        conn.execute("""
-            INSERT INTO farmer_data (name, soil_type, water_level, crop, farm_address, latitude, longitude, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (farmer_name, soil, water, crop, farm_address, latitude, longitude, created_at))
-        conn.commit()
+        row = (farmer_id, farmer_name, soil, water, crop, farm_address, latitude, longitude, created_at, snapshot)
+        if writebehind.enabled():
+            # Group-committed by the background writer (see writebehind.py)
+            try:
+                submission_id = writebehind.submit(row)
+            except (writebehind.QueueFull, writebehind.QueueClosed, TimeoutError):
+                message = "⚠️ The server is busy right now, please submit again in a moment."
+                return render_template("farmer.html", message=message, name=farmer_name,
+                                       soil=soil, water=water, crop=crop), 503, {'Retry-After': '2'}
+            except sqlite3.Error:
+                message = "⚠️ Your data could not be saved, please try again."
+                return render_template("farmer.html", message=message, name=farmer_name,
+                                       soil=soil, water=water, crop=crop), 500
+        else:
+            submission_id = conn.execute(writebehind.INSERT_SUBMISSION, row).lastrowid
+            conn.commit()
+        # None in the 'queued' ack mode; /suggestion then shows the newest submission
+        session['submission_id'] = submission_id
         message = "✅ Data submitted successfully!"
 
-    conn.close()
     return render_template(
         "farmer.html",
         message=message,
@@ -214,93 +274,267 @@ def farmer():
         crop=crop
     )
 
-# --- Admin Dashboard (Shows all farmer data including location) ---
-@app.route('/dashboard')
+# --- Admin Dashboard (Shows farmer data including location, one page at a time) ---
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 200
+DASHBOARD_FILTERS = ('crop', 'soil_type', 'water_level', 'date_from', 'date_to')
+
+
+def get_dashboard_filters(args):
+    """Read the dashboard filters from the query string, dropping empty values."""
+    return {key: args.get(key, '').strip() for key in DASHBOARD_FILTERS if args.get(key, '').strip()}
+
+
+def build_submission_filter(filters, alias='fd'):
+    """Turn dashboard filters into a WHERE clause and its parameters."""
+    clauses = [f"{alias}.crop IS NOT NULL", f"{alias}.crop != ''"]
+    params = []
+    for column in ('crop', 'soil_type', 'water_level'):
+        if filters.get(column):
+            clauses.append(f"{alias}.{column} = ?")
+            params.append(filters[column])
+    if filters.get('date_from'):
+        clauses.append(f"{alias}.created_at >= ?")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        # date_to is inclusive, so compare against the start of the next day
+        clauses.append(f"{alias}.created_at < date(?, '+1 day')")
+        params.append(filters['date_to'])
+    return " AND ".join(clauses), params
+
+
+def fetch_submission_page(conn, filters, before=None, after=None, per_page=DASHBOARD_PAGE_SIZE,
+                          sources=(archive.HOT,)):
+    """Fetch one page of submissions using a keyset cursor on id.
+
+    ``before`` walks towards older rows (the default direction) and ``after``
+    walks back towards newer rows. One extra row is fetched to find out
+    whether another page exists, so memory stays bounded by ``per_page``.
+    ``sources`` are the hot table plus any archives attached for the date range.
+    """
+    where, params = build_submission_filter(filters)
+    if after is not None:
+        where += " AND fd.id > ?"
+        params.append(after)
+        order = "ASC"
+    else:
+        if before is not None:
+            where += " AND fd.id < ?"
+            params.append(before)
+        order = "DESC"
+
+    columns = [name for name, _ in archive.submission_columns(conn)]
+    select, params = archive.union_all(sources, columns, where, params)
+    rows = conn.execute(f"{select} ORDER BY id {order} LIMIT ?", params + [per_page + 1]).fetchall()
+
+    has_more = len(rows) > per_page
+    rows = [dict(row, farmer_registration_id=row['farmer_id']) for row in rows[:per_page]]
+    if after is not None:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = before is not None, has_more
+
+    return {
+        'rows': rows,
+        'newer_cursor': rows[0]['id'] if rows and has_newer else None,
+        'older_cursor': rows[-1]['id'] if rows and has_older else None,
+    }
+
+
+def fetch_dashboard_summary(conn, filters, sources=(archive.HOT,)):
+    """Compute the summary cards with aggregate queries instead of in the template."""
+    where, params = build_submission_filter(filters)
+    matching, params = archive.union_all(sources, ('farmer_id', 'soil_type'), where, params)
+    total = conn.execute(f"SELECT COUNT(*) FROM ({matching})", params).fetchone()[0]
+    unique_farmers = conn.execute(
+        f"SELECT COUNT(DISTINCT farmer_id) FROM ({matching})", params
+    ).fetchone()[0]
+    common_soil = conn.execute(f"""
+        SELECT soil_type, COUNT(*) AS count
+        FROM ({matching})
+        WHERE soil_type IS NOT NULL AND soil_type != ''
+        GROUP BY soil_type
+        ORDER BY count DESC, soil_type
+        LIMIT 1
+    """, params).fetchone()
+    return {
+        'total_submissions': total,
+        'unique_farmers': unique_farmers,
+        'most_common_soil': common_soil['soil_type'] if common_soil else None,
+    }
+
+
+def fetch_filter_options(conn):
+    """Values for the dashboard filter dropdowns, read from the rollups."""
+    return {
+        column: sorted(row['value'] for row in rollups.get_counts(conn, column))
+        for column in ('crop', 'soil_type', 'water_level')
+    }
+
+
+def parse_submission_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+@bp.app_template_filter('submission_date')
+def submission_date_filter(value):
+    dt = parse_submission_datetime(value)
+    if dt:
+        return dt.strftime('%d %b %Y')
+    return value[:10] if value else 'N/A'
+
+
+@bp.app_template_filter('submission_time')
+def submission_time_filter(value):
+    dt = parse_submission_datetime(value)
+    if dt:
+        return dt.strftime('%I:%M %p')
+    return value[11:16] if value else ''
+
+
+@bp.app_template_filter('age')
+def age_filter(seconds):
+    """Rough age for a number of seconds: 40 s, 12 min, 3 h, 2 d."""
+    for unit, size in (('d', 86400), ('h', 3600), ('min', 60)):
+        if seconds >= size:
+            return f"{seconds // size} {unit}"
+    return f"{seconds} s"
+
+
+@bp.route('/dashboard')
 def dashboard():
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
+
+    filters = get_dashboard_filters(request.args)
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    per_page = request.args.get('per_page', DASHBOARD_PAGE_SIZE, type=int)
+    per_page = max(1, min(per_page, DASHBOARD_MAX_PAGE_SIZE))
+
+    q = request.args.get('q', '').strip()
 
     conn = get_db()
+    results, summary, report_snapshot = None, None, None
+    archived_seasons, skipped_seasons = [], []
+    if q:
+        # Ranked full-text search with facet counts; the index covers the hot table only
+        where, params = build_submission_filter(filters)
+        results = search.search(conn, q, where, params, page=request.args.get('page', 1, type=int),
+                                per_page=per_page)
+        page = {
+            'rows': [dict(row, farmer_registration_id=row['farmer_id']) for row in results['rows']],
+            'newer_cursor': None,
+            'older_cursor': None,
+        }
+    else:
+        # A date range reaching back before the current season also reads the archives
+        with archive.historical(conn, filters.get('date_from'), filters.get('date_to')) as history:
+            page = fetch_submission_page(conn, filters, before=before, after=after, per_page=per_page,
+                                         sources=history.sources)
+        archived_seasons, skipped_seasons = history.seasons, history.skipped
+        # Summary cards are analytics, read from the reporting snapshot when it is on.
+        # Unfiltered cards come straight from the rollups; filtered ones need an aggregate query
+        report_conn = reporting.get_report_db()
+        with archive.historical(report_conn, filters.get('date_from'), filters.get('date_to')) as history:
+            summary = (fetch_dashboard_summary(report_conn, filters, history.sources) if filters
+                       else rollups.get_summary(report_conn))
+        report_snapshot = reporting.snapshot_info(report_conn)
+    filter_options = fetch_filter_options(conn)
 
-    # Join farmer_data with farmers table to get registration ID
-    farmers = conn.execute("""
-        SELECT fd.*, f.id as farmer_registration_id 
-        FROM farmer_data fd
-        LEFT JOIN farmers f ON fd.name = f.name
-        WHERE fd.crop IS NOT NULL AND fd.crop != ''
-        ORDER BY fd.id DESC
-    """).fetchall()
-
-    # Convert to list of dictionaries and format dates
-    farmers_list = []
-    for farmer in farmers:
-        farmer_dict = dict(farmer)
-        # Format the created_at date if it exists
-        if farmer_dict['created_at']:
-            try:
-                # Parse the datetime string and format it nicely
-                dt = datetime.strptime(farmer_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-                farmer_dict['formatted_date'] = dt.strftime('%d %b %Y')
-                farmer_dict['formatted_time'] = dt.strftime('%I:%M %p')
-            except:
-                farmer_dict['formatted_date'] = farmer_dict['created_at'][:10]
-                farmer_dict['formatted_time'] = farmer_dict['created_at'][11:16]
-        else:
-            farmer_dict['formatted_date'] = 'N/A'
-            farmer_dict['formatted_time'] = ''
+    return render_template(
+        'dashboard.html',
+        farmers=page['rows'],
+        newer_cursor=page['newer_cursor'],
+        older_cursor=page['older_cursor'],
+        summary=summary,
+        filters=filters,
+        filter_options=filter_options,
+        per_page=per_page,
+        q=q,
+        results=results,
+        archived_seasons=archived_seasons,
+        skipped_seasons=skipped_seasons,
+        report_snapshot=report_snapshot
+    )
 
-        farmers_list.append(farmer_dict)
 
-    conn.close()
-    return render_template('dashboard.html', farmers=farmers_list)
+# --- Submission Search (JSON; same index and filters as the dashboard search box) ---
+@bp.route('/search/submissions.json')
+def search_submissions():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    where, params = build_submission_filter(get_dashboard_filters(request.args))
+    results = search.search(
+        get_db(), q, where, params,
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', search.PER_PAGE, type=int),
+    )
+    for row in results['rows']:
+        # Highlights are HTML (escaped text plus <mark>); send them as strings
+        row['highlights'] = {column: str(value) for column, value in row.get('highlights', {}).items()}
+    results['facets'] = {
+        facet: [{'value': value, 'count': count} for value, count in counts]
+        for facet, counts in results['facets'].items()
+    }
+    return jsonify(results)
 
 
 # --- Delete Submission ---
-@app.route('/delete_submission/<int:submission_id>')
+@bp.route('/delete_submission/<int:submission_id>')
 def delete_submission(submission_id):
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
 
     conn = get_db()
     try:
         # Get submission details for the message
         submission = conn.execute("SELECT name FROM farmer_data WHERE id = ?", (submission_id,)).fetchone()
 
+        # An archived submission is deleted from its season's archive file
+        archived = archive.delete_rows(conn, "fd.id = ?", (submission_id,))
         conn.execute("DELETE FROM farmer_data WHERE id = ?", (submission_id,))
-        conn.commit()
 
-        # Check if we need to reset auto-increment (if table is empty)
-        remaining_submissions = conn.execute("SELECT COUNT(*) as count FROM farmer_data").fetchone()['count']
+        # If no submissions left, reset auto-increment to start from 1
+        sequence_reset = bulkops.reset_sequence_if_empty(conn, 'farmer_data')
+        conn.commit()
 
         if submission:
             message = f'✅ Submission from {submission["name"]} (ID: {submission_id}) deleted successfully!'
+        elif archived:
+            seasons = ", ".join(archived)
+            message = f'✅ Archived submission (ID: {submission_id}) deleted from the {seasons} archive!'
         else:
             message = '✅ Submission deleted successfully!'
 
-        # If no submissions left, reset auto-increment to start from 1
-        if remaining_submissions == 0:
-            conn.execute("DELETE FROM sqlite_sequence WHERE name='farmer_data'")
-            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('farmer_data', 0)")
-            conn.commit()
+        if sequence_reset:
             message += ' Auto-increment reset to start from 1.'
-        else:
+        elif not archive.has_archives(conn):
             message += ' ID will be reused for new submissions.'
 
         flash(message, 'success')
 
     except sqlite3.Error as e:
         flash(f'❌ Error deleting submission: {str(e)}', 'error')
-    finally:
-        conn.close()
 
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
 
 # --- Delete Farmer ---
-@app.route('/delete_farmer/<int:farmer_id>')
+@bp.route('/delete_farmer/<int:farmer_id>')
 def delete_farmer(farmer_id):
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
 
     conn = get_db()
     try:
@@ -310,32 +544,25 @@ def delete_farmer(farmer_id):
         if farmer:
             farmer_name = farmer['name']
 
-            # Count how many submissions this farmer has
-            submission_count = \
-            conn.execute("SELECT COUNT(*) FROM farmer_data WHERE name = ?", (farmer_name,)).fetchone()[0]
-
-            # Delete related data from farmer_data table
-            conn.execute("DELETE FROM farmer_data WHERE name = ?", (farmer_name,))
+            # Delete related data from the archives and farmer_data table, counting the rows as they go
+            archived = archive.delete_rows(conn, "fd.farmer_id = ?", (farmer_id,))
+            deleted = conn.execute("DELETE FROM farmer_data WHERE farmer_id = ?", (farmer_id,)).rowcount
+            submission_count = deleted + sum(len(rows) for rows in archived.values())
 
             # Then delete the farmer
             conn.execute("DELETE FROM farmers WHERE id = ?", (farmer_id,))
 
+            # If no farmers left, reset auto-increment to start from 1
+            sequence_reset = bulkops.reset_sequence_if_empty(conn, 'farmers')
             conn.commit()
 
-            # Check if we need to reset auto-increment (if table is empty)
-            remaining_farmers = conn.execute("SELECT COUNT(*) as count FROM farmers").fetchone()['count']
-
             # Prepare success message
             if submission_count > 0:
                 message = f'✅ Farmer {farmer_name} (ID: {farmer_id}) and their {submission_count} submission(s) deleted successfully!'
             else:
                 message = f'✅ Farmer {farmer_name} (ID: {farmer_id}) deleted successfully!'
 
-            # If no farmers left, reset auto-increment to start from 1
-            if remaining_farmers == 0:
-                conn.execute("DELETE FROM sqlite_sequence WHERE name='farmers'")
-                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('farmers', 0)")
-                conn.commit()
+            if sequence_reset:
                 message += ' Auto-increment reset to start from 1.'
             else:
                 message += ' ID will be reused for new registrations.'
@@ -347,372 +574,840 @@ def delete_farmer(farmer_id):
 
     except sqlite3.Error as e:
         flash(f'❌ Error deleting farmer: {str(e)}', 'error')
-    finally:
-        conn.close()
 
-    return redirect(url_for('farmer_data'))
+    return redirect(url_for('main.farmer_data'))
 
 
 # --- Reset All IDs (Manual Reset) ---
-@app.route('/reset_ids')
+@bp.route('/reset_ids')
 def reset_ids():
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
 
     conn = get_db()
     try:
-        # Reset both tables' auto-increment
-        conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('farmers', 'farmer_data')")
-        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('farmers', 0)")
-        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('farmer_data', 0)")
+        # Archived submissions keep their ids, so farmer_data's counter must not go back
+        tables = ('farmers',) if archive.has_archives(conn) else ('farmers', 'farmer_data')
+        for table in tables:
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, 0)", (table,))
         conn.commit()
 
-        flash('✅ Auto-increment counters reset successfully! New records will start from ID 1.', 'success')
+        if 'farmer_data' in tables:
+            flash('✅ Auto-increment counters reset successfully! New records will start from ID 1.', 'success')
+        else:
+            flash('⚠️ Farmer IDs reset. Submission IDs were kept because archived seasons still use them.', 'info')
     except sqlite3.Error as e:
         flash(f'❌ Error resetting IDs: {str(e)}', 'error')
-    finally:
-        conn.close()
 
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
 
 # --- Send Recommendation (Optional - if you still want to keep this feature) ---
-@app.route('/send_recommendation', methods=['POST'])
+@bp.route('/send_recommendation', methods=['POST'])
 def send_recommendation():
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
 
-    conn = get_db()
+    # Fields are named recommendation_<submission id>; all are applied in one transaction
+    items = [(key.split('_', 1)[1], value) for key, value in request.form.items()
+             if key.startswith('recommendation_') and value]
+    if items:
+        result = bulkops.apply_recommendations(get_db(), items)
+        flash(f"✅ {result.count('updated')} recommendation(s) saved.", 'success')
 
-    # Loop through all form fields to find recommendations
-    for key, value in request.form.items():
-        if key.startswith('recommendation_') and value:  # Only process selected recommendations
-            farmer_id = key.split('_')[1]  # Extract farmer ID from field name
-            conn.execute(
-                "UPDATE farmer_data SET recommendation=? WHERE id=?",
-                (value, farmer_id)
-            )
+    return redirect(url_for('main.dashboard'))
 
-    conn.commit()
-    conn.close()
 
-    return redirect(url_for('dashboard'))
+# --- Bulk Operations (JSON or form; many submissions/farmers per request) ---
+BULK_STATUS_LABELS = {
+    'updated': 'updated',
+    'deleted': 'deleted',
+    'reassigned': 'reassigned',
+    'not_found': 'not found',
+    'invalid': 'invalid',
+}
+
+
+@bp.route('/bulk', methods=['POST'])
+def bulk():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        action = payload.get('action')
+    else:
+        action = request.form.get('action')
+        payload = {
+            'ids': request.form.getlist('ids'),
+            'district': request.form.get('district', '').strip(),
+            'recommendation': request.form.get('recommendation'),
+            'to_farmer_id': request.form.get('to_farmer_id'),
+            'reassign_to': request.form.get('reassign_to'),
+        }
+
+    try:
+        result = bulkops.run(get_db(), action, payload)
+    except bulkops.BulkError as e:
+        if request.is_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f'❌ {e}', 'error')
+        result = None
+
+    if request.is_json:
+        return jsonify(result.as_dict())
+
+    if result is not None:
+        parts = [f"{count} {BULK_STATUS_LABELS.get(status, status)}" for status, count in result.summary.items()]
+        flash(f"✅ Bulk {action.replace('_', ' ')}: {', '.join(parts) or 'nothing to do'}.", 'success')
+    return redirect(url_for('main.farmer_data' if action == 'delete_farmers' else 'main.dashboard'))
 
 
 # --- Reports ---
-@app.route('/reports')
+@bp.route('/reports')
 def reports():
     if not session.get('admin_logged_in'):
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
 
-    conn = get_db()
+    conn = reporting.get_report_db()
 
-    # Fetch data safely
-    soil_rows = conn.execute("""
-        SELECT soil_type, COUNT(*) as count 
-        FROM farmer_data 
-        WHERE soil_type IS NOT NULL AND soil_type != '' 
-        GROUP BY soil_type
-    """).fetchall()
-
-    crop_rows = conn.execute("""
-        SELECT crop, COUNT(*) as count 
-        FROM farmer_data 
-        WHERE crop IS NOT NULL AND crop != '' 
-        GROUP BY crop
-    """).fetchall()
-
-    water_rows = conn.execute("""
-        SELECT water_level, COUNT(*) as count 
-        FROM farmer_data 
-        WHERE water_level IS NOT NULL AND water_level != '' 
-        GROUP BY water_level
-    """).fetchall()
-
-    conn.close()
-
-    # Convert rows to dictionaries
-    soil_data = [{'soil_type': row['soil_type'], 'count': row['count']} for row in soil_rows if row['soil_type']]
-    crop_data = [{'crop': row['crop'], 'count': row['count']} for row in crop_rows if row['crop']]
-    water_data = [{'water_level': row['water_level'], 'count': row['count']} for row in water_rows if row['water_level']]
-
-    # ✅ Safe debug logging for Windows (avoids OSError)
-    try:
-        print("=== REPORT DATA ===")
-        print("Soil Data:", soil_data)
-        print("Crop Data:", crop_data)
-        print("Water Data:", water_data)
-        print("===================")
-    except Exception as e:
-        # Prevent crash if console can't display characters
-        pass
+    # Read the incrementally maintained counters instead of scanning farmer_data
+    soil_data = [{'soil_type': row['value'], 'count': row['count']} for row in rollups.get_counts(conn, 'soil_type')]
+    crop_data = [{'crop': row['value'], 'count': row['count']} for row in rollups.get_counts(conn, 'crop')]
+    water_data = [{'water_level': row['value'], 'count': row['count']} for row in rollups.get_counts(conn, 'water_level')]
 
     return render_template(
         'reports.html',
         soil_data=soil_data,
         crop_data=crop_data,
-        water_data=water_data
+        water_data=water_data,
+        report_snapshot=reporting.snapshot_info(conn)
     )
 
+# --- Trend Reports (weekly/monthly series read from the trend rollups) ---
+def parse_report_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@bp.route('/reports/trends.json')
+def report_trends():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    conn = reporting.get_report_db()
+    try:
+        result = trends.series(
+            conn,
+            request.args.get('dimension', 'crop'),
+            grain=request.args.get('grain', 'week'),
+            date_from=parse_report_date(request.args.get('from')),
+            date_to=parse_report_date(request.args.get('to')),
+            top=min(max(request.args.get('top', 8, type=int), 1), 20),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result['snapshot_taken_at'] = reporting.taken_at(conn)
+    return jsonify(result)
+
+
 # --- About ---
-@app.route('/about')
+@bp.route('/about')
 def about():
-    return render_template('about.html')
+    return pages.serve('about.html')
 
 
 # --- Irrigation ---
-@app.route('/irrigation')
+@bp.route('/irrigation')
 def irrigation():
-    return render_template('irrigation.html')
+    return pages.serve('irrigation.html')
 
 
-@app.route('/crop')
+@bp.route('/crop')
 def crop():
-    return render_template('crop.html')
+    return pages.serve('crop.html')
 
 
-@app.route('/rice')
+@bp.route('/rice')
 def rice():
-    return render_template('rice.html')
+    return pages.serve('rice.html')
 
 
-@app.route('/wheat')
+@bp.route('/wheat')
 def wheat():
-    return render_template('wheat.html')
+    return pages.serve('wheat.html')
 
 
-@app.route('/maize')
+@bp.route('/maize')
 def maize():
-    return render_template('maize.html')
+    return pages.serve('maize.html')
 
 
-@app.route('/sugarcane')
+@bp.route('/sugarcane')
 def sugarcane():
-    return render_template('sugarcane.html')
+    return pages.serve('sugarcane.html')
 
 
-@app.route('/cotton')
+@bp.route('/cotton')
 def cotton():
-    return render_template('cotton.html')
+    return pages.serve('cotton.html')
+
+
+# --- Contact Page (Feedback system only, stored in feedback.py's table) ---
+FEEDBACK_FILTERS = ('q', 'date_from', 'date_to', 'farmers')
 
 
-# --- Contact Page (Feedback system only) ---
-@app.route('/contact', methods=['GET', 'POST'])
+@bp.route('/contact', methods=['GET', 'POST'])
 def contact():
     conn = get_db()
 
-    # --- If Admin is logged in: show feedback only ---
+    # --- If Admin is logged in: search and page through the feedback ---
     if session.get('admin_logged_in'):
-        feedbacks = conn.execute("""
-            SELECT name, feedback 
-            FROM farmer_data
-            WHERE feedback IS NOT NULL AND feedback != ''
-            ORDER BY id DESC
-        """).fetchall()
-        conn.close()
-        return render_template('contact.html', role='admin', feedbacks=feedbacks)
+        filters = {key: request.args.get(key, '').strip() for key in FEEDBACK_FILTERS if request.args.get(key, '').strip()}
+        result = feedback.search(
+            conn,
+            filters.get('q', ''),
+            date_from=filters.get('date_from'),
+            date_to=filters.get('date_to'),
+            farmers_only=filters.get('farmers') == '1',
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', feedback.PER_PAGE, type=int),
+        )
+        return render_template('contact.html', role='admin', feedbacks=result['rows'], result=result, filters=filters)
 
     # --- If Farmer or Guest (Can send feedback) ---
     if request.method == 'POST':
         name = session.get('farmer_name', request.form.get('name', 'Guest User'))
-        email = request.form.get('email', None)
-        feedback = request.form['feedback']
+        email = request.form.get('email') or None
+        message = request.form['feedback']
 
-        conn.execute("""
-            INSERT INTO farmer_data (name, feedback)
-            VALUES (?, ?)
-        """, (f"{name} ({email})", feedback))
+        farmer_id = session.get('farmer_id') if session.get('farmer_logged_in') else None
+        feedback.add(conn, message, name=name, email=email, farmer_id=farmer_id)
         conn.commit()
-        conn.close()
         return render_template('contact.html', role='farmer', message="✅ Feedback received successfully!")
 
-    conn.close()
     return render_template('contact.html', role='farmer')
 
 
-@app.route('/suggestion')
-def suggestion():
+# --- Crop Suggestions (read from the snapshot stored with each submission, see snapshots.py) ---
+HISTORY_PAGE_SIZE = 20
+
+
+def fetch_own_submission(conn, farmer_id, submission_id=None):
+    """One of the farmer's submissions, or their newest when ``submission_id`` is None."""
+    if submission_id is None:
+        return conn.execute(
+            "SELECT * FROM farmer_data WHERE farmer_id = ? ORDER BY id DESC LIMIT 1", (farmer_id,)
+        ).fetchone()
+    return conn.execute(
+        "SELECT * FROM farmer_data WHERE id = ? AND farmer_id = ?", (submission_id, farmer_id)
+    ).fetchone()
+
+
+@bp.route('/suggestion')
+@bp.route('/suggestion/<int:submission_id>')
+def suggestion(submission_id=None):
     # Check if farmer is logged in
     if not session.get('farmer_logged_in'):
-        return redirect(url_for('farmer_login'))
+        return redirect(url_for('main.farmer_login'))
+
+    conn = get_db()
+    farmer_id = session.get('farmer_id')
+    if submission_id is not None:
+        row = fetch_own_submission(conn, farmer_id, submission_id)
+        if row is None:
+            abort(404)
+    else:
+        # The last submission of this session, else (queued write, new login) the newest one
+        row = fetch_own_submission(conn, farmer_id, session.get('submission_id'))
+        if row is None and session.get('submission_id') is not None:
+            row = fetch_own_submission(conn, farmer_id)
 
     # Check if farmer has submitted data
-    if not session.get('soil_type') or not session.get('selected_crop'):
+    if row is None or not row['soil_type'] or not row['crop']:
         flash('Please submit your farm data first to get crop suggestions.', 'info')
-        return redirect(url_for('farmer'))
+        return redirect(url_for('main.farmer'))
 
-    # Get crop recommendations based on soil and water conditions
-    soil_type = session.get('soil_type', '')
-    water_level = session.get('water_level', '')
-    selected_crop = session.get('selected_crop', '')
-
-    # Generate recommendations
-    recommended_crops = get_crop_recommendations(soil_type, water_level)
-    crop_guide = get_crop_guide(selected_crop)
-    additional_suggestions = get_additional_suggestions(soil_type, water_level)
+    payload = snapshots.payload_for(conn, row)
+    # The submission date stands in for the sowing date
+    sown = parse_submission_datetime(row['created_at'])
+    sowing = sown.date() if sown else date.today()
+    plan = schedules.get_engine().plan(row['crop'], row['soil_type'], row['water_level'],
+                                       schedules.sowing_week(sowing))
 
     return render_template(
         'suggestion.html',
-        farmer_name=session.get('farmer_name'),
-        soil_type=soil_type,
-        water_level=water_level,
-        selected_crop=selected_crop,
-        farm_address=session.get('farm_address', ''),
-        recommended_crops=recommended_crops,
-        crop_guide=crop_guide,
-        additional_suggestions=additional_suggestions
+        submission=row,
+        farmer_name=row['name'] or session.get('farmer_name'),
+        soil_type=row['soil_type'],
+        water_level=row['water_level'],
+        selected_crop=row['crop'],
+        farm_address=row['farm_address'] or '',
+        recommended_crops=payload['recommended_crops'],
+        crop_guide=payload['crop_guide'],
+        additional_suggestions=payload['additional_suggestions'],
+        irrigation_plan=plan,
+        irrigation_events=plan.events(sowing) if plan else [],
+        sowing_date=sowing,
+        today=date.today().isoformat()
     )
 
 
-# Helper functions for crop recommendations
-def get_crop_recommendations(soil_type, water_level):
-    # Crop suggestions database
-    crop_suggestions = {
-        "Black Soil": {
-            "Low (Below 2m)": ["Cotton", "Groundnut", "Jowar (Sorghum)", "Soybean"],
-            "Moderate (2m - 5m)": ["Cotton", "Soybean", "Jowar (Sorghum)", "Wheat", "Sunflower"],
-            "High (Above 5m)": ["Sugarcane", "Rice", "Turmeric", "Banana"],
-            "Waterlogged Area": ["Rice", "Sugarcane"]
-        },
-        "Laterite Soil": {
-            "Low (Below 2m)": ["Cashew", "Groundnut", "Bajra (Pearl Millet)"],
-            "Moderate (2m - 5m)": ["Cashew", "Sugarcane", "Turmeric", "Mango"],
-            "High (Above 5m)": ["Rice", "Sugarcane", "Banana"],
-            "Waterlogged Area": ["Rice"]
-        },
-        "Alluvial Soil": {
-            "Low (Below 2m)": ["Wheat", "Gram (Chana)", "Barley", "Mustard"],
-            "Moderate (2m - 5m)": ["Wheat", "Rice", "Sugarcane", "Cotton", "Maize"],
-            "High (Above 5m)": ["Rice", "Sugarcane", "Banana", "Turmeric"],
-            "Waterlogged Area": ["Rice", "Jute"]
-        },
-        "Red Soil": {
-            "Low (Below 2m)": ["Groundnut", "Bajra (Pearl Millet)", "Ragi", "Gram (Chana)"],
-            "Moderate (2m - 5m)": ["Groundnut", "Jowar (Sorghum)", "Cotton", "Maize"],
-            "High (Above 5m)": ["Rice", "Sugarcane"],
-            "Waterlogged Area": ["Rice"]
-        },
-        "Marshy and Peaty Soil": {
-            "Low (Below 2m)": ["Rice", "Jute", "Sugarcane"],
-            "Moderate (2m - 5m)": ["Rice", "Sugarcane", "Banana"],
-            "High (Above 5m)": ["Rice", "Sugarcane", "Aquaculture"],
-            "Waterlogged Area": ["Rice", "Aquaculture", "Jute"]
-        }
-    }
+@bp.route('/farmer/history')
+def farmer_history():
+    if not session.get('farmer_logged_in'):
+        return redirect(url_for('main.farmer_login'))
 
-    if soil_type in crop_suggestions and water_level in crop_suggestions[soil_type]:
-        return crop_suggestions[soil_type][water_level]
-    return []
+    conn = get_db()
+    farmer_id = session.get('farmer_id')
+    # Index-only on idx_farmer_data_farmer_id, however long the history
+    total = conn.execute("SELECT COUNT(*) FROM farmer_data WHERE farmer_id = ?", (farmer_id,)).fetchone()[0]
+    pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+    page = max(1, min(request.args.get('page', 1, type=int), pages))
+    recommendations = conn.execute("""
+        SELECT id, soil_type, water_level, crop, farm_address, recommendation, created_at
+        FROM farmer_data
+        WHERE farmer_id = ?
+        ORDER BY id DESC
+        LIMIT ? OFFSET ?
+    """, (farmer_id, HISTORY_PAGE_SIZE, (page - 1) * HISTORY_PAGE_SIZE)).fetchall()
+    return render_template('view_recommendation.html', recommendations=recommendations,
+                           total=total, page=page, pages=pages)
+
+
+# Helper functions for crop recommendations (backed by data/crop_knowledge.json)
+def get_crop_recommendations(soil_type, water_level):
+    return knowledge.get_knowledge_base().recommendations(soil_type, water_level)
 
 
 def get_crop_guide(crop_name):
-    # Crop database with detailed information
-    crop_database = {
-        "Rice": {
-            "season": "Kharif (June-October)",
-            "icon": "🌾",
-            "timing": "Sow: June-July, Harvest: October-November. Best time for sowing is with onset of monsoon.",
-            "soil": "Clayey loam with good water retention. pH: 5.5-6.5. Requires puddling for better growth.",
-            "water": "Requires standing water (5-10cm depth). Ideal for high water level areas. Total water requirement: 1200-1500mm.",
-            "care": "Transplant 25-30 day old seedlings. Control weeds, manage water levels, watch for blast and stem borer."
-        },
-        "Wheat": {
-            "season": "Rabi (November-March)",
-            "icon": "🌾",
-            "timing": "Sow: November-December, Harvest: March-April. Ideal temperature: 20-25°C during growing period.",
-            "soil": "Well-drained loamy soil. pH: 6.0-7.5. Avoid waterlogged conditions.",
-            "water": "Moderate water requirements (4-6 irrigations). Critical stages: crown root, tillering, flowering.",
-            "care": "Seed rate: 100-125 kg/ha. Fertilizer: N:P:K - 120:60:40 kg/ha. Control rust and aphids."
-        },
-        "Cotton": {
-            "season": "Kharif (June-December)",
-            "icon": "🧵",
-            "timing": "Sow: June-July, Harvest: December-January. Requires warm temperature (25-35°C).",
-            "soil": "Black soil preferred, well-drained. pH: 6.0-8.0. Good for water moderate areas.",
-            "water": "Moderate water requirements. Drought tolerant but needs irrigation during flowering and boll formation.",
-            "care": "Regular weeding, pest control for bollworms. Spacing: 60-90 cm between plants."
-        },
-        "Sugarcane": {
-            "season": "Year-round (12-18 months)",
-            "icon": "🎋",
-            "timing": "Plant: February-March or October-November. Harvest: After 12-18 months.",
-            "soil": "Deep, well-drained loamy soil. pH: 6.5-7.5. Requires good organic matter.",
-            "water": "High water requirements. Needs regular irrigation. Total water: 1500-2500mm.",
-            "care": "Planting: 3-budded setts. Fertilizer: 200-300 kg N/ha. Control red rot and borers."
-        },
-        "Groundnut": {
-            "season": "Kharif (June-September)",
-            "icon": "🥜",
-            "timing": "Sow: June-July, Harvest: September-October. Requires warm climate.",
-            "soil": "Well-drained sandy loam. pH: 6.0-7.0. Avoid heavy soils.",
-            "water": "Low to moderate water needs. Sensitive to waterlogging.",
-            "care": "Seed rate: 100-120 kg/ha. Inoculate with Rhizobium. Control leaf spot and root rot."
-        }
-        # Add more crops as needed...
-    }
-
-    return crop_database.get(crop_name, {
-        "season": "Information not available",
-        "icon": "🌱",
-        "timing": "Seasonal information not available for this crop.",
-        "soil": "Soil preparation details not available.",
-        "water": "Water management information not available.",
-        "care": "Crop care instructions not available."
-    })
+    return knowledge.get_knowledge_base().guide(crop_name)
 
 
 def get_additional_suggestions(soil_type, water_level):
-    suggestions = {
-        "rotation": get_rotation_suggestion(soil_type),
-        "intercropping": get_intercropping_suggestion(soil_type),
-        "irrigation": get_irrigation_suggestion(water_level)
+    kb = knowledge.get_knowledge_base()
+    return {
+        "rotation": kb.rotation_suggestion(soil_type),
+        "intercropping": kb.intercropping_suggestion(soil_type),
+        "irrigation": kb.irrigation_suggestion(water_level)
     }
-    return suggestions
 
 
 def get_rotation_suggestion(soil):
-    suggestions = {
-        "Black Soil": "Rotate cotton with legumes like soybean or pigeon pea to improve soil nitrogen and break pest cycles.",
-        "Red Soil": "Rotate millets with pulses like green gram or black gram. Include oilseeds in rotation.",
-        "Alluvial Soil": "Rice-wheat rotation or add legumes in rotation. Include mustard or maize for diversification.",
-        "Laterite Soil": "Include groundnut and pulses in rotation with cashew. Practice mixed cropping with legumes.",
-        "Marshy and Peaty Soil": "Rice-fish rotation or include jute. Practice integrated farming system."
-    }
-    return suggestions.get(soil, "Include legume crops in your rotation cycle to maintain soil health and fertility.")
+    return knowledge.get_knowledge_base().rotation_suggestion(soil)
 
 
 def get_intercropping_suggestion(soil):
-    suggestions = {
-        "Black Soil": "Cotton with groundnut or soybean. Sorghum with pigeon pea.",
-        "Red Soil": "Pearl millet with cluster bean. Groundnut with pearl millet.",
-        "Alluvial Soil": "Wheat with chickpea. Rice with fish culture.",
-        "Laterite Soil": "Cashew with pineapple or legumes. Coconut with pepper or cocoa.",
-        "Marshy and Peaty Soil": "Rice with fish or prawns. Include aquatic plants."
-    }
-    return suggestions.get(soil,
-                           "Consider intercropping with compatible crops for better land utilization and risk management.")
+    return knowledge.get_knowledge_base().intercropping_suggestion(soil)
 
 
 def get_irrigation_suggestion(water):
-    suggestions = {
-        "Low (Below 2m)": "Use drip irrigation and mulching to conserve water. Grow drought-resistant crops and practice rainwater harvesting.",
-        "Moderate (2m - 5m)": "Schedule irrigation based on crop growth stages. Use sprinkler irrigation for efficient water use.",
-        "High (Above 5m)": "Ensure proper drainage to prevent waterlogging. Practice controlled irrigation and grow water-loving crops.",
-        "Waterlogged Area": "Install drainage systems. Grow aquatic crops or practice integrated fish farming with crops."
+    return knowledge.get_knowledge_base().irrigation_suggestion(water)
+
+
+# --- Connection Pool Stats ---
+@bp.route('/db_stats')
+def db_stats():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    stats = db.get_pool().stats()
+    if writebehind.enabled():
+        stats['write_behind'] = writebehind.get_queue().stats()
+    if reporting.enabled():
+        stats['reporting'] = reporting.stats()
+    return jsonify(stats)
+
+
+# --- Metrics (Prometheus text format, see metrics.py) ---
+@bp.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled():
+        abort(404)
+    if not metrics.authorized():
+        abort(403)
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/metrics/slow_queries')
+def slow_queries():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    if not metrics.enabled():
+        abort(404)
+    return jsonify({'threshold_ms': current_app.config['METRICS_SLOW_QUERY_MS'],
+                    'slow_queries': metrics.get_metrics().slow_queries()})
+
+
+# --- Streaming Exports ---
+def export_response(chunks, name, fmt, compress):
+    response = Response(chunks, mimetype='application/gzip' if compress else exports.FORMATS[fmt])
+    filename = exports.export_filename(name, fmt, compress)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/export/submissions.<fmt>')
+def export_submissions(fmt):
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    if fmt not in exports.FORMATS:
+        abort(404)
+    filters = get_dashboard_filters(request.args)
+    where, params = build_submission_filter(filters)
+    compress = request.args.get('gzip') == '1'
+    chunks = exports.stream_submissions(fmt, where, params, compress,
+                                        filters.get('date_from'), filters.get('date_to'), reporting.get_pool())
+    return export_response(chunks, 'submissions', fmt, compress)
+
+
+@bp.route('/export/farmers.<fmt>')
+def export_farmers(fmt):
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    if fmt not in exports.FORMATS:
+        abort(404)
+    compress = request.args.get('gzip') == '1'
+    return export_response(exports.stream_farmers(fmt, compress, reporting.get_pool()), 'farmers', fmt, compress)
+
+
+# --- Bulk Import ---
+@bp.route('/import', methods=['GET', 'POST'])
+def bulk_import():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        kind = request.form.get('kind', 'submissions')
+        if not upload or not upload.filename:
+            return render_template('import.html', error="Please choose a CSV or NDJSON file."), 400
+        if kind not in imports.KINDS:
+            return render_template('import.html', error="Unknown import type."), 400
+        report = imports.import_file(get_db(), kind, upload.stream, upload.filename)
+        # An unreadable file is the client's error; the report says what was committed before it
+        status = 400 if report.file_error else 200
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(report.as_dict()), status
+        return render_template('import.html', report=report.as_dict()), status
+
+    return render_template('import.html')
+
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(imports.KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_data_command(kind, path):
+    """Bulk import farmers or submissions from a CSV / NDJSON (optionally .gz) file."""
+    with open(path, 'rb') as f:
+        report = imports.import_file(get_db(), kind, f, path).as_dict()
+    print(f"✅ {report['inserted']} of {report['read']} {kind} rows imported "
+          f"in {report['seconds']} s ({report['rows_per_second']} rows/s)")
+    for error in report['errors'][:20]:
+        print(f"❌ line {error['line']}: {error['error']}")
+    if report['rejected']:
+        print(f"⚠️ {report['rejected']} row(s) rejected")
+    if report['file_error']:
+        print(f"❌ Import stopped: {report['file_error']}")
+        print(f"   {len(report['batches'])} batch(es) committed, covering lines up to "
+              f"{report['committed_through_line']}; later rows were not imported")
+        raise SystemExit(1)
+
+
+# --- Batch Crop Scoring (whole districts / cooperatives) ---
+BATCH_SCORING_LIMIT = 5000
+BATCH_SCORING_MAX_LIMIT = 50000
+
+
+def batch_farm_error(farm):
+    """Why one uploaded farm cannot be scored, or None."""
+    if not isinstance(farm, dict):
+        return 'must be an object'
+    for key in ('soil_type', 'season'):
+        if farm.get(key) is not None and not isinstance(farm[key], str):
+            return f'{key} must be a string'
+    water = farm.get('water_level')
+    if water is None or isinstance(water, str):
+        return None
+    if isinstance(water, bool) or not isinstance(water, (int, float)):
+        return 'water_level must be a category name or a depth in metres'
+    try:
+        float(water)
+    except OverflowError:
+        return 'water_level is out of range'
+    return None
+
+
+@bp.route('/recommendations/batch', methods=['GET', 'POST'])
+def batch_recommendations():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    top_k = request.args.get('top_k', 5, type=int)
+
+    # POST: score an uploaded list of farms, e.g. {"farms": [{"soil_type": ..., "water_level": 3.2}]}
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'the body must be a JSON object with a farms list'}), 400
+        farms = payload.get('farms') or []
+        if not isinstance(farms, list) or len(farms) > BATCH_SCORING_MAX_LIMIT:
+            return jsonify({'error': f'farms must be a list of at most {BATCH_SCORING_MAX_LIMIT} entries'}), 400
+        season = payload.get('season')
+        if season is not None and not isinstance(season, str):
+            return jsonify({'error': 'season must be a string'}), 400
+        for i, farm in enumerate(farms):
+            error = batch_farm_error(farm)
+            if error:
+                return jsonify({'error': f'farms[{i}]: {error}'}), 400
+        ranked = scoring.get_engine().rank(
+            [farm.get('soil_type') for farm in farms],
+            [farm.get('water_level') for farm in farms],
+            [farm.get('season', season) for farm in farms],
+            k=top_k
+        )
+        return jsonify({'results': [
+            {'farm': i, 'crops': [{'crop': c, 'score': sc} for c, sc in crops]}
+            for i, crops in enumerate(ranked)
+        ]})
+
+    # GET: score stored submissions matching the dashboard filters, paged by id
+    filters = get_dashboard_filters(request.args)
+    where, params = build_submission_filter(filters)
+    district = request.args.get('district', '').strip()
+    if district:
+        where += " AND fd.farm_address LIKE ?"
+        params.append(f"%{district}%")
+    after = request.args.get('after', type=int)
+    if after is not None:
+        where += " AND fd.id > ?"
+        params.append(after)
+    limit = max(1, min(request.args.get('limit', BATCH_SCORING_LIMIT, type=int), BATCH_SCORING_MAX_LIMIT))
+    season = request.args.get('season') or scoring.current_season()
+
+    results = [
+        {'submission_id': submission_id, 'crops': [{'crop': c, 'score': sc} for c, sc in crops]}
+        for submission_id, crops in scoring.score_submissions(get_db(), where, params, season, top_k, limit)
+    ]
+    return jsonify({
+        'season': season,
+        'results': results,
+        'next_cursor': results[-1]['submission_id'] if len(results) == limit else None
+    })
+
+
+# --- Irrigation Schedules (day-by-day plans, see schedules.py) ---
+SCHEDULE_LIMIT = 5000
+SCHEDULE_MAX_LIMIT = 50000
+
+
+@bp.route('/irrigation/plan.json')
+def irrigation_plan():
+    engine = schedules.get_engine()
+    try:
+        sowing = parse_report_date(request.args.get('sowing'))
+    except ValueError:
+        return jsonify({'error': 'sowing must be a date like 2025-06-20'}), 400
+    season = request.args.get('season') or scoring.current_season(sowing)
+    if season not in scoring.SEASONS:
+        return jsonify({'error': f"season must be one of {', '.join(scoring.SEASONS)}"}), 400
+    sowing = sowing or engine.default_sowing(season)
+
+    crop = request.args.get('crop', '')
+    plan = engine.plan(crop, request.args.get('soil', ''), request.args.get('water', ''),
+                       schedules.sowing_week(sowing))
+    if plan is None:
+        return jsonify({'error': 'crop, soil and water must be known categories',
+                        'crops': engine.crops, 'soils': engine.soils, 'water_levels': engine.water_levels}), 400
+
+    result = {
+        'crop': plan.crop,
+        'soil_type': plan.soil_type,
+        'water_level': plan.water_level,
+        'season': season,
+        'in_season': schedules.in_season(engine.kb, crop, season),
+        'sowing_date': sowing.isoformat(),
+        'harvest_date': (sowing + timedelta(days=plan.season_days - 1)).isoformat(),
+        'method': plan.method,
+        'application_efficiency': plan.efficiency,
+        'totals': plan.summary(),
+        'stages': plan.stages(sowing),
+        'schedule': plan.events(sowing),
     }
-    return suggestions.get(water, "Optimize irrigation based on crop requirements and soil moisture conditions.")
+    if request.args.get('daily') == '1':
+        result['daily'] = engine.daily(plan, sowing)
+    return jsonify(result)
+
+
+@bp.route('/irrigation/schedules.json')
+def irrigation_schedules():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+
+    # Stored submissions matching the dashboard filters whose crop is still growing, paged by id
+    filters = get_dashboard_filters(request.args)
+    where, params = build_submission_filter(filters)
+    after = request.args.get('after', type=int)
+    if after is not None:
+        where += " AND fd.id > ?"
+        params.append(after)
+    limit = max(1, min(request.args.get('limit', SCHEDULE_LIMIT, type=int), SCHEDULE_MAX_LIMIT))
+    try:
+        today = parse_report_date(request.args.get('date')) or date.today()
+    except ValueError:
+        return jsonify({'error': 'date must be a date like 2025-06-20'}), 400
+
+    results = []
+    for submission_id, sowing, plan, next_index in schedules.schedule_submissions(get_db(), where, params,
+                                                                                    today, limit):
+        upcoming = None
+        if next_index < plan.irrigations:
+            day = int(plan.days[next_index])
+            upcoming = {'date': (sowing + timedelta(days=day)).isoformat(), 'stage': plan.stage(day),
+                        'gross_mm': round(float(plan.gross_mm[next_index]), 1)}
+        results.append({
+            'submission_id': submission_id,
+            'crop': plan.crop,
+            'soil_type': plan.soil_type,
+            'water_level': plan.water_level,
+            'sowing_date': sowing.isoformat(),
+            'day': (today - sowing).days + 1,
+            'irrigations': plan.irrigations,
+            'remaining_irrigations': plan.irrigations - next_index,
+            'gross_irrigation_mm': round(float(plan.gross_mm.sum()), 1),
+            'next_irrigation': upcoming,
+        })
+    return jsonify({
+        'date': today.isoformat(),
+        'results': results,
+        'next_cursor': results[-1]['submission_id'] if len(results) == limit else None
+    })
+
+
+# --- Farm Location Lookups ---
+GEO_RESULT_LIMIT = 1000
+
+
+@bp.route('/geo/bbox')
+def geo_bbox():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    south = request.args.get('south', type=float)
+    west = request.args.get('west', type=float)
+    north = request.args.get('north', type=float)
+    east = request.args.get('east', type=float)
+    if None in (south, west, north, east):
+        return jsonify({'error': 'south, west, north and east are required'}), 400
+    limit = max(1, min(request.args.get('limit', GEO_RESULT_LIMIT, type=int), GEO_RESULT_LIMIT))
+    return jsonify({'farms': geo.bounding_box(get_db(), south, west, north, east, limit)})
+
+
+@bp.route('/geo/nearby')
+def geo_nearby():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    lat, lon = geo.parse_lat_lon(request.args.get('lat'), request.args.get('lon'))
+    if lat is None:
+        return jsonify({'error': 'valid lat and lon are required'}), 400
+    k = request.args.get('k', type=int)
+    if k:
+        farms = geo.nearest(get_db(), lat, lon, k=max(1, min(k, GEO_RESULT_LIMIT)))
+    else:
+        radius_km = max(0.0, min(request.args.get('radius_km', 5.0, type=float), geo.KNN_MAX_RADIUS_KM))
+        farms = geo.within_radius(get_db(), lat, lon, radius_km, GEO_RESULT_LIMIT)
+    return jsonify({'farms': farms})
+
+
+@bp.route('/geo/district/<name>')
+def geo_district(name):
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    farms = geo.district_farms(get_db(), name, GEO_RESULT_LIMIT)
+    if farms is None:
+        return jsonify({'error': f'unknown district {name!r}'}), 404
+    return jsonify({'district': name, 'farms': farms})
+
+
+@bp.route('/map/clusters')
+def map_clusters():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    south = request.args.get('south', type=float)
+    west = request.args.get('west', type=float)
+    north = request.args.get('north', type=float)
+    east = request.args.get('east', type=float)
+    z = request.args.get('z', type=int)
+    if None in (south, west, north, east, z):
+        return jsonify({'error': 'south, west, north, east and z are required'}), 400
+    z = max(0, min(z, maps.MAX_ZOOM))
+    try:
+        collection = maps.clusters_geojson(get_db(), south, west, north, east, z)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(collection)
+
+
+@bp.cli.command('add-district')
+@click.argument('name')
+@click.argument('south', type=float)
+@click.argument('west', type=float)
+@click.argument('north', type=float)
+@click.argument('east', type=float)
+def add_district_command(name, south, west, north, east):
+    """Register (or update) a district's bounding box for /geo/district lookups."""
+    conn = get_db()
+    geo.save_district(conn, name, south, west, north, east)
+    conn.commit()
+    print(f"✅ District {name} saved")
+
+
+# --- Reload Crop Knowledge Base ---
+@bp.route('/reload_knowledge', methods=['POST'])
+def reload_knowledge():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('main.admin_login'))
+    kb = knowledge.reload()
+    return jsonify({'soil_types': len(kb.soil_types), 'water_levels': len(kb.water_levels), 'crops': len(kb.crops)})
+
+
+# --- Schema and rollup maintenance commands ---
+@bp.cli.command('migrate')
+def migrate_command():
+    """Bring the database schema up to date; run once per deployment, before starting workers."""
+    applied = migrations.migrate_database(current_app.config['DATABASE'])
+    if applied:
+        print(f"✅ Applied migrations {', '.join(map(str, applied))}; schema version {migrations.LATEST_VERSION}")
+    else:
+        print(f"✅ Schema already at version {migrations.LATEST_VERSION}")
+
+
+@bp.cli.command('build-assets')
+@click.option('--extract', is_flag=True, help="First move inline <style>/<script> blocks out of the templates.")
+def build_assets_command(extract):
+    """Minify and fingerprint page CSS/JS into static/build and report bytes per page."""
+    template_dir = os.path.join(current_app.root_path, current_app.template_folder)
+    if extract:
+        kept = assets.extract(template_dir, current_app.static_folder)
+        for template, kinds in kept.items():
+            print(f"⚠️ {template}: {', '.join(kinds)} block(s) with Jinja syntax left inline")
+    manifest = assets.build(current_app.static_folder)
+    print(f"✅ {len(manifest)} asset bundle(s) written to static/{assets.BUILD_DIR}/")
+    rows = assets.page_report(template_dir, current_app.static_folder)
+    print(f"{'template':<26}{'inline':>10}{'first view':>12}{'repeat view':>13}  (gzip bytes)")
+    for row in rows:
+        print(f"{row['template']:<26}{row['inline']:>10,}{row['first_view']:>12,}{row['repeat_view']:>13,}")
+    if rows:
+        inline = sum(row['inline'] for row in rows)
+        repeat = sum(row['repeat_view'] for row in rows)
+        print(f"{'total':<26}{inline:>10,}{sum(row['first_view'] for row in rows):>12,}{repeat:>13,}"
+              f"  ({100 - 100 * repeat // inline}% less on repeat views)")
+
+
+@bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the summary, trend and farmer rollups and the search index from farmer_data (plus archived counts)."""
+    conn = get_db()
+    rollups.rebuild(conn)
+    trends.rebuild(conn)
+    registry.rebuild(conn)
+    search.rebuild(conn)
+    conn.commit()
+    print("✅ Rollups, farmer stats and search index rebuilt from farmer_data")
+
+
+@bp.cli.command('check-rollups')
+def check_rollups_command():
+    """Compare the summary, trend and farmer rollups and the search index against farmer_data."""
+    conn = get_db()
+    mismatches = rollups.check(conn)
+    trend_mismatches = trends.check(conn)
+    farmer_mismatches = registry.check(conn)
+    search_problems = search.check(conn)
+    if not mismatches and not trend_mismatches and not farmer_mismatches and not search_problems:
+        print("✅ Rollups, farmer stats and search index are consistent with farmer_data")
+        return
+    for dimension, value, stored, raw in mismatches:
+        print(f"❌ {dimension}={value!r}: rollup={stored} raw={raw}")
+    for dimension, day, value, stored, raw in trend_mismatches:
+        print(f"❌ trend {dimension}={value!r} on {day}: rollup={stored} raw={raw}")
+    for farmer_id, stored, raw in farmer_mismatches:
+        print(f"❌ farmer #{farmer_id} stats: stored={stored} raw={raw}")
+    for problem in search_problems:
+        print(f"❌ search index: {problem}")
+    raise SystemExit(1)
+
+
+# --- Archive Tiering (see archive.py) ---
+@bp.cli.command('archive-submissions')
+@click.option('--before', help='Archive submissions created before this date (YYYY-MM-DD). '
+                               'Default: keep ARCHIVE_KEEP_SEASONS seasons hot.')
+@click.option('--batch-rows', type=int, help='Rows moved per batch (default ARCHIVE_BATCH_ROWS).')
+@click.option('--max-batches', type=int, default=0, help='Stop after this many batches (0: until done).')
+@click.option('--status', is_flag=True, help='Only list the archives.')
+def archive_submissions_command(before, batch_rows, max_batches, status):
+    """Move old submissions into per-season archive databases, in small batches."""
+    if status:
+        entries = archive.catalog(get_db())
+        for entry in entries:
+            print(f"📦 {entry['season']:<12} {entry['rows']:>9,} rows  {entry['filename']}  (updated {entry['updated_at']})")
+        if not entries:
+            print("⚠️ No archives yet")
+        return
+
+    try:
+        cutoff = parse_report_date(before) or archive.default_cutoff(current_app.config['ARCHIVE_KEEP_SEASONS'])
+    except ValueError:
+        print(f"❌ --before must be a date like 2024-06-01, got {before!r}")
+        raise SystemExit(1)
+
+    # A dedicated connection: archives are attached to it while it runs
+    conn = db.get_pool().connect()
+    try:
+        report = archive.run(
+            conn, archive.archive_dir(), cutoff,
+            batch_rows=batch_rows or current_app.config['ARCHIVE_BATCH_ROWS'],
+            pause_ms=current_app.config['ARCHIVE_PAUSE_MS'],
+            max_batches=max_batches,
+            progress=lambda season, moved: print(f"  {season.key}: moved {moved} rows"),
+        ).as_dict()
+    finally:
+        conn.close()
+    for season, rows in report['moved'].items():
+        print(f"✅ {season}: {rows:,} rows archived")
+    if report['conflict']:
+        conflict = report['conflict']
+        print(f"❌ {conflict['season']}: the archive already holds different rows with ids "
+              f"{', '.join(map(str, conflict['ids']))}; they were left in farmer_data")
+        raise SystemExit(1)
+    if not report['rows']:
+        print(f"✅ Nothing created before {report['cutoff']} left to archive")
+    elif not report['finished']:
+        print(f"⚠️ Stopped after {report['batches']} batches; run again to continue")
+
+
+@bp.cli.command('refresh-reporting-snapshot')
+def refresh_reporting_snapshot_command():
+    """Copy the database to the read-only reporting snapshot now."""
+    if reporting.refresh() is None:
+        print("⚠️ Another process is refreshing the reporting snapshot; try again shortly")
+        return
+    print(f"✅ Reporting snapshot written to {reporting.snapshot_path()}")
+
 
 # --- Logout ---
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 
 if __name__ == '__main__':
     import webbrowser
     from threading import Timer
 
+    app = create_app()
 
     # --- Automatically open the browser ---
     def open_browser():
@@ -722,5 +1417,5 @@ if __name__ == '__main__':
     # Open browser after 1 second
     Timer(1, open_browser).start()
 
-    # Run the Flask app
+    # Development server only; see gunicorn.conf.py for serving real traffic
     app.run(debug=True)
\ No newline at end of file
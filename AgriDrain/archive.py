@@ -0,0 +1,475 @@
+"""Hot/cold tiering: old submissions move to one archive database per season.
+
+The hot ``farmer_data`` table keeps the current season (``ARCHIVE_KEEP_SEASONS``)
+so the dashboard, map and scoring queries only touch recent rows. Older rows
+are moved by ``flask archive-submissions`` into
+``<ARCHIVE_DIR>/farmer_data-<season>.db``, e.g. ``farmer_data-2024-kharif.db``.
+Each file holds a ``farmer_data`` table with the same columns and ids as the hot
+table. The ``archives`` catalog in the hot database lists every file.
+
+Rows move in batches of ``ARCHIVE_BATCH_ROWS``, in two steps:
+
+1. The batch is copied into the archive file. Only the archive is written, so
+   the hot database's writers are not blocked. A row the archive already holds
+   unchanged (copied by an interrupted run) is not copied again; a different
+   row with the same id aborts the batch with ``ArchiveConflict``.
+2. In a short ``BEGIN IMMEDIATE`` transaction, the batch's counts go to
+   ``archived_rollups``/``archived_trends`` and the rows are deleted from
+   ``farmer_data``, but only those whose archived copy matches on every
+   column. The delete runs under ``archive_guard``, so all-time rollups and
+   trends (and therefore /reports) keep counting the rows.
+
+If the process stops between the two steps, a row can exist in both places.
+Readers skip archive rows identical to a hot row, and the next run finishes
+the move.
+
+Archived rows keep their ids, so submission ids must never be handed out
+again: bulkops does not restart the farmer_data sequence once anything is
+archived, and each run raises the sequence above the archive's highest id in
+case it was reset before.
+
+Admin deletes reach archived rows too: ``delete_rows()`` removes them from
+their archive files, and ``reassign_rows()`` hands them to another farmer.
+Both adjust the archived and all-time counters and ``farmer_stats`` to match.
+
+``historical()`` ATTACHes the archives a date range needs, only for the length
+of one query, so an admin's historical dashboard filter or export reads hot
+and archived rows as one set.
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+import registry
+import rollups
+import trends
+
+DEFAULT_CONFIG = {
+    # Default: an ``archive`` directory next to the database file
+    'ARCHIVE_DIR': None,
+    'ARCHIVE_KEEP_SEASONS': 1,
+    'ARCHIVE_BATCH_ROWS': 500,
+    # Pause between batches so request writers get the lock in between
+    'ARCHIVE_PAUSE_MS': 50,
+}
+
+# SQLite allows 10 attached databases by default; leave room for the caller
+MAX_ATTACHED = 8
+ALIAS_PREFIX = 'archive_'
+
+Season = namedtuple('Season', 'key name start end')
+# ``columns`` is None for the hot table, else the archive's column names
+Source = namedtuple('Source', 'table columns season')
+HOT = Source('farmer_data', None, None)
+
+
+class ArchiveConflict(Exception):
+    """Hot rows whose ids the season's archive already holds for different rows."""
+
+    def __init__(self, season_key, ids):
+        super().__init__(f"{season_key} archive holds different rows with ids {', '.join(map(str, ids))}")
+        self.season_key = season_key
+        self.ids = ids
+
+
+# --- Seasons (same boundaries as scoring.current_season) ---
+def season_of(day):
+    """The Kharif (Jun-Oct), Rabi (Nov-Mar) or Zaid (Apr-May) season containing ``day``."""
+    if 6 <= day.month <= 10:
+        return Season(f"{day.year}-kharif", 'Kharif', date(day.year, 6, 1), date(day.year, 11, 1))
+    if day.month >= 11 or day.month <= 3:
+        year = day.year if day.month >= 11 else day.year - 1
+        return Season(f"{year}-rabi", 'Rabi', date(year, 11, 1), date(year + 1, 4, 1))
+    return Season(f"{day.year}-zaid", 'Zaid', date(day.year, 4, 1), date(day.year, 6, 1))
+
+
+def default_cutoff(keep_seasons=1, today=None):
+    """Start of the oldest season that stays hot."""
+    season = season_of(today or date.today())
+    for _ in range(max(1, keep_seasons) - 1):
+        season = season_of(season.start - timedelta(days=1))
+    return season.start
+
+
+def seasons_before(first_day, cutoff):
+    """Seasons from the one containing ``first_day`` up to ``cutoff`` (exclusive)."""
+    seasons = []
+    season = season_of(first_day)
+    while season.start < cutoff:
+        seasons.append(season)
+        season = season_of(season.end)
+    return seasons
+
+
+# --- Catalog and archive files ---
+def has_archives(conn):
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM archives)").fetchone()[0] == 1
+
+
+def archive_dir(app=None):
+    app = app or current_app
+    return app.config['ARCHIVE_DIR'] or os.path.join(
+        os.path.dirname(os.path.abspath(app.config['DATABASE'])), 'archive')
+
+
+def archive_filename(season_key):
+    return f"farmer_data-{season_key}.db"
+
+
+def submission_columns(conn, schema='main'):
+    """``(name, declared type)`` of every farmer_data column, in table order."""
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info(farmer_data)")]
+
+
+def _prepare_archive(conn, alias, columns):
+    """Create the archive's farmer_data table, or add columns the hot table gained since."""
+    existing = {name for name, _ in submission_columns(conn, alias)}
+    if not existing:
+        definitions = ", ".join(
+            "id INTEGER PRIMARY KEY" if name == 'id' else f"{name} {declared}".strip()
+            for name, declared in columns
+        )
+        conn.execute(f"CREATE TABLE {alias}.farmer_data ({definitions})")
+        conn.execute(f"CREATE INDEX {alias}.idx_farmer_data_created_at ON farmer_data(created_at)")
+        conn.execute(f"CREATE INDEX {alias}.idx_farmer_data_farmer_id ON farmer_data(farmer_id)")
+        return
+    for name, declared in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {alias}.farmer_data ADD COLUMN {name} {declared}".strip())
+
+
+def _same_row(names, left, right):
+    """SQL that is true when ``left`` and ``right`` agree on every column in ``names``."""
+    return " AND ".join(f"{left}.{name} IS {right}.{name}" for name in names)
+
+
+def _raise_sequence(conn, alias):
+    """Keep new submission ids above every id in the archive, even after a sequence reset."""
+    highest = conn.execute(f"SELECT MAX(id) FROM {alias}.farmer_data").fetchone()[0]
+    if highest is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'farmer_data' AND seq < ?",
+                     (highest, highest))
+
+
+def _attach(conn, path, alias):
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+
+
+def _detach(conn, alias):
+    if conn.in_transaction:
+        conn.rollback()
+    conn.execute("DETACH DATABASE " + alias)
+
+
+# --- Archiving ---
+class ArchiveReport:
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.moved = {}
+        self.batches = 0
+        self.finished = True
+        self.conflict = None
+
+    def add(self, season_key, rows):
+        self.moved[season_key] = self.moved.get(season_key, 0) + rows
+        self.batches += 1
+
+    def as_dict(self):
+        return {'cutoff': self.cutoff.isoformat(), 'moved': self.moved,
+                'rows': sum(self.moved.values()), 'batches': self.batches, 'finished': self.finished,
+                'conflict': {'season': self.conflict.season_key, 'ids': self.conflict.ids} if self.conflict else None}
+
+
+def _first_day(conn, cutoff):
+    # The lower bound skips blank and malformed dates, which are never archived
+    first = conn.execute("""
+        SELECT MIN(created_at) FROM farmer_data
+        WHERE created_at >= '1900-01-01' AND created_at < ?
+    """, (cutoff.isoformat(),)).fetchone()[0]
+    try:
+        return datetime.strptime(first[:10], '%Y-%m-%d').date() if first else None
+    except ValueError:
+        return None
+
+
+def move_batch(conn, season, upper, alias, columns, batch_rows):
+    """Move up to ``batch_rows`` rows of ``season`` (created before ``upper``); returns how many."""
+    ids = [row[0] for row in conn.execute("""
+        SELECT id FROM farmer_data WHERE created_at >= ? AND created_at < ? LIMIT ?
+    """, (season.start.isoformat(), upper.isoformat(), batch_rows))]
+    if not ids:
+        return 0
+    placeholders = ",".join("?" * len(ids))
+    names = ", ".join(name for name, _ in columns)
+    same = _same_row([name for name, _ in columns], 'a', 'fd')
+
+    # Step 1: copy, writing only the archive file
+    try:
+        conn.execute(f"""
+            INSERT INTO {alias}.farmer_data ({names})
+            SELECT {names} FROM main.farmer_data fd
+            WHERE fd.id IN ({placeholders})
+              AND NOT EXISTS (SELECT 1 FROM {alias}.farmer_data a WHERE a.id = fd.id AND {same})
+        """, ids)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        conflicts = [row[0] for row in conn.execute(f"""
+            SELECT fd.id FROM main.farmer_data fd JOIN {alias}.farmer_data a ON a.id = fd.id
+            WHERE fd.id IN ({placeholders}) AND NOT ({same})
+            ORDER BY fd.id
+        """, ids)]
+        raise ArchiveConflict(season.key, conflicts)
+    conn.commit()
+
+    # Step 2: a short write transaction on the hot database, deleting only rows archived as they are
+    where = f"fd.id IN ({placeholders}) AND EXISTS (SELECT 1 FROM {alias}.farmer_data a WHERE a.id = fd.id AND {same})"
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT INTO archive_guard (active) VALUES (1)")
+        rollups.add_archived(conn, where, ids)
+        trends.add_archived(conn, where, ids)
+        moved = conn.execute(f"DELETE FROM main.farmer_data AS fd WHERE {where}", ids).rowcount
+        conn.execute("DELETE FROM archive_guard")
+        conn.execute("""
+            INSERT INTO archives (season, filename, starts, ends, rows, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(season) DO UPDATE SET rows = rows + excluded.rows, updated_at = excluded.updated_at
+        """, (season.key, archive_filename(season.key), season.start.isoformat(), season.end.isoformat(),
+              moved, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
+
+
+def run(conn, directory, cutoff, batch_rows=500, pause_ms=50, max_batches=0, progress=None):
+    """Archive every dated row created before ``cutoff``, oldest season first.
+
+    ``conn`` must be a dedicated connection (archives are attached to it).
+    ``max_batches`` (0 = no limit) lets a cron job spread the work out.
+    A batch that conflicts with its archive stops the run: the report's
+    ``conflict`` names the season and ids, which stay in the hot table.
+    """
+    report = ArchiveReport(cutoff)
+    first = _first_day(conn, cutoff)
+    if first is None:
+        return report
+    os.makedirs(directory, exist_ok=True)
+    columns = submission_columns(conn)
+    for season in seasons_before(first, cutoff):
+        upper = min(season.end, cutoff)
+        alias = ALIAS_PREFIX + 'target'
+        _attach(conn, os.path.join(directory, archive_filename(season.key)), alias)
+        try:
+            _prepare_archive(conn, alias, columns)
+            _raise_sequence(conn, alias)
+            conn.commit()
+            while True:
+                if max_batches and report.batches >= max_batches:
+                    report.finished = False
+                    return report
+                try:
+                    moved = move_batch(conn, season, upper, alias, columns, batch_rows)
+                except ArchiveConflict as conflict:
+                    report.conflict = conflict
+                    report.finished = False
+                    return report
+                if not moved:
+                    break
+                report.add(season.key, moved)
+                if progress:
+                    progress(season, moved)
+                time.sleep(pause_ms / 1000.0)
+        finally:
+            _detach(conn, alias)
+    return report
+
+
+def catalog(conn):
+    return conn.execute("""
+        SELECT season, filename, starts, ends, rows, updated_at FROM archives ORDER BY starts
+    """).fetchall()
+
+
+# --- Deleting and reassigning archived rows ---
+def _each_archive(conn, directory=None):
+    """``(season, alias)`` for every catalogued archive file, attached one at a time."""
+    directory = directory or archive_dir()
+    alias = ALIAS_PREFIX + 'target'
+    for entry in catalog(conn):
+        path = os.path.join(directory, entry['filename'])
+        if not os.path.exists(path):
+            continue
+        _attach(conn, path, alias)
+        try:
+            yield entry['season'], alias
+        finally:
+            _detach(conn, alias)
+
+
+def _change_rows(conn, where, params, directory, farmer):
+    changed = {}
+    if not has_archives(conn):
+        return changed
+    for season_key, alias in _each_archive(conn, directory):
+        table = f"{alias}.farmer_data"
+        names = [name for name, _ in submission_columns(conn, alias)]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS archive_change (
+                    id INTEGER PRIMARY KEY, counted INTEGER NOT NULL
+                )
+            """)
+            conn.execute("DELETE FROM temp.archive_change")
+            # A row identical to a hot one is a copy left by an interrupted move; the hot row counts it
+            conn.execute(f"""
+                INSERT INTO temp.archive_change (id, counted)
+                SELECT fd.id, NOT EXISTS (SELECT 1 FROM main.farmer_data hot
+                                          WHERE hot.id = fd.id AND {_same_row(names, 'hot', 'fd')})
+                FROM {table} fd WHERE {where}
+            """, params)
+            rows = conn.execute(f"""
+                SELECT fd.id, fd.farmer_id FROM {table} fd
+                WHERE fd.id IN (SELECT id FROM temp.archive_change) ORDER BY fd.id
+            """).fetchall()
+            if rows:
+                counted = "fd.id IN (SELECT id FROM temp.archive_change WHERE counted)"
+                for module in (rollups, trends, registry):
+                    module.count_archived(conn, table, counted, sign=-1)
+                if farmer is None:
+                    conn.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM temp.archive_change)")
+                    conn.execute("""
+                        UPDATE archives SET rows = MAX(rows - ?, 0), updated_at = ? WHERE season = ?
+                    """, (len(rows), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), season_key))
+                else:
+                    conn.execute(f"""
+                        UPDATE {table} SET farmer_id = ?, name = ?
+                        WHERE id IN (SELECT id FROM temp.archive_change)
+                    """, (farmer['id'], farmer['name']))
+                    for module in (rollups, trends, registry):
+                        module.count_archived(conn, table, counted, sign=1)
+                changed[season_key] = [tuple(row) for row in rows]
+            conn.execute("DROP TABLE temp.archive_change")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return changed
+
+
+def delete_rows(conn, where, params=(), directory=None):
+    """Delete the archived rows matching ``where`` (alias ``fd``); returns ``{season: [(id, farmer_id)]}``.
+
+    Each archive file is changed in its own transaction, so call it before
+    deleting the same rows from the hot table, outside a transaction.
+    """
+    return _change_rows(conn, where, params, directory, None)
+
+
+def reassign_rows(conn, where, params, farmer, directory=None):
+    """Hand the archived rows matching ``where`` to ``farmer`` (id and name); returns like delete_rows()."""
+    return _change_rows(conn, where, params, directory, farmer)
+
+
+# --- Reading across tiers ---
+class History:
+    """The tables a query should read: the hot table first, then attached archives."""
+
+    def __init__(self, sources, skipped=()):
+        self.sources = sources
+        self.seasons = [source.season for source in sources if source.season]
+        self.skipped = list(skipped)
+
+    @property
+    def archived(self):
+        return bool(self.seasons)
+
+
+def _overlapping(conn, date_from, date_to):
+    """Catalog entries whose season overlaps [date_from, date_to], newest first."""
+    clauses, params = ["rows > 0"], []
+    if date_from:
+        clauses.append("ends > ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("starts <= ?")
+        params.append(date_to)
+    return conn.execute(f"""
+        SELECT season, filename FROM archives WHERE {" AND ".join(clauses)} ORDER BY starts DESC
+    """, params).fetchall()
+
+
+@contextmanager
+def historical(conn, date_from=None, date_to=None, directory=None):
+    """Attach the archives a dashboard date range reaches back into.
+
+    Without a date range only the hot table is read. At most ``MAX_ATTACHED``
+    seasons are attached (the newest); the rest are listed in ``skipped``.
+    """
+    if not date_from and not date_to:
+        yield History([HOT])
+        return
+    entries = _overlapping(conn, date_from, date_to)
+    if not entries:
+        yield History([HOT])
+        return
+
+    directory = directory or archive_dir()
+    attached, sources = [], [HOT]
+    try:
+        for entry in entries[:MAX_ATTACHED]:
+            path = os.path.join(directory, entry['filename'])
+            if not os.path.exists(path):
+                continue
+            alias = f"{ALIAS_PREFIX}{len(attached)}"
+            _attach(conn, path, alias)
+            attached.append(alias)
+            columns = frozenset(name for name, _ in submission_columns(conn, alias))
+            sources.append(Source(f"{alias}.farmer_data", columns, entry['season']))
+        yield History(sources, [entry['season'] for entry in entries[MAX_ATTACHED:]])
+    finally:
+        for alias in attached:
+            try:
+                _detach(conn, alias)
+            except sqlite3.Error:
+                pass
+
+
+def union_all(sources, columns, where='1', params=(), alias='fd', tier=None):
+    """``SELECT columns FROM source alias WHERE where`` over every source, joined by UNION ALL.
+
+    Returns ``(sql, params)``. Columns an older archive lacks read as NULL.
+    Archive rows identical to a hot row are skipped, because those are copies
+    from an interrupted move. With ``tier``, each row also gets a column of
+    that name holding its source's position, which tells apart rows of
+    different sources that share an id.
+    """
+    parts, all_params = [], []
+    for position, source in enumerate(sources):
+        if source.columns is None:
+            select = ", ".join(f"{alias}.{column}" for column in columns)
+            clause = where
+        else:
+            select = ", ".join(f"{alias}.{column}" if column in source.columns else f"NULL AS {column}"
+                               for column in columns)
+            same = _same_row(sorted(source.columns), 'hot', alias)
+            clause = f"({where}) AND NOT EXISTS (SELECT 1 FROM main.farmer_data hot WHERE hot.id = {alias}.id AND {same})"
+        if tier:
+            select += f", {position} AS {tier}"
+        parts.append(f"SELECT {select} FROM {source.table} {alias} WHERE {clause}")
+        all_params.extend(params)
+    return " UNION ALL ".join(parts), all_params
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
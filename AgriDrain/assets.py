@@ -0,0 +1,286 @@
+"""Static asset pipeline: page CSS/JS as minified, content-hashed bundles.
+
+Page styles and scripts live as plain files under ``static/src/`` (``css/``
+and ``js/``, one file per template). Templates reference them with
+``asset_url('css/dashboard.css')``. ``flask build-assets`` minifies every
+source file into ``static/build/<name>.<hash>.<ext>`` and records the mapping
+in ``static/build/manifest.json``. Because a bundle's name changes with its
+content, build files are served with a one-year ``immutable`` Cache-Control,
+and browsers on slow links download each page's CSS/JS only once.
+
+Without a manifest (a fresh checkout before the first build) ``asset_url``
+falls back to the unminified source file, so the app works unbuilt.
+
+``flask build-assets --extract`` is the one-off migration that moved the
+inline ``<style>``/``<script>`` blocks out of the templates. Blocks containing
+Jinja syntax are left inline, because their content depends on the request.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import current_app, request, url_for
+
+SOURCE_DIR = 'src'
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+INLINE_BLOCK = re.compile(r'<(style|script)(\s[^>]*)?>(.*?)</\1>(?:\r?\n)?', re.S)
+ASSET_REFERENCE = re.compile(r"asset_url\('([^']+)'\)")
+JINJA_SYNTAX = ('{{', '{%', '{#')
+
+
+# --- Minification ---
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+CSS_SPACE_AFTER_COLON = re.compile(r':\s+')
+
+
+def minify_css(source):
+    """Drop comments and redundant whitespace; quoted strings are left untouched."""
+    strings = []
+
+    def keep(match):
+        strings.append(match.group(0))
+        return f"\x00{len(strings) - 1}\x00"
+
+    css = CSS_STRING.sub(keep, CSS_COMMENT.sub('', source))
+    css = re.sub(r'\s+', ' ', css)
+    css = CSS_SPACE_AROUND.sub(r'\1', css)
+    css = CSS_SPACE_AFTER_COLON.sub(':', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\x00(\d+)\x00', lambda m: strings[int(m.group(1))], css)
+
+
+def minify_js(source):
+    """Line-preserving JS minification: indentation, blank and ``//`` comment lines go.
+
+    Statements stay on their own lines, so automatic semicolon insertion and
+    multi-line template literals behave exactly as in the source.
+    """
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith('//'):
+            lines.append(stripped)
+    return "\n".join(lines)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# --- Build ---
+def _static_path(static_folder, *parts):
+    return os.path.join(static_folder, *parts)
+
+
+def source_files(static_folder):
+    root = _static_path(static_folder, SOURCE_DIR)
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1] in MINIFIERS:
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root).replace(os.sep, '/'), path
+
+
+def build(static_folder):
+    """Minify and fingerprint every source asset; return the new manifest."""
+    build_root = _static_path(static_folder, BUILD_DIR)
+    manifest = {}
+    for name, path in source_files(static_folder):
+        stem, ext = os.path.splitext(name)
+        with open(path, encoding='utf-8') as f:
+            content = MINIFIERS[ext](f.read()).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        built = f"{stem}.{digest}{ext}"
+        target = os.path.join(build_root, built)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            with open(target, 'wb') as f:
+                f.write(content)
+        manifest[name] = built
+
+    # Remove bundles that no longer belong to any source file
+    current = {os.path.normpath(os.path.join(build_root, built)) for built in manifest.values()}
+    for dirpath, _, filenames in os.walk(build_root):
+        for filename in filenames:
+            path = os.path.normpath(os.path.join(dirpath, filename))
+            if filename != MANIFEST_NAME and path not in current:
+                os.remove(path)
+
+    os.makedirs(build_root, exist_ok=True)
+    with open(os.path.join(build_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    manifest_cache.clear()
+    return manifest
+
+
+# --- Extraction (one-off migration of inline blocks) ---
+def _asset_tag(kind, name, newline):
+    if kind == 'style':
+        return f'<link rel="stylesheet" href="{{{{ asset_url(\'{name}\') }}}}">{newline}'
+    return f'<script src="{{{{ asset_url(\'{name}\') }}}}"></script>{newline}'
+
+
+def extract(template_folder, static_folder):
+    """Move static inline blocks into src/css and src/js; return {template: [kept inline]}."""
+    kept = {}
+    for filename in sorted(os.listdir(template_folder)):
+        if not filename.endswith('.html'):
+            continue
+        path = os.path.join(template_folder, filename)
+        # newline='' keeps each template's own (CRLF or LF) line endings
+        with open(path, encoding='utf-8', newline='') as f:
+            html = f.read()
+        page = os.path.splitext(filename)[0]
+        newline = '\r\n' if '\r\n' in html else '\n'
+        sources = {'style': [], 'script': []}
+        inline = []
+
+        def replace(match):
+            kind, attrs, body = match.group(1), match.group(2) or '', match.group(3)
+            if 'src=' in attrs or any(token in body for token in JINJA_SYNTAX):
+                if 'src=' not in attrs:
+                    inline.append(kind)
+                return match.group(0)
+            sources[kind].append(body.strip('\r\n'))
+            if len(sources[kind]) > 1:
+                # Later blocks of the same kind are appended to the page's one bundle
+                return ''
+            ext = 'css' if kind == 'style' else 'js'
+            return _asset_tag(kind, f"{ext}/{page}.{ext}", newline)
+
+        rewritten = INLINE_BLOCK.sub(replace, html)
+        for kind, blocks in sources.items():
+            if not blocks:
+                continue
+            ext = 'css' if kind == 'style' else 'js'
+            target = _static_path(static_folder, SOURCE_DIR, ext, f"{page}.{ext}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(_dedent("\n\n".join(blocks)) + "\n")
+        if rewritten != html:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(rewritten)
+        if inline:
+            kept[filename] = inline
+    return kept
+
+
+def _dedent(text):
+    lines = text.splitlines()
+    indents = [len(line) - len(line.lstrip()) for line in lines if line.strip()]
+    margin = min(indents) if indents else 0
+    return "\n".join(line[margin:] for line in lines)
+
+
+# --- Bytes-per-page report ---
+def _gzip_size(data):
+    return len(gzip.compress(data, 6, mtime=0))
+
+
+def page_report(template_folder, static_folder):
+    """Per template: bytes sent with everything inline vs. with cached external bundles.
+
+    ``inline`` is the template with its referenced source assets pasted back
+    in (what every view cost before), ``first_view`` is the template plus the
+    minified bundles, ``repeat_view`` is the template alone, because bundles
+    are then served from the browser cache. All sizes are gzip-compressed
+    bytes of the template source, so Jinja output is not included.
+    """
+    manifest = load_manifest(static_folder)
+    rows = []
+    for filename in sorted(os.listdir(template_folder)):
+        if not filename.endswith('.html'):
+            continue
+        with open(os.path.join(template_folder, filename), 'rb') as f:
+            html = f.read()
+        raw_assets, built_assets = b'', b''
+        for name in ASSET_REFERENCE.findall(html.decode('utf-8')):
+            with open(_static_path(static_folder, SOURCE_DIR, name), 'rb') as f:
+                raw_assets += f.read()
+            built = manifest.get(name)
+            if built:
+                with open(_static_path(static_folder, BUILD_DIR, built), 'rb') as f:
+                    built_assets += f.read()
+        if not raw_assets:
+            continue
+        rows.append({
+            'template': filename,
+            'inline': _gzip_size(html + raw_assets),
+            'first_view': _gzip_size(html) + (_gzip_size(built_assets) if built_assets else _gzip_size(raw_assets)),
+            'repeat_view': _gzip_size(html),
+        })
+    return rows
+
+
+# --- Runtime ---
+def load_manifest(static_folder):
+    path = _static_path(static_folder, BUILD_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ManifestCache:
+    """The build manifest, re-read when its mtime changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._manifest = {}
+
+    def get(self, static_folder):
+        path = _static_path(static_folder, BUILD_DIR, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                self._manifest = load_manifest(static_folder) if mtime else {}
+                self._mtime = mtime
+        return self._manifest
+
+    def clear(self):
+        with self._lock:
+            self._mtime = None
+
+
+manifest_cache = ManifestCache()
+
+
+def manifest_path(app=None):
+    app = app or current_app
+    return _static_path(app.static_folder, BUILD_DIR, MANIFEST_NAME)
+
+
+def asset_url(name):
+    """URL of a page asset: the fingerprinted bundle if built, else the source file."""
+    built = manifest_cache.get(current_app.static_folder).get(name)
+    if built:
+        return url_for('static', filename=f"{BUILD_DIR}/{built}")
+    return url_for('static', filename=f"{SOURCE_DIR}/{name}")
+
+
+def _immutable_bundles(response):
+    if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith(BUILD_DIR + '/'):
+        if response.status_code in (200, 304):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+    return response
+
+
+def init_app(app):
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(_immutable_bundles)
@@ -0,0 +1,80 @@
+"""Measure bulk-import throughput on a generated CSV file.
+
+Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_import --rows 500000 --farmers 50000
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import tempfile
+
+import imports
+import knowledge
+import migrations
+
+
+def write_farmers(path, n):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'mobile', 'password'])
+        for i in range(n):
+            writer.writerow([f'Farmer {i}', f'9{i:09d}', 'secret'])
+
+
+def write_submissions(path, n, farmers, seed=7):
+    kb = knowledge.get_knowledge_base()
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['mobile', 'soil_type', 'water_level', 'crop', 'farm_address',
+                         'latitude', 'longitude', 'created_at'])
+        for i in range(n):
+            soil = rng.choice(kb.soil_types)
+            water = rng.choice(kb.water_levels)
+            crops = kb.recommendations(soil, water) or kb.crops
+            # ~1% of rows carry an unknown crop to exercise the error path
+            crop = 'Unknown Crop' if rng.random() < 0.01 else rng.choice(crops)
+            writer.writerow([
+                f'9{rng.randrange(farmers):09d}', soil, water, crop, f'Village {i % 900}',
+                round(rng.uniform(16.0, 21.0), 6), round(rng.uniform(73.0, 80.0), 6),
+                f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00',
+            ])
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    migrations.migrate(conn)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--farmers', type=int, default=50000)
+    parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        farmers_csv = os.path.join(tmp, 'farmers.csv')
+        submissions_csv = os.path.join(tmp, 'submissions.csv')
+        write_farmers(farmers_csv, args.farmers)
+        write_submissions(submissions_csv, args.rows, args.farmers)
+        conn = connect(os.path.join(tmp, 'bench.db'))
+
+        for kind, path in (('farmers', farmers_csv), ('submissions', submissions_csv)):
+            with open(path, 'rb') as f:
+                report = imports.import_file(conn, kind, f, path, batch_size=args.batch_size).as_dict()
+            print(f"{kind:<12} read={report['read']:>9,} inserted={report['inserted']:>9,} "
+                  f"rejected={report['rejected']:>7,} {report['seconds']:8.2f} s "
+                  f"{report['rows_per_second']:>10,} rows/s")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
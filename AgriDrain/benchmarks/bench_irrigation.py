@@ -0,0 +1,123 @@
+"""Irrigation plans for many farms: per-farm loop vs the vectorized, cached schedule engine.
+
+1. A scalar reference runs the same water balance one farm and one day at a
+   time in plain Python, on ``--sample`` farms; its rate is extrapolated.
+2. ``engine.lookup()`` plans ``--farms`` random farms (crop, soil, water
+   level, sowing week) with an empty cache, where every distinct key is
+   simulated in one NumPy batch, and then again with every plan cached.
+3. ``schedules.schedule_submissions()`` plans every active submission of a
+   benchmarks/datasets.py database of ``--size``, as /irrigation/schedules.json
+   does page by page.
+
+Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_irrigation
+    python -m benchmarks.bench_irrigation --farms 100000 --size 1m
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import schedules
+from benchmarks import datasets
+from benchmarks.bench_routes import DEFAULT_DATA_DIR, prepare_database
+
+
+def make_farms(engine, n, seed=42):
+    rng = random.Random(seed)
+    crops = [rng.choice(engine.crops) for _ in range(n)]
+    soils = [rng.choice(engine.soils) for _ in range(n)]
+    waters = [rng.choice(engine.water_levels) for _ in range(n)]
+    weeks = [rng.randrange(schedules.WEEKS) for _ in range(n)]
+    return crops, soils, waters, weeks
+
+
+def per_farm_plan(engine, crop, soil, water, week):
+    """The engine's water balance for one farm, one day at a time; returns the irrigation days."""
+    c, s, w = engine.crop_index[crop], engine.soil_index[soil], engine.water_index[water]
+    l1, l2, l3, l4 = (int(end) for end in engine.stage_ends[c])
+    kc_ini, kc_mid, kc_end = (float(kc) for kc in engine.kc[c])
+    total = float(engine.available_water[s] * engine.root_depth[c])
+    allowed = float(engine.depletion_fraction[c]) * total
+    percolation = float(engine.percolation[s] * engine.ponded[c])
+    capillary = float(engine.capillary[w])
+    depletion, days = 0.0, []
+    for day in range(l4):
+        if day < l1:
+            kc = kc_ini
+        elif day < l2:
+            kc = kc_ini + (kc_mid - kc_ini) * (day - l1) / max(l2 - l1, 1)
+        elif day < l3:
+            kc = kc_mid
+        else:
+            kc = kc_mid + (kc_end - kc_mid) * (day - l3) / max(l4 - l3, 1)
+        doy = (week * 7 + day) % schedules.DAYS_IN_YEAR
+        change = kc * float(engine.et0[doy]) + percolation - float(engine.rain[doy]) - capillary
+        depletion = min(max(depletion + change, 0.0), total)
+        if depletion >= allowed:
+            days.append(day)
+            depletion = 0.0
+    return days
+
+
+def timed(label, n, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<46} {elapsed * 1000:10.1f} ms  {n / elapsed:14,.0f} farms/s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--farms', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=2000, help='farms run through the scalar reference')
+    parser.add_argument('--size', choices=sorted(datasets.SIZES, key=datasets.SIZES.get), default='100k')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated datasets are cached')
+    args = parser.parse_args()
+
+    engine = schedules.ScheduleEngine(schedules.get_engine().kb)
+    crops, soils, waters, weeks = make_farms(engine, args.farms)
+    print(f"{args.farms:,} farms, {len(engine.crops)} crops x {len(engine.soils)} soils x "
+          f"{len(engine.water_levels)} water levels x {schedules.WEEKS} sowing weeks")
+
+    sample = min(args.sample, args.farms)
+    farms = list(zip(crops, soils, waters, weeks))[:sample]
+    _, scalar = timed(f"per-farm Python loop ({sample:,} farms)", sample,
+                      lambda: [per_farm_plan(engine, *farm) for farm in farms])
+    print(f"{'  extrapolated to all farms':<46} {scalar / sample * args.farms * 1000:10.1f} ms")
+
+    keys, _ = timed("engine.encode()", args.farms, engine.encode, crops, soils, waters, weeks)
+    distinct = len(np.unique(keys))
+    (plans, inverse), _ = timed(f"engine.lookup() cold ({distinct:,} keys simulated)", args.farms, engine.lookup, keys)
+    timed("engine.lookup() warm (all cached)", args.farms, engine.lookup, keys)
+
+    # The batch must agree with the scalar reference
+    for i in range(0, args.farms, max(1, args.farms // 200)):
+        expected = per_farm_plan(engine, crops[i], soils[i], waters[i], weeks[i])
+        if plans[inverse[i]].days.tolist() != expected:
+            print(f"❌ farm {i}: batch plan differs from the per-farm loop")
+            raise SystemExit(1)
+    print("✅ batch plans match the per-farm loop on a sample of 200 farms")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = prepare_database(args.size, args.data_dir, workdir)
+        rows, _ = datasets.describe(database)
+        conn = sqlite3.connect(database)
+        try:
+            schedules._engine = None
+            result, elapsed = timed(f"schedule_submissions() {args.size} dataset, cold", rows,
+                                    lambda: sum(1 for _ in schedules.schedule_submissions(conn)))
+            print(f"{'  active submissions planned':<46} {result:10,}")
+            timed(f"schedule_submissions() {args.size} dataset, warm", rows,
+                  lambda: sum(1 for _ in schedules.schedule_submissions(conn)))
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
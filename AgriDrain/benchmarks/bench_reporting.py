@@ -0,0 +1,153 @@
+"""Farmer submission latency while admins run analytics, with and without the reporting snapshot.
+
+gunicorn is started from gunicorn.conf.py against a copy of a
+benchmarks/datasets.py database, once per scenario:
+
+1. ``writes only`` - ``--farmers`` client processes post /farmer in a loop.
+2. ``live analytics`` - the same farmers, plus ``--admins`` client
+   processes cycling through full exports, filtered dashboard summaries,
+   /reports and the trend series, all read from the live database.
+3. ``snapshot analytics`` - the same load with ``AGRIDRAIN_REPORTING_SNAPSHOT=1``.
+   A snapshot is taken before the run, and the refresher re-takes it every
+   1000 writes (the default) while the run goes on, so its cost is included.
+
+For each scenario the p50/p95/p99/max latency of the farmer POSTs and the
+request rates of both groups are reported. Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_reporting
+    python -m benchmarks.bench_reporting --size 1m --farmers 4 --admins 2 --duration 30
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import reporting
+from benchmarks import datasets
+from benchmarks.bench_routes import DEFAULT_DATA_DIR, percentile, prepare_database
+from benchmarks.bench_serving import SUBMISSION, free_port, login, request, start_server, stop_server
+
+ANALYTICS = [
+    '/export/submissions.csv',
+    '/dashboard?crop=Rice',
+    '/reports',
+    '/reports/trends.json?dimension=crop&grain=week',
+    '/dashboard?soil_type=Black+Soil&water_level=Moderate+%282m+-+5m%29',
+    '/export/farmers.csv',
+]
+SCENARIOS = [
+    ('writes only', False, False),
+    ('live analytics', True, False),
+    ('snapshot analytics', True, True),
+]
+
+
+def run_client(port, role, worker, start_at, duration):
+    """One client process: a farmer posting submissions or an admin cycling through ANALYTICS."""
+    if role == 'farmer':
+        cookie = login(port, '/farmer_login', {'name': datasets.farmer_name(worker), 'password': datasets.PASSWORD})
+    else:
+        cookie = login(port, '/admin_login', {'username': datasets.ADMIN[0], 'password': datasets.ADMIN[1]})
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + duration
+    i = worker
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'farmer':
+                response = request(conn, 'POST', '/farmer', cookie, SUBMISSION)
+            else:
+                response = request(conn, 'GET', ANALYTICS[i % len(ANALYTICS)], cookie)
+                i += 1
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return role, latencies, errors
+
+
+def run_load(port, farmers, admins, duration, farmer_count):
+    start_at = time.time() + 1.0
+    jobs = [(port, 'farmer', n % farmer_count, start_at, duration) for n in range(farmers)]
+    jobs += [(port, 'admin', n, start_at, duration) for n in range(admins)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.starmap(run_client, jobs)
+    writes = sorted(value for role, latencies, _ in results if role == 'farmer' for value in latencies)
+    reads = [value for role, latencies, _ in results if role == 'admin' for value in latencies]
+    return {
+        'writes': len(writes),
+        'writes_per_s': round(len(writes) / duration, 1),
+        'p50_ms': percentile(writes, 50),
+        'p95_ms': percentile(writes, 95),
+        'p99_ms': percentile(writes, 99),
+        'max_ms': round(writes[-1] * 1000, 2) if writes else 0.0,
+        'analytics_per_s': round(len(reads) / duration, 2),
+        'errors': sum(errors for _, _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(datasets.SIZES, key=datasets.SIZES.get), default='100k')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--farmers', type=int, default=4, help='client processes posting submissions')
+    parser.add_argument('--admins', type=int, default=2, help='client processes running analytics')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds of load per scenario')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated datasets are cached')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cached = prepare_database(args.size, args.data_dir, workdir)
+        rows, farmer_count = datasets.describe(cached)
+        print(f"dataset {args.size}: {rows:,} submissions, {farmer_count:,} farmers")
+
+        for name, analytics, snapshot in SCENARIOS:
+            # Every scenario starts from the same data, not from the previous run's writes
+            database = os.path.join(workdir, 'reporting.db')
+            for path in (database, database + '-wal', database + '-shm', os.path.splitext(database)[0] + '.reporting.db'):
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.copyfile(cached, database)
+            env = {}
+            if snapshot:
+                env['AGRIDRAIN_REPORTING_SNAPSHOT'] = '1'
+                started = time.perf_counter()
+                reporting.take_snapshot(database, os.path.splitext(database)[0] + '.reporting.db')
+                print(f"initial snapshot: {time.perf_counter() - started:.2f} s")
+            port = free_port()
+            server, _ = start_server(database, args.workers, port, env)
+            try:
+                results[name] = run_load(port, args.farmers, args.admins if analytics else 0,
+                                         args.duration, farmer_count)
+            finally:
+                stop_server(server)
+
+    print(f"\n{args.workers} workers, {args.farmers} farmer + {args.admins} admin clients x {args.duration:g} s")
+    print(f"{'scenario':<20} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'analytics/s':>12}  errors")
+    for name, result in results.items():
+        print(f"{name:<20} {result['writes_per_s']:>9,.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['max_ms']:>8.2f} {result['analytics_per_s']:>12.2f}  "
+              f"{result['errors'] or ''}")
+    print(f"\n(on {os.cpu_count()} CPU core(s))")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'workers': args.workers, 'farmers': args.farmers,
+                       'admins': args.admins, 'duration': args.duration, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Load and latency benchmark for the app's routes on a synthetic dataset.
+
+Builds (or reuses) a database with ``--size`` submissions from
+benchmarks/datasets.py. It then drives every route through the Flask test
+client from ``--workers`` threads. Each thread logs in for real as the admin
+and as its own farmer. Throughput and p50/p95/p99 latency are reported per
+route. The run fails when a route's p95 is above the baseline stored for that
+dataset size in route_baselines.json, or when a route returns errors.
+Everything runs in-process against a local SQLite file, so no network is
+needed. Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_routes --size 10k
+    python -m benchmarks.bench_routes --size 100k --workers 16 --requests 400
+    python -m benchmarks.bench_routes --size 1m --routes dashboard,reports,map_clusters
+    python -m benchmarks.bench_routes --size 1m --workers 1 --routes search,search_broad,search_faceted
+    python -m benchmarks.bench_routes --size 10k --save-baseline   # after a deliberate change
+
+Generated datasets are cached in ``--data-dir``, so only the first run at a
+size pays for generation. Each run works on a fresh copy of the cached file.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks import datasets
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'route_baselines.json')
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'agridrain-bench')
+OK_STATUSES = (200, 304)
+# Floor for stored p95 limits; below this, thread scheduling noise dominates
+MIN_LIMIT_MS = 25.0
+
+
+class Route:
+    def __init__(self, name, role, path, method='GET', form=None):
+        self.name = name
+        self.role = role
+        self.path = path
+        self.method = method
+        self.form = form
+
+
+def build_routes(kb):
+    crop = 'Rice' if 'Rice' in kb.crops else kb.crops[0]
+    soil, water = kb.soil_types[0], kb.water_levels[0]
+    month_ago = (date.today() - timedelta(days=30)).isoformat()
+    district, lat, lon = datasets.DISTRICTS[0]
+    submission = {'soil': soil, 'water': water, 'crop': crop, 'farm_address': f'Village 1, {district}',
+                  'latitude': str(lat), 'longitude': str(lon)}
+    return [
+        Route('home', 'guest', '/'),
+        Route('crop_guide', 'guest', '/rice'),
+        Route('farmer_form', 'farmer', '/farmer'),
+        Route('farmer_submit', 'farmer', '/farmer', method='POST', form=submission),
+        Route('suggestion', 'farmer', '/suggestion'),
+        Route('farmer_history', 'farmer', '/farmer/history'),
+        Route('dashboard', 'admin', '/dashboard'),
+        Route('dashboard_filtered', 'admin', f'/dashboard?crop={crop}&soil_type={soil}&date_from={month_ago}'),
+        Route('search', 'admin', f'/search/submissions.json?q=Village+12+{district}'),
+        Route('search_broad', 'admin', f'/search/submissions.json?q={district}&page=3'),
+        Route('search_faceted', 'admin', f'/search/submissions.json?q={district}&crop={crop}&soil_type={soil}'),
+        Route('farmer_registry', 'admin', '/farmer_data'),
+        Route('farmer_registry_sorted', 'admin', '/farmer_data?sort=submissions&order=desc&after=100'),
+        Route('reports', 'admin', '/reports'),
+        Route('report_trends', 'admin', '/reports/trends.json?dimension=crop&grain=week'),
+        Route('db_stats', 'admin', '/db_stats'),
+        Route('batch_scoring', 'admin', f'/recommendations/batch?crop={crop}&limit=200'),
+        Route('geo_nearby', 'admin', f'/geo/nearby?lat={lat}&lon={lon}&k=20'),
+        Route('geo_district', 'admin', f'/geo/district/{district}'),
+        Route('map_clusters', 'admin', '/map/clusters?south=6&west=68&north=36&east=98&z=5'),
+        Route('export_filtered', 'admin', f'/export/submissions.csv?crop={crop}&date_from={month_ago}'),
+    ]
+
+
+def prepare_database(size, data_dir, workdir):
+    """Copy of the cached dataset for ``size``, generating the cache on first use."""
+    rows = datasets.SIZES[size]
+    os.makedirs(data_dir, exist_ok=True)
+    cached = os.path.join(data_dir, f'routes-{size}.db')
+    if not os.path.exists(cached) or datasets.describe(cached)[0] != rows:
+        print(f"generating {rows:,} submissions into {cached} ...")
+        start = time.perf_counter()
+        partial = cached + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        datasets.generate(partial, rows)
+        os.replace(partial, cached)
+        print(f"  done in {time.perf_counter() - start:.1f} s")
+    path = os.path.join(workdir, 'routes.db')
+    shutil.copyfile(cached, path)
+    return path
+
+
+def login(app, worker):
+    """Test clients for one worker: anonymous, logged-in farmer and logged-in admin."""
+    guest, farmer, admin = app.test_client(), app.test_client(), app.test_client()
+    farmer.post('/farmer_login', data={'name': datasets.farmer_name(worker), 'password': datasets.PASSWORD})
+    admin.post('/admin_login', data={'username': datasets.ADMIN[0], 'password': datasets.ADMIN[1]})
+    with farmer.session_transaction() as session, admin.session_transaction() as admin_session:
+        if not session.get('farmer_logged_in') or not admin_session.get('admin_logged_in'):
+            raise RuntimeError("benchmark login failed; is the dataset complete?")
+    return {'guest': guest, 'farmer': farmer, 'admin': admin}
+
+
+def request_once(client, route):
+    start = time.perf_counter()
+    response = client.open(route.path, method=route.method, data=route.form)
+    # Drain streamed bodies (exports) so their cost is measured too
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    response.close()
+    return elapsed, response.status_code
+
+
+def run_route(sessions, route, requests, warmup):
+    """Run ``requests`` calls spread over the worker sessions; return timings and errors."""
+    workers = len(sessions)
+    latencies = [[] for _ in range(workers)]
+    errors = [{} for _ in range(workers)]
+    barrier = threading.Barrier(workers + 1)
+
+    def worker(n):
+        client = sessions[n][route.role]
+        for _ in range(warmup):
+            request_once(client, route)
+        barrier.wait()
+        for _ in range(requests // workers + (n < requests % workers)):
+            elapsed, status = request_once(client, route)
+            latencies[n].append(elapsed)
+            if status not in OK_STATUSES:
+                errors[n][status] = errors[n].get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    samples = sorted(value for values in latencies for value in values)
+    merged = {}
+    for counts in errors:
+        for status, count in counts.items():
+            merged[status] = merged.get(status, 0) + count
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / wall, 1) if wall else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'errors': merged,
+    }
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of sorted ``samples`` (seconds), in milliseconds."""
+    if not samples:
+        return 0.0
+    rank = min(len(samples), max(1, math.ceil(pct / 100 * len(samples))))
+    return round(samples[rank - 1] * 1000, 2)
+
+
+def load_baselines(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(path, baselines):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def check(results, limits):
+    """Failure messages for routes that erred or whose p95 exceeds the stored limit."""
+    failures = []
+    for name, result in results.items():
+        if result['errors']:
+            statuses = ", ".join(f"{status} x{count}" for status, count in sorted(result['errors'].items()))
+            failures.append(f"{name}: non-OK responses ({statuses})")
+        limit = limits.get(name, {}).get('p95_ms')
+        if limit is not None and result['p95_ms'] > limit:
+            failures.append(f"{name}: p95 {result['p95_ms']:.2f} ms exceeds baseline {limit:.2f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(datasets.SIZES, key=datasets.SIZES.get), default='10k')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per worker and route')
+    parser.add_argument('--routes', help='comma-separated route names (default: all)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated datasets are cached')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store p95 x --headroom as the new limits for this size instead of checking')
+    parser.add_argument('--headroom', type=float, default=2.0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        import app as appmod
+        import knowledge
+
+        app = appmod.create_app({'DATABASE': prepare_database(args.size, args.data_dir, workdir),
+                                 'SECRET_KEY': 'bench'})
+        routes = build_routes(knowledge.get_knowledge_base())
+        submission = next(route.form for route in routes if route.name == 'farmer_submit')
+        if args.routes:
+            wanted = args.routes.split(',')
+            unknown = set(wanted) - {route.name for route in routes}
+            if unknown:
+                parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+            routes = [route for route in routes if route.name in wanted]
+
+        rows, farmers = datasets.describe(app.config['DATABASE'])
+        sessions = [login(app, n % farmers) for n in range(args.workers)]
+        # Give every farmer session a stored submission, as /suggestion expects
+        for session in sessions:
+            session['farmer'].post('/farmer', data=submission)
+
+        print(f"dataset {args.size}: {rows:,} submissions, {farmers:,} farmers; "
+              f"{args.workers} workers x {args.requests} requests per route")
+        results = {}
+        for route in routes:
+            results[route.name] = run_route(sessions, route, args.requests, args.warmup)
+        with app.app_context():
+            if appmod.writebehind.enabled(app):
+                appmod.writebehind.get_queue().close()
+
+    print(f"\n{'route':<20} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+    for name, result in results.items():
+        errors = sum(result['errors'].values())
+        print(f"{name:<20} {result['requests']:>8} {result['rps']:>9,.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}  {errors or ''}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'workers': args.workers, 'results': results}, f, indent=2)
+
+    baselines = load_baselines(args.baseline)
+    if args.save_baseline:
+        limits = baselines.setdefault(args.size, {})
+        for name, result in results.items():
+            limits[name] = {'p95_ms': round(max(result['p95_ms'] * args.headroom, MIN_LIMIT_MS), 1)}
+        save_baselines(args.baseline, baselines)
+        print(f"\n✅ Baseline for {args.size} written to {args.baseline}")
+        return
+
+    if args.size not in baselines:
+        print(f"\n⚠️ No baseline stored for {args.size}; only checking for errors")
+    failures = check(results, baselines.get(args.size, {}))
+    if failures:
+        print("\n❌ Regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n✅ All routes within baseline" if args.size in baselines else "\n✅ All routes answered OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Compare the vectorized scoring engine with the per-call dict lookup.
+
+Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_scoring --farms 100000
+"""
+import argparse
+import random
+import time
+
+import knowledge
+import scoring
+
+
+def make_farms(n, seed=42):
+    kb = knowledge.get_knowledge_base()
+    rng = random.Random(seed)
+    soils = [rng.choice(kb.soil_types) for _ in range(n)]
+    waters = [rng.choice(kb.water_levels) for _ in range(n)]
+    depths = [round(rng.uniform(0.5, 11.0), 2) for _ in range(n)]
+    return soils, waters, depths
+
+
+def per_call_lookup(soils, waters):
+    kb = knowledge.get_knowledge_base()
+    return [kb.recommendations(soil, water) for soil, water in zip(soils, waters)]
+
+
+def timed(label, n, func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed * 1000:10.1f} ms  {n / elapsed:14,.0f} farms/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--farms', type=int, default=100000)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    soils, waters, depths = make_farms(args.farms)
+    engine = scoring.get_engine()
+    season = scoring.current_season()
+
+    print(f"{args.farms:,} farms, {len(engine.crops)} crops, season={season}")
+    timed("per-call get_crop_recommendations()", args.farms, per_call_lookup, soils, waters)
+    timed("engine.score() categories", args.farms, engine.score, soils, waters, season)
+    timed("engine.score() numeric depths", args.farms, engine.score, soils, depths, season)
+    timed(f"engine.rank() top {args.top_k}, numeric depths", args.farms, engine.rank, soils, depths, season, args.top_k)
+
+    soil_idx = engine.encode_soils(soils)
+    membership = engine.water_membership(depths)
+    season_idx = engine.encode_seasons(season, len(soils))
+    timed("engine.score_encoded() (pre-encoded)", args.farms, engine.score_encoded, soil_idx, membership, season_idx)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Start-up time and multi-process throughput of the production server setup.
+
+Both measurements run against a copy of a benchmarks/datasets.py database:
+
+1. Start-up. A fresh interpreter imports ``app``, calls ``create_app()`` and
+   runs the (no-op) migration check, ``--startup-runs`` times; the median of
+   each step is reported. For every worker count, the time gunicorn takes from
+   launch to answering its first request is reported too.
+2. Throughput. gunicorn is started from gunicorn.conf.py (preloaded app,
+   gthread workers) with each ``--workers`` count against the same SQLite
+   file. ``--clients`` client processes then drive a mix of page views,
+   searches and farmer submissions for ``--duration`` seconds over keep-alive
+   connections. Requests/second and p50/p95 latency are reported per count.
+
+Needs gunicorn (``pip install gunicorn``). The clients share the machine with
+the server, so on a small box they compete with it for CPU. Run from the
+AgriDrain directory:
+
+    python -m benchmarks.bench_serving
+    python -m benchmarks.bench_serving --size 100k --workers 1,2,4,8 --clients 16 --duration 20
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from benchmarks import datasets
+from benchmarks.bench_routes import DEFAULT_DATA_DIR, percentile, prepare_database
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = 'bench-serving'
+READY_TIMEOUT = 60.0
+
+STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({'AUTO_MIGRATE': False, 'SECRET_KEY': 'bench'})
+created = time.perf_counter()
+import migrations
+migrations.migrate_database(sys.argv[1])
+checked = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'migrate_check': checked - created}))
+"""
+
+# (role, method, path) cycled through by every client; farmer POSTs carry SUBMISSION
+MIX = [
+    ('guest', 'GET', '/'),
+    ('admin', 'GET', '/dashboard'),
+    ('farmer', 'POST', '/farmer'),
+    ('guest', 'GET', '/rice'),
+    ('admin', 'GET', '/search/submissions.json?q=Village+12+Nashik'),
+    ('admin', 'GET', '/reports'),
+    ('guest', 'GET', '/wheat'),
+]
+SUBMISSION = {'soil': 'Black Soil', 'water': 'Moderate (2m - 5m)', 'crop': 'Cotton',
+              'farm_address': 'Village 12, Nashik', 'latitude': '20.0', 'longitude': '73.8'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_startup(database, runs):
+    """Median seconds per start-up step over ``runs`` fresh interpreters."""
+    samples = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SNIPPET, database], cwd=APP_DIR,
+                                check=True, capture_output=True, text=True).stdout
+        total = time.perf_counter() - start
+        for step, seconds in {**json.loads(output.splitlines()[-1]), 'process_total': total}.items():
+            samples.setdefault(step, []).append(seconds)
+    return {step: statistics.median(values) for step, values in samples.items()}
+
+
+def request(conn, method, path, cookie=None, form=None):
+    headers = {'Cookie': cookie} if cookie else {}
+    body = None
+    if form is not None:
+        body = urlencode(form)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response
+
+
+def login(port, path, form):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        response = request(conn, 'POST', path, form=form)
+        cookie = response.getheader('Set-Cookie', '').split(';')[0]
+        if response.status != 302 or not cookie:
+            raise RuntimeError(f"benchmark login at {path} failed ({response.status})")
+        return cookie
+    finally:
+        conn.close()
+
+
+def start_server(database, workers, port, env=None):
+    """Launch gunicorn; returns the process and seconds until it answered a request.
+
+    ``env`` adds environment variables for the server, e.g. feature switches.
+    """
+    env = dict(os.environ, **(env or {}), AGRIDRAIN_DB=database, WEB_CONCURRENCY=str(workers),
+               AGRIDRAIN_BIND=f'127.0.0.1:{port}', AGRIDRAIN_SECRET_KEY=SECRET_KEY)
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while time.perf_counter() - start < READY_TIMEOUT:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            request(conn, 'GET', '/')
+            conn.close()
+            return server, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.02)
+    server.terminate()
+    raise RuntimeError("gunicorn did not answer within %d s" % READY_TIMEOUT)
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run_client(port, worker, start_at, duration):
+    """One client process: log in, wait for the common start, then loop over MIX."""
+    cookies = {
+        'guest': None,
+        'farmer': login(port, '/farmer_login', {'name': datasets.farmer_name(worker), 'password': datasets.PASSWORD}),
+        'admin': login(port, '/admin_login', {'username': datasets.ADMIN[0], 'password': datasets.ADMIN[1]}),
+    }
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + duration
+    i = worker
+    while time.time() < deadline:
+        role, method, path = MIX[i % len(MIX)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = request(conn, method, path, cookies[role], SUBMISSION if method == 'POST' else None)
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies, errors
+
+
+def run_load(port, clients, duration, farmers):
+    start_at = time.time() + 1.0
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(run_client, [(port, n % farmers, start_at, duration) for n in range(clients)])
+    samples = sorted(value for latencies, _ in results for value in latencies)
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / duration, 1),
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(datasets.SIZES, key=datasets.SIZES.get), default='10k')
+    parser.add_argument('--workers', default='1,4,8', help='comma-separated gunicorn worker counts')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per worker count')
+    parser.add_argument('--startup-runs', type=int, default=5)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated datasets are cached')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("❌ gunicorn is not installed; pip install gunicorn")
+        raise SystemExit(1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cached = prepare_database(args.size, args.data_dir, workdir)
+        rows, farmers = datasets.describe(cached)
+        print(f"dataset {args.size}: {rows:,} submissions, {farmers:,} farmers")
+
+        startup = measure_startup(cached, args.startup_runs)
+        print(f"\nstart-up (median of {args.startup_runs} fresh interpreters)")
+        for step, seconds in startup.items():
+            print(f"  {step:<16} {seconds * 1000:8.1f} ms")
+
+        results = {}
+        for workers in [int(n) for n in args.workers.split(',')]:
+            # Every worker count starts from the same data, not from the previous run's writes
+            database = os.path.join(workdir, f'serving-{workers}.db')
+            shutil.copyfile(cached, database)
+            port = free_port()
+            server, ready = start_server(database, workers, port)
+            try:
+                result = run_load(port, args.clients, args.duration, farmers)
+            finally:
+                stop_server(server)
+            result['first_response_ms'] = round(ready * 1000, 1)
+            results[workers] = result
+
+    print(f"\n{args.clients} clients x {args.duration:g} s per worker count")
+    print(f"{'workers':>7} {'first resp ms':>14} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}  errors")
+    for workers, result in results.items():
+        print(f"{workers:>7} {result['first_response_ms']:>14.1f} {result['requests']:>9} {result['rps']:>9,.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}  {result['errors'] or ''}")
+    print(f"\n(on {os.cpu_count()} CPU core(s))")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'clients': args.clients, 'duration': args.duration,
+                       'startup_ms': {step: round(s * 1000, 1) for step, s in startup.items()},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Compare per-request insert+commit with the write-behind group-commit queue.
+
+Each of ``--threads`` workers stands in for a /farmer request handler and
+submits ``--rows`` rows. Run from the AgriDrain directory:
+
+    python -m benchmarks.bench_writebehind --threads 64 --rows 200
+    python -m benchmarks.bench_writebehind --synchronous FULL   # fsync on every commit
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+import migrations
+import writebehind
+
+
+def make_row(worker, i):
+    return (worker + 1, f'Farmer {worker}', 'Red Soil', 'Medium', 'Rice', 'Village',
+            19.0 + worker * 1e-3, 75.0 + i * 1e-4, '2025-06-01 10:00:00', None)
+
+
+def run_workers(threads, rows, work):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(rows):
+                work(n, i)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+def report(label, total, elapsed, extra=''):
+    print(f"{label:<34} {elapsed:8.2f} s  {total / elapsed:10,.0f} submissions/s  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rows', type=int, default=200, help='submissions per thread')
+    parser.add_argument('--batch-rows', type=int, default=writebehind.DEFAULT_CONFIG['WRITE_BEHIND_BATCH_ROWS'])
+    parser.add_argument('--max-delay-ms', type=int, default=writebehind.DEFAULT_CONFIG['WRITE_BEHIND_MAX_DELAY_MS'])
+    parser.add_argument('--synchronous', default='NORMAL', choices=('OFF', 'NORMAL', 'FULL'))
+    args = parser.parse_args()
+    total = args.threads * args.rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO farmers (name, mobile, password) VALUES (?, ?, ?)",
+                         [(f'Farmer {n}', f'9{n:09d}', 'secret') for n in range(args.threads)])
+        conn.commit()
+        conn.close()
+
+        pool = db.ConnectionPool(path, size=args.threads)
+
+        def connect():
+            conn = pool.connect()
+            conn.execute(f"PRAGMA synchronous={args.synchronous}")
+            return conn
+
+        for _ in range(args.threads):
+            pool.release(connect())
+
+        print(f"{args.threads} threads x {args.rows} rows, synchronous={args.synchronous}")
+
+        def direct(n, i):
+            conn = pool.acquire()
+            try:
+                conn.execute(writebehind.INSERT_SUBMISSION, make_row(n, i))
+                conn.commit()
+            finally:
+                pool.release(conn)
+
+        report("direct insert + commit", total, run_workers(args.threads, args.rows, direct))
+
+        for ack in writebehind.ACK_MODES:
+            wbq = writebehind.WriteBehindQueue(connect, batch_rows=args.batch_rows,
+                                               max_delay_ms=args.max_delay_ms, maxsize=total)
+
+            def queued(n, i):
+                ticket = wbq.submit(make_row(n, i))
+                if ack == 'committed':
+                    ticket.wait()
+
+            start = time.perf_counter()
+            elapsed = run_workers(args.threads, args.rows, queued)
+            wbq.close()
+            flushed = time.perf_counter() - start
+            stats = wbq.stats()
+            report(f"write-behind, ack={ack}", total, elapsed,
+                   f"groups={stats['groups']} avg_group={stats['avg_group']}")
+            if ack == 'queued':
+                # Requests return before their rows are stored; this includes the final flush
+                report("  ...until every row committed", total, flushed)
+
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
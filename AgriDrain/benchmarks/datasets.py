@@ -0,0 +1,141 @@
+"""Synthetic farmers/farmer_data databases for the benchmarks.
+
+Rows follow the shape of real submissions, not uniform noise:
+
+- soil types and water levels are skewed towards the common ones;
+- crops are mostly ones the knowledge base recommends for that soil and water;
+- farms cluster around a handful of district centres, and a few have no location;
+- submissions peak in the kharif (June-July) and rabi (October-November) sowing months.
+
+The tables are filled at schema version 4, before the rollup, R*Tree and
+trend triggers exist. The remaining migrations then backfill those structures
+in one pass, which is far quicker than firing every trigger once per row.
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import geo
+import knowledge
+import migrations
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+FARMERS_PER_SUBMISSION = 0.1
+PASSWORD = 'bench'
+ADMIN = ('admin', 'bench')
+
+# (name, latitude, longitude) of the farming districts the farms cluster around
+DISTRICTS = [
+    ('Nashik', 20.00, 73.79),
+    ('Pune', 18.52, 73.86),
+    ('Ludhiana', 30.90, 75.85),
+    ('Guntur', 16.31, 80.44),
+    ('Indore', 22.72, 75.86),
+    ('Karnal', 29.69, 76.99),
+    ('Thanjavur', 10.79, 79.14),
+    ('Bardhaman', 23.23, 87.86),
+]
+DISTRICT_SPREAD_DEGREES = 0.35
+NO_LOCATION_SHARE = 0.03
+OFF_LIST_CROP_SHARE = 0.15
+# Relative submission volume per calendar month (sowing seasons peak)
+MONTH_WEIGHTS = [4, 3, 3, 4, 6, 12, 14, 8, 6, 11, 12, 6]
+HISTORY_DAYS = 730
+BATCH_ROWS = 20000
+
+
+def skewed_weights(n):
+    """Weights 1, 1/2, 1/3, ... so the first categories are the most common."""
+    return [1 / (i + 1) for i in range(n)]
+
+
+def farmer_name(i):
+    return f'Farmer {i:07d}'
+
+
+def farmer_mobile(i):
+    return f'9{i:09d}'
+
+
+def _created_at(rng, now):
+    while True:
+        moment = now - timedelta(days=rng.random() * HISTORY_DAYS)
+        if rng.random() * max(MONTH_WEIGHTS) < MONTH_WEIGHTS[moment.month - 1]:
+            return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def submissions(n, farmers, seed=7, now=None):
+    """Yield ``n`` farmer_data rows as tuples in INSERT_COLUMNS order."""
+    kb = knowledge.get_knowledge_base()
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    soil_weights = skewed_weights(len(kb.soil_types))
+    water_weights = skewed_weights(len(kb.water_levels))
+    for _ in range(n):
+        farmer = rng.randrange(farmers) + 1
+        soil = rng.choices(kb.soil_types, soil_weights)[0]
+        water = rng.choices(kb.water_levels, water_weights)[0]
+        recommended = kb.recommendations(soil, water)
+        if recommended and rng.random() > OFF_LIST_CROP_SHARE:
+            crop = rng.choice(recommended)
+        else:
+            crop = rng.choice(kb.crops)
+        district, lat, lon = rng.choice(DISTRICTS)
+        if rng.random() < NO_LOCATION_SHARE:
+            lat = lon = None
+        else:
+            lat = round(rng.gauss(lat, DISTRICT_SPREAD_DEGREES), 6)
+            lon = round(rng.gauss(lon, DISTRICT_SPREAD_DEGREES), 6)
+        yield (farmer, farmer_name(farmer - 1), soil, water, crop,
+               f'Village {rng.randrange(400)}, {district}', lat, lon, _created_at(rng, now))
+
+
+INSERT_COLUMNS = "farmer_id, name, soil_type, water_level, crop, farm_address, latitude, longitude, created_at"
+
+
+def _insert_batches(conn, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def generate(path, rows, farmers=None, seed=7):
+    """Create a database at ``path`` with ``rows`` submissions; returns the farmer count."""
+    farmers = farmers or max(1, int(rows * FARMERS_PER_SUBMISSION))
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrations.migrate(conn, target=4)
+
+    conn.execute("BEGIN")
+    conn.execute("INSERT INTO admins (username, password) VALUES (?, ?)", ADMIN)
+    _insert_batches(conn, "INSERT INTO farmers (name, mobile, password) VALUES (?, ?, ?)",
+                    ((farmer_name(i), farmer_mobile(i), PASSWORD) for i in range(farmers)))
+    _insert_batches(conn, f"INSERT INTO farmer_data ({INSERT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    submissions(rows, farmers, seed))
+    conn.commit()
+
+    # Rollups, R*Tree, table versions and trends, each backfilled in one pass
+    migrations.migrate(conn)
+    for name, lat, lon in DISTRICTS:
+        spread = 3 * DISTRICT_SPREAD_DEGREES
+        geo.save_district(conn, name, lat - spread, lon - spread, lat + spread, lon + spread)
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return farmers
+
+
+def describe(path):
+    """``(submissions, farmers)`` stored in an existing benchmark database."""
+    conn = sqlite3.connect(path)
+    try:
+        return (conn.execute("SELECT COUNT(*) FROM farmer_data").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM farmers").fetchone()[0])
+    finally:
+        conn.close()
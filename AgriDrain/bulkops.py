@@ -0,0 +1,308 @@
+"""Bulk admin operations on submissions and farmers.
+
+Each operation takes many ids, runs as a single ``BEGIN IMMEDIATE``
+transaction with ``executemany``, and returns a BulkResult. The result holds
+a per-item status (``updated``, ``deleted``, ``reassigned``, ``not_found``,
+``invalid``) plus counts per status. Unknown or malformed ids are reported
+and skipped; they never abort the rest of the batch.
+
+Deleting submissions or farmers also deletes (or reassigns) the matching rows
+in season archives. Those are changed first, one archive file at a time.
+"""
+import json
+import sqlite3
+
+import archive
+import geo
+
+ACTIONS = ('recommend', 'delete_submissions', 'reassign_submissions', 'delete_farmers')
+MAX_ITEMS = 50000
+# Keeps ``IN (...)`` lists under SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+class BulkError(ValueError):
+    """The request as a whole is unusable (unknown action, no ids, bad target)."""
+
+
+class BulkResult:
+    def __init__(self, action):
+        self.action = action
+        self.results = []
+        self.summary = {}
+        self.sequence_reset = False
+
+    def add(self, item_id, status, **details):
+        self.results.append({'id': item_id, 'status': status, **details})
+        self.summary[status] = self.summary.get(status, 0) + 1
+
+    def count(self, status):
+        return self.summary.get(status, 0)
+
+    def as_dict(self):
+        return {'action': self.action, 'summary': self.summary, 'results': self.results,
+                'sequence_reset': self.sequence_reset}
+
+
+def parse_ids(values, result):
+    """Distinct positive integer ids in their original order; bad values are reported."""
+    ids, seen = [], set()
+    for value in values:
+        text = str(value).strip()
+        if not (text.isascii() and text.isdigit()) or int(text) == 0:
+            result.add(value, 'invalid', error='not a positive integer id')
+            continue
+        item_id = int(text)
+        if item_id not in seen:
+            seen.add(item_id)
+            ids.append(item_id)
+    if len(ids) > MAX_ITEMS:
+        raise BulkError(f"at most {MAX_ITEMS} ids can be processed per request")
+    return ids
+
+
+def existing_ids(conn, table, ids, column='id'):
+    found = set()
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk))
+    return found
+
+
+def reset_sequence_if_empty(conn, table):
+    """Restart ``table``'s AUTOINCREMENT at 1 once it is empty; True if it was reset.
+
+    Submission ids are never restarted once a season is archived, because
+    the archived rows keep their ids (see archive.py).
+    """
+    if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+        return False
+    if table == 'farmer_data' and archive.has_archives(conn):
+        return False
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, 0)", (table,))
+    return True
+
+
+def _in_list(column, ids):
+    """``column IN (ids)`` as one bound parameter, for id lists of any length."""
+    return f"{column} IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+
+
+def _archived(changed):
+    """``(id, farmer_id)`` of every row archive.delete_rows() or reassign_rows() changed."""
+    return [row for rows in changed.values() for row in rows]
+
+
+def _transaction(conn, apply):
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        value = apply()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return value
+
+
+def apply_recommendations(conn, items):
+    """Set ``recommendation`` on many submissions; ``items`` is [(submission_id, text), ...].
+
+    When the same id appears more than once, the last recommendation wins.
+    """
+    result = BulkResult('recommend')
+    by_id = {}
+    for item_id, text in items:
+        parsed = parse_ids([item_id], result)
+        if not parsed:
+            continue
+        text = '' if text is None else str(text).strip()
+        if not text:
+            result.add(parsed[0], 'invalid', error='recommendation is empty')
+            continue
+        by_id[parsed[0]] = text
+    if not by_id:
+        return result
+
+    def apply():
+        found = existing_ids(conn, 'farmer_data', list(by_id))
+        conn.executemany("UPDATE farmer_data SET recommendation = ? WHERE id = ?",
+                         [(text, item_id) for item_id, text in by_id.items() if item_id in found])
+        for item_id in by_id:
+            result.add(item_id, 'updated' if item_id in found else 'not_found')
+
+    _transaction(conn, apply)
+    return result
+
+
+def delete_submissions(conn, ids):
+    result = BulkResult('delete_submissions')
+    ids = parse_ids(ids, result)
+    if not ids:
+        return result
+
+    archived = {item_id for item_id, _ in _archived(archive.delete_rows(conn, *_in_list('fd.id', ids)))}
+
+    def apply():
+        found = existing_ids(conn, 'farmer_data', ids)
+        conn.executemany("DELETE FROM farmer_data WHERE id = ?", [(item_id,) for item_id in ids if item_id in found])
+        for item_id in ids:
+            if item_id in found:
+                result.add(item_id, 'deleted')
+            elif item_id in archived:
+                result.add(item_id, 'deleted', archived=True)
+            else:
+                result.add(item_id, 'not_found')
+        return reset_sequence_if_empty(conn, 'farmer_data')
+
+    result.sequence_reset = _transaction(conn, apply)
+    return result
+
+
+def _farmer(conn, farmer_id):
+    row = conn.execute("SELECT id, name FROM farmers WHERE id = ?", (farmer_id,)).fetchone()
+    if row is None:
+        raise BulkError(f"no registered farmer with id {farmer_id}")
+    return row
+
+
+def reassign_submissions(conn, ids, to_farmer_id):
+    """Move submissions to another registered farmer (farmer_id and name)."""
+    result = BulkResult('reassign_submissions')
+    ids = parse_ids(ids, result)
+    target = _farmer(conn, to_farmer_id)
+    if not ids:
+        return result
+
+    def apply():
+        found = existing_ids(conn, 'farmer_data', ids)
+        conn.executemany("UPDATE farmer_data SET farmer_id = ?, name = ? WHERE id = ?",
+                         [(target['id'], target['name'], item_id) for item_id in ids if item_id in found])
+        for item_id in ids:
+            if item_id in found:
+                result.add(item_id, 'reassigned', farmer_id=target['id'])
+            else:
+                result.add(item_id, 'not_found')
+
+    _transaction(conn, apply)
+    return result
+
+
+def _submission_counts(conn, farmer_ids):
+    counts = {}
+    for start in range(0, len(farmer_ids), CHUNK_SIZE):
+        chunk = farmer_ids[start:start + CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        counts.update(conn.execute(f"""
+            SELECT farmer_id, COUNT(*) FROM farmer_data
+            WHERE farmer_id IN ({placeholders})
+            GROUP BY farmer_id
+        """, chunk).fetchall())
+    return counts
+
+
+def delete_farmers(conn, ids, reassign_to=None):
+    """Delete farmers with their submissions, or hand the submissions to ``reassign_to``."""
+    result = BulkResult('delete_farmers')
+    ids = parse_ids(ids, result)
+    target = _farmer(conn, reassign_to) if reassign_to is not None else None
+    if target is not None and target['id'] in ids:
+        raise BulkError("cannot reassign submissions to a farmer that is being deleted")
+    if not ids:
+        return result
+
+    # Archived submissions of unregistered ids stay, as their hot ones do
+    registered = sorted(existing_ids(conn, 'farmers', ids))
+    if target is None:
+        changed = archive.delete_rows(conn, *_in_list('fd.farmer_id', registered))
+    else:
+        changed = archive.reassign_rows(conn, *_in_list('fd.farmer_id', registered), target)
+    archived = {}
+    for _, farmer_id in _archived(changed):
+        archived[farmer_id] = archived.get(farmer_id, 0) + 1
+
+    def apply():
+        found = existing_ids(conn, 'farmers', ids)
+        doomed = [(item_id,) for item_id in ids if item_id in found]
+        counts = _submission_counts(conn, [item_id for (item_id,) in doomed])
+        if target is None:
+            conn.executemany("DELETE FROM farmer_data WHERE farmer_id = ?", doomed)
+        else:
+            conn.executemany("UPDATE farmer_data SET farmer_id = ?, name = ? WHERE farmer_id = ?",
+                             [(target['id'], target['name'], item_id) for (item_id,) in doomed])
+        conn.executemany("DELETE FROM farmers WHERE id = ?", doomed)
+        moved = 'reassigned_submissions' if target is not None else 'deleted_submissions'
+        for item_id in ids:
+            if item_id in found:
+                result.add(item_id, 'deleted', **{moved: counts.get(item_id, 0) + archived.get(item_id, 0)})
+            else:
+                result.add(item_id, 'not_found')
+        return reset_sequence_if_empty(conn, 'farmers')
+
+    result.sequence_reset = _transaction(conn, apply)
+    return result
+
+
+def _submission_ids(conn, payload):
+    """Ids listed in the payload, or every submission inside a registered district."""
+    if payload.get('district'):
+        farms = geo.district_farms(conn, str(payload['district']), limit=MAX_ITEMS + 1)
+        if farms is None:
+            raise BulkError(f"unknown district {payload['district']!r}")
+        return [farm['id'] for farm in farms]
+    return _list(payload, 'ids')
+
+
+def _list(payload, key):
+    value = payload.get(key) or []
+    if not isinstance(value, list):
+        raise BulkError(f"{key} must be a list")
+    return value
+
+
+def run(conn, action, payload):
+    """Dispatch one bulk request (already decoded from JSON or a form) by action name."""
+    if action not in ACTIONS:
+        raise BulkError(f"action must be one of {', '.join(ACTIONS)}")
+    try:
+        if action == 'recommend':
+            if payload.get('items'):
+                items = _list(payload, 'items')
+                if not all(isinstance(item, dict) for item in items):
+                    raise BulkError("items must be objects with id and recommendation")
+                items = [(item.get('id'), item.get('recommendation')) for item in items]
+            else:
+                # Same recommendation for every selected submission, e.g. a whole district
+                text = payload.get('recommendation')
+                items = [(item_id, text) for item_id in _submission_ids(conn, payload)]
+            if not items:
+                raise BulkError("no submissions selected")
+            return apply_recommendations(conn, items)
+        if action == 'delete_farmers':
+            ids = _list(payload, 'ids')
+        else:
+            ids = _submission_ids(conn, payload)
+        if not ids:
+            raise BulkError("no ids selected")
+        if action == 'delete_submissions':
+            return delete_submissions(conn, ids)
+        if action == 'reassign_submissions':
+            return reassign_submissions(conn, ids, _target_id(payload.get('to_farmer_id'), required=True))
+        return delete_farmers(conn, ids, _target_id(payload.get('reassign_to')))
+    except sqlite3.OperationalError as e:
+        raise BulkError(f"database is busy, nothing was changed ({e})") from e
+
+
+def _target_id(value, required=False):
+    text = '' if value is None else str(value).strip()
+    if not text:
+        if required:
+            raise BulkError("to_farmer_id is required")
+        return None
+    if not (text.isascii() and text.isdigit()):
+        raise BulkError(f"farmer id {value!r} is not a number")
+    return int(text)
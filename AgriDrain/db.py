@@ -0,0 +1,222 @@
+"""SQLite connection management for AgriDrain.
+
+Each request gets a single connection (stored on ``flask.g``) that is handed
+back to a small pool of warm connections when the app context tears down.
+Every connection is opened with WAL journaling and tuned pragmas so the write
+routes (/farmer, /contact) don't block the read-heavy admin pages.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agri_drain.db")
+
+DEFAULT_CONFIG = {
+    'DB_POOL_SIZE': 8,
+    'DB_BUSY_TIMEOUT_MS': 5000,
+    'DB_CACHE_SIZE_KB': 16384,
+    'DB_MMAP_SIZE': 128 * 1024 * 1024,
+    # A write statement that takes longer than this is counted as a lock wait
+    'DB_LOCK_WAIT_THRESHOLD_MS': 5,
+}
+
+
+def database_path():
+    """AGRIDRAIN_DB, or agri_drain.db next to the code.
+
+    Read when asked, not at import, so a script may set AGRIDRAIN_DB after
+    importing modules that import this one.
+    """
+    return os.environ.get('AGRIDRAIN_DB', DEFAULT_DATABASE)
+
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'BEGIN', 'COMMIT')
+
+
+class TrackedConnection(sqlite3.Connection):
+    """sqlite3 connection that reports slow writes to its pool.
+
+    Python's sqlite3 module does not expose the busy handler, so time spent
+    waiting for the write lock is approximated by timing write statements and
+    commits and counting the ones above the configured threshold.
+
+    ``observer``, when set, is called as ``observer(conn, sql, params, seconds)``
+    after every statement (``params`` is None for executemany); /metrics uses
+    it for per-request SQL accounting.
+    """
+    pool = None
+    observer = None
+
+    def _timed(self, func, sql, *args, many=False):
+        is_write = sql is None or sql.lstrip()[:7].upper().startswith(WRITE_PREFIXES)
+        track_write = is_write and self.pool is not None
+        observer = self.observer
+        if not track_write and observer is None:
+            return func(*args)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            if track_write and ('locked' in str(e) or 'busy' in str(e)):
+                self.pool.record_lock_timeout()
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if track_write:
+                self.pool.record_write(seconds)
+            if observer is not None and sql is not None:
+                observer(self, sql, None if many else (args[1] if len(args) > 1 else ()), seconds)
+
+    def execute(self, sql, *args):
+        return self._timed(super().execute, sql, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(super().executemany, sql, sql, *args, many=True)
+
+    def commit(self):
+        return self._timed(super().commit, None)
+
+
+class ConnectionPool:
+    """Bounded pool of warm SQLite connections, safe to share between threads."""
+
+    def __init__(self, database, size=8, busy_timeout_ms=5000, cache_size_kb=16384,
+                 mmap_size=128 * 1024 * 1024, lock_wait_threshold_ms=5):
+        self.database = database
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.lock_wait_threshold = lock_wait_threshold_ms / 1000.0
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'discarded': 0,
+            'writes': 0,
+            'lock_waits': 0,
+            'lock_wait_seconds': 0.0,
+            'lock_timeouts': 0,
+        }
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            factory=TrackedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            self._bump('misses')
+            return self.connect()
+        self._bump('hits')
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            self._bump('discarded')
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def record_write(self, seconds):
+        with self._lock:
+            self._stats['writes'] += 1
+            if seconds >= self.lock_wait_threshold:
+                self._stats['lock_waits'] += 1
+                self._stats['lock_wait_seconds'] += seconds
+
+    def record_lock_timeout(self):
+        self._bump('lock_timeouts')
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / requests, 4) if requests else 0.0
+        stats['lock_wait_seconds'] = round(stats['lock_wait_seconds'], 6)
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        stats['database'] = self.database
+        return stats
+
+
+def _create_pool(app):
+    return ConnectionPool(
+        app.config['DATABASE'],
+        size=app.config['DB_POOL_SIZE'],
+        busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+        cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+        mmap_size=app.config['DB_MMAP_SIZE'],
+        lock_wait_threshold_ms=app.config['DB_LOCK_WAIT_THRESHOLD_MS'],
+    )
+
+
+def get_pool(app=None):
+    """Return the app's pool, recreating it after a fork so workers never share connections."""
+    app = app or current_app
+    pool = app.extensions.get('agridrain_db')
+    if pool is None or pool.pid != os.getpid() or pool.database != app.config['DATABASE']:
+        if pool is not None and pool.pid == os.getpid():
+            pool.close_all()
+        pool = app.extensions['agridrain_db'] = _create_pool(app)
+    return pool
+
+
+def get_db():
+    """Connection for the current request, reused until the app context ends."""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+        g.db.observer = current_app.extensions.get('agridrain_sql_observer')
+    return g.db
+
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.observer = None
+        get_pool().release(conn)
+
+
+def table_version(conn, table):
+    """Change counter for ``table``, bumped by triggers on every write to it."""
+    row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else None
+
+
+def init_app(app):
+    app.config.setdefault('DATABASE', database_path())
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,145 @@
+"""Streaming CSV / NDJSON exports of submissions and farmers.
+
+Rows are read in keyset batches on ``id`` and encoded batch by batch, so an
+export of any size keeps only ``BATCH_SIZE`` rows (plus the gzip window) in
+memory. Each export uses its own pooled connection, released when the
+generator finishes or the client disconnects. A submissions export with a
+date range reaching into archived seasons reads those archives as well. The
+routes pass the reporting pool (see reporting.py), so with snapshots on an
+export reads the snapshot.
+"""
+import csv
+import io
+import json
+import zlib
+
+import archive
+import db
+
+BATCH_SIZE = 2000
+
+SUBMISSION_COLUMNS = (
+    'id', 'farmer_id', 'name', 'soil_type', 'water_level', 'crop',
+    'farm_address', 'latitude', 'longitude', 'created_at', 'recommendation',
+)
+# Passwords are never exported
+FARMER_COLUMNS = ('id', 'name', 'mobile')
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def iter_batches(conn, table, columns, where='1', params=(), alias='t', batch_size=BATCH_SIZE):
+    """Yield lists of rows from ``table`` in id order, one keyset batch at a time."""
+    select = ", ".join(f"{alias}.{column}" for column in columns)
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT {select} FROM {table} {alias}
+            WHERE ({where}) AND {alias}.id > ?
+            ORDER BY {alias}.id
+            LIMIT ?
+        """, (*params, last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def iter_submission_batches(conn, sources, where='1', params=(), batch_size=BATCH_SIZE):
+    """Like iter_batches over the hot table plus any attached archives (see archive.union_all).
+
+    The keyset is (id, source): an archive can hold an id that the hot table
+    or another season's archive holds as well, and both rows are exported.
+    """
+    columns = ", ".join(SUBMISSION_COLUMNS)
+    last_id, last_tier = 0, -1
+    while True:
+        select, all_params = archive.union_all(sources, SUBMISSION_COLUMNS, f"({where}) AND fd.id >= ?",
+                                               (*params, last_id), tier='tier')
+        rows = conn.execute(f"""
+            SELECT {columns}, tier FROM ({select})
+            WHERE (id, tier) > (?, ?)
+            ORDER BY id, tier
+            LIMIT ?
+        """, (*all_params, last_id, last_tier, batch_size)).fetchall()
+        if not rows:
+            return
+        last_id, last_tier = rows[-1]['id'], rows[-1]['tier']
+        yield [tuple(row)[:-1] for row in rows]
+
+
+def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(batches, columns):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode('utf-8')
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_table(pool, table, columns, fmt, where='1', params=(), alias='t', compress=False, history=None):
+    """Generator of encoded export bytes; holds one pooled connection while running.
+
+    ``history(conn)``, if given, is an ``archive.historical`` context whose
+    sources replace ``table``.
+    """
+    conn = pool.acquire()
+    try:
+        if history is not None:
+            with history(conn) as tiers:
+                yield from _encoded(iter_submission_batches(conn, tiers.sources, where, params),
+                                    columns, fmt, compress)
+        else:
+            yield from _encoded(iter_batches(conn, table, columns, where, params, alias), columns, fmt, compress)
+    finally:
+        pool.release(conn)
+
+
+def _encoded(batches, columns, fmt, compress):
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    chunks = encode(batches, columns)
+    if compress:
+        chunks = gzip_stream(chunks)
+    return chunks
+
+
+def export_filename(name, fmt, compress):
+    return f"{name}.{fmt}" + (".gz" if compress else "")
+
+
+def stream_submissions(fmt, where='1', params=(), compress=False, date_from=None, date_to=None, pool=None):
+    # ``where`` is written against the ``fd`` alias used by the dashboard filters
+    history = None
+    if date_from or date_to:
+        # Resolved now: the generator runs after the request context is gone
+        directory = archive.archive_dir()
+        history = lambda conn: archive.historical(conn, date_from, date_to, directory)
+    return stream_table(pool or db.get_pool(), 'farmer_data', SUBMISSION_COLUMNS, fmt,
+                        where, params, alias='fd', compress=compress, history=history)
+
+
+def stream_farmers(fmt, compress=False, pool=None):
+    return stream_table(pool or db.get_pool(), 'farmers', FARMER_COLUMNS, fmt, compress=compress)
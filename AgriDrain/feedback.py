@@ -0,0 +1,97 @@
+"""Contact-form feedback: its own table with an FTS5 index, searched and paged.
+
+Feedback used to be stored as sparse farmer_data rows (name and feedback,
+every other column NULL); migration 10 moved them here. ``feedback_fts`` is an
+external-content FTS5 index over sender name, email and message, kept in sync
+by triggers. Admin search is therefore an index lookup ranked by bm25, not a
+scan of every message.
+"""
+import re
+
+from markupsafe import Markup, escape
+
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+# snippet() markers, swapped for <mark> after the text is HTML-escaped
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+
+SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def add(conn, message, name=None, email=None, farmer_id=None, created_at=None):
+    cursor = conn.execute("""
+        INSERT INTO feedback (farmer_id, name, email, message, created_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')))
+    """, (farmer_id, name, email, message, created_at))
+    return cursor.lastrowid
+
+
+def match_expression(text):
+    """FTS5 query for free text: every word must match, the last one as a prefix.
+
+    Words are quoted, so FTS syntax typed by a user (``AND``, ``*``, ``:``,
+    quotes) is searched for literally and never raises a syntax error.
+    """
+    words = SEARCH_TERM.findall(text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return " ".join(terms)
+
+
+def highlight(snippet):
+    """Escape a snippet() result and turn its markers into <mark> tags."""
+    html = str(escape(snippet))
+    return Markup(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+def search(conn, text='', date_from=None, date_to=None, farmers_only=False, page=1, per_page=PER_PAGE):
+    """One page of feedback, newest first, or best match first when ``text`` is given.
+
+    Returns ``{'rows', 'total', 'page', 'pages', 'per_page'}``. Each row is a
+    dict with ``excerpt``: the message, with matches highlighted when searching.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    clauses, params = [], []
+    if date_from:
+        clauses.append("f.created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        # Inclusive, like the dashboard's date filter
+        clauses.append("f.created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if farmers_only:
+        clauses.append("f.farmer_id IS NOT NULL")
+
+    expression = match_expression(text)
+    if expression:
+        source = "feedback_fts JOIN feedback f ON f.id = feedback_fts.rowid"
+        clauses.insert(0, "feedback_fts MATCH ?")
+        params.insert(0, expression)
+        excerpt = (f"snippet(feedback_fts, 2, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', ' … ', {SNIPPET_TOKENS})")
+        order = "bm25(feedback_fts), f.id DESC"
+    else:
+        source = "feedback f"
+        excerpt = "f.message"
+        order = "f.id DESC"
+    where = " AND ".join(clauses) or "1"
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+    pages = max(1, -(-total // per_page))
+    page = max(1, min(page, pages))
+    rows = conn.execute(f"""
+        SELECT f.id, f.farmer_id, f.name, f.email, f.created_at, {excerpt} AS excerpt
+        FROM {source}
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    """, params + [per_page, (page - 1) * per_page]).fetchall()
+
+    results = []
+    for row in rows:
+        item = dict(row)
+        item['excerpt'] = highlight(item['excerpt']) if expression else item['excerpt']
+        results.append(item)
+    return {'rows': results, 'total': total, 'page': page, 'pages': pages, 'per_page': per_page}
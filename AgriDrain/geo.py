@@ -0,0 +1,158 @@
+"""Spatial lookups over farmer_data coordinates.
+
+``farmer_data_geo`` is an SQLite R*Tree kept in sync with farmer_data by
+triggers, so bounding-box, radius and per-district queries only touch the
+farms near the area of interest. Radius searches compute the exact
+great-circle distance of those candidates in SQL and let SQLite keep the
+nearest ``limit`` of them, so no candidate list is built in Python.
+"""
+import math
+import sqlite3
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+# k-nearest searches start with this radius and double until enough farms are found
+KNN_START_RADIUS_KM = 1.0
+KNN_MAX_RADIUS_KM = 500.0
+
+FARM_COLUMNS = "fd.id, fd.farmer_id, fd.name, fd.crop, fd.soil_type, fd.water_level, fd.farm_address, fd.latitude, fd.longitude"
+
+
+def parse_coordinate(value, limit):
+    """Form value -> float within [-limit, limit], or None for blank/invalid input."""
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(number) or abs(number) > limit:
+        return None
+    return number
+
+
+def parse_lat_lon(latitude, longitude):
+    lat = parse_coordinate(latitude, 90)
+    lon = parse_coordinate(longitude, 180)
+    if lat is None or lon is None:
+        return None, None
+    return lat, lon
+
+
+def rebuild(conn):
+    conn.execute("DELETE FROM farmer_data_geo")
+    conn.execute("""
+        INSERT INTO farmer_data_geo
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM farmer_data
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(lat, lon, radius_km):
+    """(south, west, north, east) box that fully contains the circle."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    return max(-90.0, lat - dlat), max(-180.0, lon - dlon), min(90.0, lat + dlat), min(180.0, lon + dlon)
+
+
+def bounding_box(conn, south, west, north, east, limit=1000, extra_where='', params=()):
+    """Farms inside the box, newest first."""
+    rows = conn.execute(f"""
+        SELECT {FARM_COLUMNS}
+        FROM farmer_data_geo g
+        JOIN farmer_data fd ON fd.id = g.id
+        WHERE g.max_lat >= ? AND g.min_lat <= ?
+          AND g.max_lon >= ? AND g.min_lon <= ?
+          AND fd.latitude BETWEEN ? AND ?
+          AND fd.longitude BETWEEN ? AND ?
+          {extra_where}
+        ORDER BY fd.id DESC
+        LIMIT ?
+    """, (south, north, west, east, south, north, west, east, *params, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+# haversine_km() from the point (:lat, :lon) to each farm, as SQL
+DISTANCE_SQL = """2 * :earth * asin(sqrt(min(1.0,
+    sin(radians(fd.latitude - :lat) / 2) * sin(radians(fd.latitude - :lat) / 2)
+    + :cos_lat * cos(radians(fd.latitude))
+      * sin(radians(fd.longitude - :lon) / 2) * sin(radians(fd.longitude - :lon) / 2)
+)))"""
+# SQLite's math functions, for builds compiled without them
+SQL_MATH_FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'asin': math.asin, 'sqrt': math.sqrt, 'radians': math.radians}
+
+
+def _sql_math(conn):
+    try:
+        conn.execute("SELECT asin(sqrt(sin(radians(0)) + cos(0)))")
+    except sqlite3.OperationalError:
+        for name, func in SQL_MATH_FUNCTIONS.items():
+            conn.create_function(name, 1, func, deterministic=True)
+
+
+def within_radius(conn, lat, lon, radius_km, limit=1000):
+    """Farms within ``radius_km`` of the point, nearest first, with ``distance_km``."""
+    radius_km = min(radius_km, KNN_MAX_RADIUS_KM)
+    south, west, north, east = radius_box(lat, lon, radius_km)
+    _sql_math(conn)
+    rows = conn.execute(f"""
+        SELECT * FROM (
+            SELECT {FARM_COLUMNS}, {DISTANCE_SQL} AS distance_km
+            FROM farmer_data_geo g
+            JOIN farmer_data fd ON fd.id = g.id
+            WHERE g.max_lat >= :south AND g.min_lat <= :north
+              AND g.max_lon >= :west AND g.min_lon <= :east
+        )
+        WHERE distance_km <= :radius
+        ORDER BY distance_km, id
+        LIMIT :limit
+    """, {'earth': EARTH_RADIUS_KM, 'lat': lat, 'lon': lon, 'cos_lat': math.cos(math.radians(lat)),
+          'south': south, 'north': north, 'west': west, 'east': east,
+          'radius': radius_km, 'limit': limit}).fetchall()
+    farms = [dict(row) for row in rows]
+    for farm in farms:
+        farm['distance_km'] = round(farm['distance_km'], 3)
+    return farms
+
+
+def nearest(conn, lat, lon, k=10, max_radius_km=KNN_MAX_RADIUS_KM):
+    """The ``k`` farms closest to the point, searching outwards until enough are found."""
+    radius = KNN_START_RADIUS_KM
+    while True:
+        farms = within_radius(conn, lat, lon, radius, limit=k)
+        if len(farms) >= k or radius >= max_radius_km:
+            return farms
+        radius = min(radius * 2, max_radius_km)
+
+
+def save_district(conn, name, south, west, north, east):
+    conn.execute("""
+        INSERT INTO districts (name, south, west, north, east) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            south = excluded.south, west = excluded.west,
+            north = excluded.north, east = excluded.east
+    """, (name, south, west, north, east))
+
+
+def get_district(conn, name):
+    return conn.execute(
+        "SELECT name, south, west, north, east FROM districts WHERE name = ?", (name,)
+    ).fetchone()
+
+
+def district_farms(conn, name, limit=1000):
+    """Farms inside a registered district's bounding box, or None if it is unknown."""
+    district = get_district(conn, name)
+    if district is None:
+        return None
+    return bounding_box(conn, district['south'], district['west'], district['north'], district['east'], limit)
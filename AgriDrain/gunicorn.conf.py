@@ -0,0 +1,55 @@
+"""Gunicorn settings for serving AgriDrain with several worker processes.
+
+    cd AgriDrain
+    AGRIDRAIN_DB=/srv/agridrain/agri_drain.db gunicorn -c gunicorn.conf.py wsgi:app
+
+All workers open the same SQLite file. WAL mode lets readers in every
+process run alongside the one writer, and writers wait for each other for
+up to DB_BUSY_TIMEOUT_MS. The app is loaded once in the master
+(``preload_app``) and forked, so a worker starts in milliseconds; each
+worker opens its own connection pool after the fork. The schema is migrated
+once, in ``on_starting``, before any worker exists.
+
+Settings read from the environment:
+
+- ``AGRIDRAIN_DB``: database file shared by all workers.
+- ``AGRIDRAIN_SECRET_KEY``: session signing key. Without it the key in
+  ``instance/secret_key`` is used, created on first start. All workers must
+  share one key, or sessions will not survive a request landing on another worker.
+- ``WEB_CONCURRENCY``: worker processes (default 4). One or two per CPU
+  core; beyond that, writers only queue on the database lock.
+- ``AGRIDRAIN_THREADS``: threads per worker (default 4). Keep it at or
+  below DB_POOL_SIZE (8) so every thread gets a pooled connection.
+- ``AGRIDRAIN_BIND``: listen address (default ``127.0.0.1:8000``). Put a
+  reverse proxy in front for TLS and static files.
+- ``AGRIDRAIN_REPORTING_SNAPSHOT=1``: admin analytics read a periodically
+  refreshed copy of the database (see reporting.py). The workers share one
+  copy, and only one of them refreshes it at a time.
+- ``AGRIDRAIN_METRICS_TOKEN``: bearer token a Prometheus scraper sends to
+  /metrics. Without it only a logged-in admin can read /metrics. Behind the
+  proxy every request comes from 127.0.0.1, so leave
+  ``AGRIDRAIN_METRICS_LOOPBACK`` off unless nothing proxies to this bind.
+
+Run ``python -m benchmarks.bench_serving`` to measure start-up time and
+requests/second at different worker counts.
+"""
+import os
+
+import db
+import migrations
+
+bind = os.environ.get('AGRIDRAIN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+threads = int(os.environ.get('AGRIDRAIN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """Migrate once, in the master, before any worker is forked."""
+    applied = migrations.migrate_database(db.database_path())
+    if applied:
+        server.log.info("Applied schema migrations %s", ", ".join(map(str, applied)))
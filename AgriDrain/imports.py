@@ -0,0 +1,304 @@
+"""Bulk import of farmers and farmer_data submissions from CSV / NDJSON.
+
+Files are parsed as a stream, validated row by row against the knowledge
+base categories, and inserted with ``executemany`` in large transactions.
+Bad rows are reported with their line number and skipped; they never abort
+the rest of the import.
+
+A file that cannot be read any further (not UTF-8, a corrupt gzip stream)
+stops the import. The batches committed before that stay; the report lists
+them with the last line each one covers, and the rows read after the last
+of them are not imported.
+"""
+import csv
+import gzip
+import io
+import json
+import time
+import zlib
+from datetime import datetime
+
+import geo
+import knowledge
+
+BATCH_SIZE = 5000
+# Only the first errors are kept in the report; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+KINDS = ('farmers', 'submissions')
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+# Failures of the file itself rather than of one row (gzip.BadGzipFile is an OSError)
+READ_ERRORS = (UnicodeDecodeError, OSError, EOFError, zlib.error, csv.Error)
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.read = 0
+        self.line = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.batches = []
+        self.file_error = None
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def commit(self, rows):
+        """Record a committed batch, which covers every row up to the current line."""
+        self.inserted += rows
+        self.batches.append({'rows': rows, 'through_line': self.line})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'read': self.read,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors),
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.read / self.seconds) if self.seconds else None,
+            'batches': self.batches,
+            'committed_through_line': self.batches[-1]['through_line'] if self.batches else 0,
+            'file_error': self.file_error,
+        }
+
+
+def open_text(stream, filename=''):
+    """Text stream over an uploaded/opened binary file, transparently gunzipped."""
+    if filename.endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def detect_format(filename):
+    name = filename[:-3] if filename.endswith('.gz') else filename
+    return 'ndjson' if name.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def iter_records(text, fmt):
+    """Yield ``(line_number, dict)``; malformed NDJSON lines yield a RowError instead."""
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, {k.strip(): v for k, v in record.items() if k}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f"invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, RowError("expected a JSON object")
+            continue
+        yield line_number, record
+
+
+def _describe_read_error(error):
+    if isinstance(error, UnicodeDecodeError):
+        return f"the file is not valid UTF-8 text ({error.reason}: {error.object[error.start:error.end]!r})"
+    if isinstance(error, csv.Error):
+        return f"the CSV could not be parsed ({error})"
+    return f"the file could not be read ({error or type(error).__name__})"
+
+
+def _read(records, report):
+    """Yield the records, stopping at an error reading the file itself (set on the report)."""
+    try:
+        for line, record in records:
+            report.read += 1
+            report.line = line
+            yield line, record
+    except READ_ERRORS as e:
+        report.file_error = _describe_read_error(e)
+
+
+def _text(record, field, required=False):
+    value = record.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{field} is required")
+    return value
+
+
+def _category(kb, record, field, allowed):
+    value = _text(record, field, required=True)
+    key = kb.key(value)
+    if key is None or key not in allowed:
+        raise RowError(f"unknown {field} {value!r}")
+    return key
+
+
+def _timestamp(value):
+    if not value:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if len(value) == 19 and value[10] == ' ':
+        # Canonical form (what the exports write): validate without strptime
+        try:
+            return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass
+    raise RowError(f"created_at {value!r} is not YYYY-MM-DD[ HH:MM:SS]")
+
+
+def _flush(conn, sql, rows, report):
+    if not rows:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(sql, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    report.commit(len(rows))
+    rows.clear()
+
+
+def import_farmers(conn, records, batch_size=BATCH_SIZE):
+    report = ImportReport('farmers')
+    sql = "INSERT INTO farmers (name, mobile, password) VALUES (?, ?, ?)"
+    seen_mobiles = set()
+    pending, pending_lines = [], []
+
+    def flush():
+        # Drop rows whose mobile is already registered before the batch insert
+        mobiles = [row[1] for row in pending]
+        existing = set()
+        for start in range(0, len(mobiles), 500):
+            chunk = mobiles[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(r[0] for r in conn.execute(
+                f"SELECT mobile FROM farmers WHERE mobile IN ({placeholders})", chunk))
+        keep = []
+        for row, line in zip(pending, pending_lines):
+            if row[1] in existing:
+                report.reject(line, f"mobile {row[1]} is already registered")
+            else:
+                keep.append(row)
+        _flush(conn, sql, keep, report)
+        pending.clear()
+        pending_lines.clear()
+
+    for line, record in _read(records, report):
+        try:
+            if isinstance(record, RowError):
+                raise record
+            name = _text(record, 'name', required=True)
+            mobile = _text(record, 'mobile', required=True)
+            password = _text(record, 'password', required=True)
+            if mobile in seen_mobiles:
+                raise RowError(f"mobile {mobile} appears more than once in the file")
+        except RowError as e:
+            report.reject(line, str(e))
+            continue
+        seen_mobiles.add(mobile)
+        pending.append((name, mobile, password))
+        pending_lines.append(line)
+        if len(pending) >= batch_size:
+            flush()
+    # After a read error the last, partial batch is not committed
+    if pending and report.file_error is None:
+        flush()
+    return report.finish()
+
+
+class FarmerResolver:
+    """Map farmer_id / mobile columns to (farmer_id, name), caching lookups."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.by_id = {}
+        self.by_mobile = {}
+
+    def resolve(self, record):
+        farmer_id = _text(record, 'farmer_id')
+        mobile = _text(record, 'mobile')
+        if farmer_id:
+            if not (farmer_id.isascii() and farmer_id.isdigit()):
+                raise RowError(f"farmer_id {farmer_id!r} is not a number")
+            farmer_id = int(farmer_id)
+            if farmer_id not in self.by_id:
+                row = self.conn.execute("SELECT id, name FROM farmers WHERE id = ?", (farmer_id,)).fetchone()
+                self.by_id[farmer_id] = (row[0], row[1]) if row else None
+            farmer = self.by_id[farmer_id]
+        elif mobile:
+            if mobile not in self.by_mobile:
+                row = self.conn.execute("SELECT id, name FROM farmers WHERE mobile = ?", (mobile,)).fetchone()
+                self.by_mobile[mobile] = (row[0], row[1]) if row else None
+            farmer = self.by_mobile[mobile]
+        else:
+            raise RowError("farmer_id or mobile is required")
+        if farmer is None:
+            raise RowError(f"no registered farmer with farmer_id={farmer_id or '-'} mobile={mobile or '-'}")
+        return farmer
+
+
+def import_submissions(conn, records, batch_size=BATCH_SIZE):
+    report = ImportReport('submissions')
+    kb = knowledge.get_knowledge_base()
+    soils, waters, crops = set(kb.soil_types), set(kb.water_levels), set(kb.crops)
+    farmers = FarmerResolver(conn)
+    sql = """
+        INSERT INTO farmer_data (farmer_id, name, soil_type, water_level, crop,
+                                 farm_address, latitude, longitude, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    pending = []
+    for line, record in _read(records, report):
+        try:
+            if isinstance(record, RowError):
+                raise record
+            farmer_id, farmer_name = farmers.resolve(record)
+            soil = _category(kb, record, 'soil_type', soils)
+            water = _category(kb, record, 'water_level', waters)
+            crop = _category(kb, record, 'crop', crops)
+            lat, lon = geo.parse_lat_lon(record.get('latitude'), record.get('longitude'))
+            if lat is None and (_text(record, 'latitude') or _text(record, 'longitude')):
+                raise RowError("latitude/longitude must both be valid coordinates")
+            created_at = _timestamp(_text(record, 'created_at'))
+        except RowError as e:
+            report.reject(line, str(e))
+            continue
+        pending.append((farmer_id, _text(record, 'name') or farmer_name, soil, water, crop,
+                        _text(record, 'farm_address'), lat, lon, created_at))
+        if len(pending) >= batch_size:
+            _flush(conn, sql, pending, report)
+    if report.file_error is None:
+        _flush(conn, sql, pending, report)
+    return report.finish()
+
+
+def import_file(conn, kind, stream, filename='', fmt=None, batch_size=BATCH_SIZE):
+    """Import one uploaded or opened binary file and return its ImportReport."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    fmt = fmt or detect_format(filename)
+    records = iter_records(open_text(stream, filename), fmt)
+    if conn.in_transaction:
+        conn.commit()
+    if kind == 'farmers':
+        return import_farmers(conn, records, batch_size)
+    return import_submissions(conn, records, batch_size)
@@ -1,68 +1,38 @@
 import sqlite3
 from datetime import datetime
 
+import migrations
+from db import database_path
+
 # Connect to database (creates file if it doesn't exist)
-conn = sqlite3.connect('agri_drain.db')
+conn = sqlite3.connect(database_path())
 cur = conn.cursor()
 
-# --- Create farmers table ---
-cur.execute('''
-CREATE TABLE IF NOT EXISTS farmers (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    mobile TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL
-)
-''')
-
-# --- Create admins table ---
-cur.execute('''
-CREATE TABLE IF NOT EXISTS admins (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL
-)
-''')
-
-# --- Create farmer_data table with new columns ---
-cur.execute('''
-CREATE TABLE IF NOT EXISTS farmer_data (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    soil_type TEXT,
-    water_level TEXT,
-    crop TEXT,
-    farm_address TEXT,
-    latitude REAL,
-    longitude REAL,
-    submission_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    feedback TEXT,
-    recommendation TEXT
-)
-''')
+# --- Create / upgrade tables, indexes and rollups ---
+applied = migrations.migrate(conn)
 
 # Insert default admin
 cur.execute('INSERT OR IGNORE INTO admins (username, password) VALUES (?, ?)', ('admin', 'admin123'))
 
 # Insert sample farmer data with location (optional - for testing)
-cur.execute('''
-INSERT OR IGNORE INTO farmer_data 
-(name, soil_type, water_level, crop, farm_address, latitude, longitude, submission_date) 
-VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-''', (
-    'Sample Farmer',
-    'Black Soil',
-    'Moderate (2m - 5m)',
-    'Cotton',
-    'Sample Farm, Maharashtra',
-    19.7515,
-    75.7139,
-    datetime.now()
-))
+if not cur.execute('SELECT 1 FROM farmer_data WHERE name = ?', ('Sample Farmer',)).fetchone():
+    cur.execute('''
+    INSERT INTO farmer_data
+    (name, soil_type, water_level, crop, farm_address, latitude, longitude, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        'Sample Farmer',
+        'Black Soil',
+        'Moderate (2m - 5m)',
+        'Cotton',
+        'Sample Farm, Maharashtra',
+        19.7515,
+        75.7139,
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ))
 
 conn.commit()
 conn.close()
 
 print("✅ Database initialized successfully!")
-print("✅ Tables created: farmers, admins, farmer_data")
-print("✅ New columns added: farm_address, latitude, longitude, submission_date")
\ No newline at end of file
+print(f"✅ Schema version: {migrations.LATEST_VERSION} (applied: {applied or 'none, already up to date'})")
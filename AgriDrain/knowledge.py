@@ -0,0 +1,171 @@
+"""Crop knowledge base, parsed once from data/crop_knowledge.json.
+
+The JSON file is loaded into read-only, interned structures the first time it
+is needed and re-read automatically when the file changes on disk, so every
+worker picks up an edited knowledge base without a restart. Fully built
+suggestion payloads, and their JSON form stored with each submission (see
+snapshots.py), are memoized per (soil, water, crop) in bounded LRUs that are
+cleared on every reload.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
+
+KNOWLEDGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "crop_knowledge.json")
+
+# How often (seconds) to stat the data file for changes
+RELOAD_CHECK_INTERVAL = 2.0
+PAYLOAD_CACHE_SIZE = 512
+
+
+def _freeze(value):
+    """Recursively convert parsed JSON into interned, immutable structures."""
+    if isinstance(value, dict):
+        return MappingProxyType({sys.intern(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def thaw(value):
+    """Plain dicts and lists again, for JSON encoding of frozen structures."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+class KnowledgeBase:
+    """Immutable, indexed view of one version of the knowledge file."""
+
+    def __init__(self, data, mtime=None):
+        self.mtime = mtime
+        self.crop_suggestions = _freeze(data['crop_suggestions'])
+        self.crop_guide = _freeze(data['crop_guide'])
+        self.default_crop_guide = _freeze(data['default_crop_guide'])
+        self.rotation = _freeze(data['rotation'])
+        self.intercropping = _freeze(data['intercropping'])
+        self.irrigation = _freeze(data['irrigation'])
+        self.defaults = _freeze(data['defaults'])
+        self.crop_seasons = _freeze(data.get('crop_seasons', {}))
+        self.irrigation_profiles = _freeze(data.get('irrigation_profiles', {}))
+
+        # Known categories, in file order, for validation and dropdowns
+        self.soil_types = tuple(self.crop_suggestions)
+        water_levels = {}
+        crops = {}
+        for by_water in self.crop_suggestions.values():
+            for water, crop_list in by_water.items():
+                water_levels.setdefault(water, None)
+                for crop in crop_list:
+                    crops.setdefault(crop, None)
+        for crop in self.crop_guide:
+            crops.setdefault(crop, None)
+        self.water_levels = tuple(water_levels)
+        self.crops = tuple(crops)
+        self._keys = {key: key for key in self.soil_types + self.water_levels + self.crops}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data, mtime=os.stat(path).st_mtime_ns)
+
+    def key(self, value):
+        """Canonical interned key for a soil/water/crop name, or None if unknown."""
+        return self._keys.get(value) if value else None
+
+    def recommendations(self, soil_type, water_level):
+        by_water = self.crop_suggestions.get(self.key(soil_type))
+        if by_water is None:
+            return ()
+        return by_water.get(self.key(water_level), ())
+
+    def guide(self, crop_name):
+        return self.crop_guide.get(self.key(crop_name), self.default_crop_guide)
+
+    def rotation_suggestion(self, soil):
+        return self.rotation.get(self.key(soil), self.defaults['rotation'])
+
+    def intercropping_suggestion(self, soil):
+        return self.intercropping.get(self.key(soil), self.defaults['intercropping'])
+
+    def irrigation_suggestion(self, water):
+        return self.irrigation.get(self.key(water), self.defaults['irrigation'])
+
+
+_lock = threading.Lock()
+_current = None
+_last_check = 0.0
+
+
+def reload(path=KNOWLEDGE_FILE):
+    """Parse the knowledge file again and drop every memoized payload."""
+    global _current, _last_check
+    kb = KnowledgeBase.from_file(path)
+    with _lock:
+        _current = kb
+        _last_check = time.monotonic()
+        _payload.cache_clear()
+        _payload_json.cache_clear()
+    return kb
+
+
+def get_knowledge_base():
+    """Current knowledge base, reloading it if the data file has changed."""
+    global _last_check
+    kb = _current
+    if kb is None:
+        return reload()
+    now = time.monotonic()
+    if now - _last_check >= RELOAD_CHECK_INTERVAL:
+        _last_check = now
+        try:
+            changed = os.stat(KNOWLEDGE_FILE).st_mtime_ns != kb.mtime
+        except OSError:
+            changed = False
+        if changed:
+            try:
+                kb = reload()
+            except (OSError, ValueError, KeyError):
+                # Keep serving the last good version if the edit is incomplete
+                pass
+    return kb
+
+
+@lru_cache(maxsize=PAYLOAD_CACHE_SIZE)
+def _payload(kb, soil_type, water_level, selected_crop):
+    return MappingProxyType({
+        'recommended_crops': kb.recommendations(soil_type, water_level),
+        'crop_guide': kb.guide(selected_crop),
+        'additional_suggestions': MappingProxyType({
+            'rotation': kb.rotation_suggestion(soil_type),
+            'intercropping': kb.intercropping_suggestion(soil_type),
+            'irrigation': kb.irrigation_suggestion(water_level),
+        }),
+    })
+
+
+def suggestion_payload(soil_type, water_level, selected_crop):
+    """Memoized recommendations, guide and tips for one (soil, water, crop) key."""
+    kb = get_knowledge_base()
+    return _payload(kb, kb.key(soil_type) or '', kb.key(water_level) or '', kb.key(selected_crop) or '')
+
+
+@lru_cache(maxsize=PAYLOAD_CACHE_SIZE)
+def _payload_json(kb, soil_type, water_level, selected_crop):
+    payload = thaw(_payload(kb, soil_type, water_level, selected_crop))
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def suggestion_json(soil_type, water_level, selected_crop):
+    """``suggestion_payload`` as compact, canonical JSON text (memoized the same way)."""
+    kb = get_knowledge_base()
+    return _payload_json(kb, kb.key(soil_type) or '', kb.key(water_level) or '', kb.key(selected_crop) or '')
@@ -0,0 +1,156 @@
+"""Server-side clustering of farm locations into cached GeoJSON tiles.
+
+Farms are grouped per web-mercator tile (z/x/y) into a fixed grid of cells.
+Each cell becomes one GeoJSON point at the centroid of its farms, with the
+farm count and crop/soil breakdowns. Tiles are cached in-process and the
+cache is dropped whenever the farmer_data version counter moves, so every
+worker sees new submissions on its next request.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import db
+
+CELLS_PER_TILE = 8
+MAX_ZOOM = 18
+MAX_TILES_PER_REQUEST = 64
+TILE_CACHE_SIZE = 4096
+
+
+def tile_for(lat, lon, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of a slippy-map tile."""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tiles_for_bbox(south, west, north, east, z):
+    x0, y0 = tile_for(north, west, z)
+    x1, y1 = tile_for(south, east, z)
+    return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def cluster_tile(conn, z, x, y):
+    """GeoJSON features for one tile, one per non-empty grid cell."""
+    south, west, north, east = tile_bounds(z, x, y)
+    cell_w = (east - west) / CELLS_PER_TILE
+    cell_h = (north - south) / CELLS_PER_TILE
+    last = CELLS_PER_TILE - 1
+    rows = conn.execute("""
+        SELECT MIN(MAX(CAST((fd.longitude - :west) / :cell_w AS INTEGER), 0), :last) AS cx,
+               MIN(MAX(CAST((:north - fd.latitude) / :cell_h AS INTEGER), 0), :last) AS cy,
+               fd.crop, fd.soil_type,
+               COUNT(*) AS count,
+               SUM(fd.latitude) AS lat_sum, SUM(fd.longitude) AS lon_sum,
+               MIN(fd.id) AS first_id
+        FROM farmer_data_geo g
+        JOIN farmer_data fd ON fd.id = g.id
+        WHERE g.max_lat >= :south AND g.min_lat <= :north
+          AND g.max_lon >= :west AND g.min_lon <= :east
+          AND fd.latitude > :south AND fd.latitude <= :north
+          AND fd.longitude >= :west AND fd.longitude < :east
+          AND fd.crop IS NOT NULL AND fd.crop != ''
+        GROUP BY cx, cy, fd.crop, fd.soil_type
+    """, {'south': south, 'west': west, 'north': north, 'east': east,
+          'cell_w': cell_w, 'cell_h': cell_h, 'last': last}).fetchall()
+
+    cells = {}
+    for row in rows:
+        cell = cells.setdefault((row['cx'], row['cy']), {
+            'count': 0, 'lat_sum': 0.0, 'lon_sum': 0.0, 'first_id': row['first_id'], 'crops': {}, 'soils': {}
+        })
+        cell['count'] += row['count']
+        cell['lat_sum'] += row['lat_sum']
+        cell['lon_sum'] += row['lon_sum']
+        cell['first_id'] = min(cell['first_id'], row['first_id'])
+        cell['crops'][row['crop']] = cell['crops'].get(row['crop'], 0) + row['count']
+        if row['soil_type']:
+            cell['soils'][row['soil_type']] = cell['soils'].get(row['soil_type'], 0) + row['count']
+
+    features = []
+    for (cx, cy), cell in sorted(cells.items()):
+        properties = {
+            'count': cell['count'],
+            'crops': cell['crops'],
+            'soils': cell['soils'],
+            'tile': f"{z}/{x}/{y}",
+        }
+        if cell['count'] == 1:
+            properties['submission_id'] = cell['first_id']
+        features.append({
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [
+                    round(cell['lon_sum'] / cell['count'], 6),
+                    round(cell['lat_sum'] / cell['count'], 6),
+                ],
+            },
+            'properties': properties,
+        })
+    return features
+
+
+class TileCache:
+    """Bounded LRU of clustered tiles, invalidated by the farmer_data version."""
+
+    def __init__(self, size=TILE_CACHE_SIZE):
+        self.size = size
+        self._tiles = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def features(self, conn, tile):
+        version = db.table_version(conn, 'farmer_data')
+        with self._lock:
+            if version != self._version:
+                self._tiles.clear()
+                self._version = version
+            cached = self._tiles.get(tile)
+            if cached is not None:
+                self._tiles.move_to_end(tile)
+                self.hits += 1
+                return cached
+
+        features = cluster_tile(conn, *tile)
+        with self._lock:
+            self.misses += 1
+            if version == self._version:
+                self._tiles[tile] = features
+                while len(self._tiles) > self.size:
+                    self._tiles.popitem(last=False)
+        return features
+
+    def stats(self):
+        with self._lock:
+            return {'tiles': len(self._tiles), 'hits': self.hits, 'misses': self.misses, 'version': self._version}
+
+
+tile_cache = TileCache()
+
+
+def clusters_geojson(conn, south, west, north, east, z):
+    """FeatureCollection of clusters for every tile overlapping the box at zoom ``z``."""
+    tiles = tiles_for_bbox(south, west, north, east, z)
+    if len(tiles) > MAX_TILES_PER_REQUEST:
+        raise ValueError(f"bounding box covers {len(tiles)} tiles at zoom {z}; "
+                         f"the limit is {MAX_TILES_PER_REQUEST}, use a lower zoom")
+    features = []
+    for tile in tiles:
+        features.extend(tile_cache.features(conn, tile))
+    return {'type': 'FeatureCollection', 'features': features}
@@ -0,0 +1,439 @@
+"""Per-request metrics, SQL instrumentation and a slow-request profiler.
+
+For every request this records, per route:
+
+- the latency, status and response size;
+- how many SQL statements the request ran and how long they took in total
+  (through the ``observer`` hook on connections handed out by ``get_db()``);
+- how long each template took to render.
+
+Totals are kept as Prometheus histograms and counters and served as text at
+``/metrics``, along with the connection pool, page cache and write-behind
+stats. /metrics answers admins and scrapers sending ``METRICS_TOKEN`` as a
+bearer token. Unauthenticated requests from localhost are allowed only with
+``METRICS_ALLOW_LOOPBACK`` on, and never when they carry proxy headers:
+behind a reverse proxy every request arrives from localhost. A response also
+carries the per-request figures in a ``Server-Timing`` header, which browser
+dev tools display.
+
+Statements slower than ``METRICS_SLOW_QUERY_MS`` go to a bounded slow-query
+log together with their ``EXPLAIN QUERY PLAN``. SQL time is measured up to
+the statement's first row. That covers aggregates, sorts and index lookups,
+but not the time spent fetching a long result afterwards.
+
+With ``METRICS_PROFILE`` on (or ``AGRIDRAIN_PROFILE=1``), one background
+thread samples the stacks of in-flight requests every
+``METRICS_PROFILE_INTERVAL_MS``. Requests slower than
+``METRICS_PROFILE_THRESHOLD_MS`` have their samples written to
+``METRICS_PROFILE_DIR`` as folded stacks, the input format of flamegraph.pl
+and speedscope.
+"""
+import bisect
+import collections
+import hmac
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from flask import before_render_template, current_app, g, request, session, template_rendered
+
+import db
+import pages
+import writebehind
+
+DEFAULT_CONFIG = {
+    'METRICS_ENABLED': True,
+    # Bearer token for scrapers; admins need none
+    'METRICS_TOKEN': os.environ.get('AGRIDRAIN_METRICS_TOKEN', ''),
+    # Let unauthenticated local scrapers in; only safe when no proxy forwards to the app
+    'METRICS_ALLOW_LOOPBACK': os.environ.get('AGRIDRAIN_METRICS_LOOPBACK') == '1',
+    'METRICS_SLOW_QUERY_MS': 100,
+    'METRICS_SLOW_QUERY_LOG_SIZE': 100,
+    'METRICS_PROFILE': os.environ.get('AGRIDRAIN_PROFILE') == '1',
+    'METRICS_PROFILE_INTERVAL_MS': 5,
+    'METRICS_PROFILE_THRESHOLD_MS': 500,
+    'METRICS_PROFILE_DIR': os.path.join(tempfile.gettempdir(), 'agridrain-profiles'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LOOPBACK = ('127.0.0.1', '::1')
+# A loopback request carrying any of these came through a proxy
+PROXY_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+EXPLAINABLE = ('SELECT', 'WITH')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+# --- Instruments ---
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values=(), amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labels, values)} {_number(value)}"
+                     for values, value in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values, amount):
+        index = bisect.bisect_left(self.buckets, amount)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((values, list(series)) for values, series in self._series.items())
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+def _gauges(name, help_text, stats):
+    """Gauge lines for every numeric value in a stats dict."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            lines.append(f'{name}{{stat="{_escape(key)}"}} {_number(value)}')
+    return lines
+
+
+# --- Sampling profiler ---
+def _folded(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of registered request threads from one daemon thread."""
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000.0
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_running(self):
+        # A forked worker does not inherit the sampler thread
+        if self._thread is None or self._pid != os.getpid():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._active = {}
+                    self._thread = threading.Thread(target=self._run, name='agridrain-profiler',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def begin(self, thread_id):
+        self._ensure_running()
+        with self._lock:
+            self._active[thread_id] = collections.Counter()
+
+    def end(self, thread_id):
+        """Samples collected for ``thread_id`` since ``begin``, as {folded stack: count}."""
+        with self._lock:
+            return self._active.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_folded(frame)] += 1
+
+
+def _slug(route):
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+
+
+def write_profile(directory, route, seconds, samples):
+    """Write folded stacks (``frame;frame;frame count`` per line); returns the file path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(directory, f"{stamp}-{int(seconds * 1000)}ms-{_slug(route)}.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+
+# --- Registry ---
+class RequestRecord:
+    __slots__ = ('start', 'statements', 'sql_seconds', 'template_seconds', 'template_starts', 'thread_id')
+
+    def __init__(self, thread_id):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_starts = []
+        self.thread_id = thread_id
+
+
+class Metrics:
+    """All instruments for one app, plus the slow-query log and the profiler."""
+
+    def __init__(self, slow_query_log_size=100, profile_interval_ms=5):
+        self.started = time.time()
+        self.requests = Counter('agridrain_requests_total', 'Requests by route, method and status.',
+                                ('route', 'method', 'status'))
+        self.latency = Histogram('agridrain_request_duration_seconds', 'Time to build the response.',
+                                 ('route', 'method'), LATENCY_BUCKETS)
+        self.response_size = Histogram('agridrain_response_size_bytes',
+                                       'Response body size (streamed bodies excluded).',
+                                       ('route',), SIZE_BUCKETS)
+        self.statements = Histogram('agridrain_sql_statements_per_request',
+                                    'SQL statements run by one request.',
+                                    ('route',), STATEMENT_BUCKETS)
+        self.sql_time = Histogram('agridrain_sql_seconds_per_request',
+                                  'Cumulative SQL time of one request.',
+                                  ('route',), LATENCY_BUCKETS)
+        self.template_time = Histogram('agridrain_template_render_seconds', 'Template render time.',
+                                       ('template',), LATENCY_BUCKETS)
+        self.slow_query_count = Counter('agridrain_slow_queries_total',
+                                        'Statements above the slow-query threshold.', ('route',))
+        self.profiles = Counter('agridrain_profiles_written_total', 'Slow-request profiles written.',
+                                ('route',))
+        self.slow_log = collections.deque(maxlen=slow_query_log_size)
+        self.profiler = SamplingProfiler(profile_interval_ms)
+
+    def record_slow_query(self, conn, route, sql, params, seconds):
+        plan = []
+        if params is not None and sql.lstrip()[:6].upper().startswith(EXPLAINABLE):
+            try:
+                # Straight to sqlite3 so the plan lookup is not itself observed
+                rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f"unavailable: {e}"]
+        self.slow_query_count.inc((route,))
+        self.slow_log.append({
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'route': route,
+            'sql': " ".join(sql.split())[:1000],
+            'ms': round(seconds * 1000, 2),
+            'plan': plan,
+        })
+
+    def slow_queries(self):
+        return list(reversed(self.slow_log))
+
+    def _slow_query_lines(self):
+        """Slowest time and count per (route, statement) in the current log."""
+        grouped = {}
+        for entry in self.slow_log:
+            key = (entry['route'], entry['sql'])
+            slowest, count, _ = grouped.get(key, (0.0, 0, None))
+            grouped[key] = (max(slowest, entry['ms'] / 1000), count + 1, " | ".join(entry['plan']))
+        name = 'agridrain_slow_query_max_seconds'
+        lines = [f"# HELP {name} Slowest recent run of each logged slow statement, with its query plan.",
+                 f"# TYPE {name} gauge"]
+        for (route, sql), (slowest, count, plan) in sorted(grouped.items()):
+            labels = _labels(('route', 'sql', 'plan', 'runs'), (route, sql, plan, count))
+            lines.append(f"{name}{labels} {_number(slowest)}")
+        return lines
+
+    def render(self, app):
+        lines = []
+        for instrument in (self.requests, self.latency, self.response_size, self.statements,
+                           self.sql_time, self.template_time, self.slow_query_count, self.profiles):
+            lines.extend(instrument.render())
+        lines.extend(self._slow_query_lines())
+        lines.extend(_gauges('agridrain_db_pool', 'Connection pool counters.', db.get_pool(app).stats()))
+        lines.extend(_gauges('agridrain_page_cache', 'Pre-rendered page cache counters.',
+                             pages.page_cache.stats()))
+        if writebehind.enabled(app):
+            lines.extend(_gauges('agridrain_write_behind', 'Write-behind queue counters.',
+                                 writebehind.get_queue(app).stats()))
+        lines.extend(["# HELP agridrain_uptime_seconds Seconds since the metrics registry was created.",
+                      "# TYPE agridrain_uptime_seconds gauge",
+                      f"agridrain_uptime_seconds {_number(round(time.time() - self.started, 3))}"])
+        return "\n".join(lines) + "\n"
+
+
+def enabled(app=None):
+    return 'agridrain_metrics' in (app or current_app).extensions
+
+
+def get_metrics(app=None):
+    app = app or current_app
+    return app.extensions['agridrain_metrics']
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+# --- Hooks ---
+def _before_request():
+    record = g._metrics = RequestRecord(threading.get_ident())
+    if current_app.config['METRICS_PROFILE']:
+        get_metrics().profiler.begin(record.thread_id)
+
+
+def _observe_statement(conn, sql, params, seconds):
+    record = g.get('_metrics')
+    if record is None:
+        return
+    record.statements += 1
+    record.sql_seconds += seconds
+    if seconds * 1000 >= current_app.config['METRICS_SLOW_QUERY_MS']:
+        get_metrics().record_slow_query(conn, _route(), sql, params, seconds)
+
+
+def _template_started(sender, template, context, **extra):
+    record = g.get('_metrics')
+    if record is not None:
+        record.template_starts.append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    record = g.get('_metrics')
+    if record is None or not record.template_starts:
+        return
+    seconds = time.perf_counter() - record.template_starts.pop()
+    # Nested renders are already inside the outer one's time
+    if not record.template_starts:
+        record.template_seconds += seconds
+    get_metrics(sender).template_time.observe((template.name or 'string',), seconds)
+
+
+def _finish(record, status, size):
+    app = current_app
+    metrics = get_metrics(app)
+    seconds = time.perf_counter() - record.start
+    route = _route()
+    metrics.requests.inc((route, request.method, str(status)))
+    metrics.latency.observe((route, request.method), seconds)
+    if size is not None:
+        metrics.response_size.observe((route,), size)
+    metrics.statements.observe((route,), record.statements)
+    metrics.sql_time.observe((route,), record.sql_seconds)
+    if app.config['METRICS_PROFILE']:
+        samples = metrics.profiler.end(record.thread_id)
+        if samples and seconds * 1000 >= app.config['METRICS_PROFILE_THRESHOLD_MS']:
+            path = write_profile(app.config['METRICS_PROFILE_DIR'], route, seconds, samples)
+            metrics.profiles.inc((route,))
+            app.logger.info("slow request %s %s (%.0f ms) profiled to %s", request.method, request.path,
+                            seconds * 1000, path)
+    return seconds
+
+
+def _after_request(response):
+    record = g.pop('_metrics', None)
+    if record is None:
+        return response
+    # None for streamed bodies such as exports
+    seconds = _finish(record, response.status_code, response.calculate_content_length())
+    response.headers.add('Server-Timing', f'app;dur={seconds * 1000:.1f}')
+    response.headers.add('Server-Timing',
+                         f'db;dur={record.sql_seconds * 1000:.1f};desc="{record.statements} statements"')
+    if record.template_seconds:
+        response.headers.add('Server-Timing', f'tpl;dur={record.template_seconds * 1000:.1f}')
+    return response
+
+
+def _teardown_request(exception=None):
+    # Still set only when after_request never ran, i.e. the view raised
+    record = g.pop('_metrics', None)
+    if record is not None:
+        _finish(record, 500, None)
+
+
+def authorized():
+    """Scrapers authenticate with the bearer token and admins with their session.
+
+    Direct requests from localhost need neither when ``METRICS_ALLOW_LOOPBACK`` is on.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    if session.get('admin_logged_in'):
+        return True
+    return (current_app.config['METRICS_ALLOW_LOOPBACK'] and request.remote_addr in LOOPBACK
+            and not any(header in request.headers for header in PROXY_HEADERS))
+
+
+def render(app=None):
+    app = app or current_app
+    return get_metrics(app).render(app)
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.extensions['agridrain_metrics'] = Metrics(app.config['METRICS_SLOW_QUERY_LOG_SIZE'],
+                                                  app.config['METRICS_PROFILE_INTERVAL_MS'])
+    app.extensions['agridrain_sql_observer'] = _observe_statement
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
@@ -0,0 +1,758 @@
+"""Versioned schema migrations for the AgriDrain database.
+
+The schema version is kept in ``PRAGMA user_version``. Each migration runs in
+its own ``BEGIN IMMEDIATE`` transaction, so several workers starting at once
+apply it exactly once, and a failed migration leaves the file untouched.
+Every step is written to cope with the older ``agri_drain.db`` layouts that
+are already out in the field (``submission_date`` instead of ``created_at``,
+missing location columns, ``NOT NULL`` names, extra legacy tables).
+
+A step's SQL is written out here in full, backfills included, and never
+changes afterwards, so every database at a given ``user_version`` has the same
+schema whatever the modules look like today. A schema change is a new step;
+one that only needs derived data recomputed can call the module's
+``rebuild()``.
+"""
+import re
+import sqlite3
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(conn, table, column, definition):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS farmers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            mobile TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS farmer_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            soil_type TEXT,
+            water_level TEXT,
+            crop TEXT,
+            farm_address TEXT,
+            latitude REAL,
+            longitude REAL,
+            created_at TEXT,
+            feedback TEXT,
+            recommendation TEXT
+        )
+    """)
+
+
+def reconcile_farmer_data_columns(conn):
+    """Bring databases created by the old init_db.py in line with app.py."""
+    for column, definition in (
+        ('soil_type', 'TEXT'),
+        ('water_level', 'TEXT'),
+        ('crop', 'TEXT'),
+        ('farm_address', 'TEXT'),
+        ('latitude', 'REAL'),
+        ('longitude', 'REAL'),
+        ('created_at', 'TEXT'),
+        ('feedback', 'TEXT'),
+        ('recommendation', 'TEXT'),
+    ):
+        _add_column(conn, 'farmer_data', column, definition)
+
+    columns = _columns(conn, 'farmer_data')
+    # The very first schema used short soil/water column names
+    for old, new in (('soil', 'soil_type'), ('water', 'water_level')):
+        if old in columns:
+            conn.execute(f"UPDATE farmer_data SET {new} = {old} WHERE {new} IS NULL")
+
+    if 'submission_date' in columns:
+        conn.execute("""
+            UPDATE farmer_data
+            SET created_at = strftime('%Y-%m-%d %H:%M:%S', submission_date)
+            WHERE created_at IS NULL AND submission_date IS NOT NULL
+        """)
+
+
+def add_farmer_foreign_key(conn):
+    """Link submissions to farmers by id instead of by name."""
+    _add_column(conn, 'farmer_data', 'farmer_id', 'INTEGER REFERENCES farmers(id) ON DELETE CASCADE')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmers_name ON farmers(name)")
+    conn.execute("""
+        UPDATE farmer_data
+        SET farmer_id = (SELECT MIN(f.id) FROM farmers f WHERE f.name = farmer_data.name)
+        WHERE farmer_id IS NULL
+    """)
+
+
+def add_lookup_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_data_farmer_id ON farmer_data(farmer_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_data_crop ON farmer_data(crop)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_data_soil_type ON farmer_data(soil_type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_data_water_level ON farmer_data(water_level)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_data_created_at ON farmer_data(created_at)")
+
+
+def install_rollups(conn):
+    """Category counters for the dashboard cards and /reports, kept by triggers (see rollups.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submission_rollups (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_rollup_insert
+        AFTER INSERT ON farmer_data
+        BEGIN
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'submissions', '', 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'farmer', CAST(NEW.farmer_id AS TEXT), 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND NEW.farmer_id IS NOT NULL
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'soil_type', NEW.soil_type, 1 WHERE NEW.soil_type IS NOT NULL AND NEW.soil_type != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'crop', NEW.crop, 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'water_level', NEW.water_level, 1 WHERE NEW.water_level IS NOT NULL AND NEW.water_level != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_rollup_delete
+        AFTER DELETE ON farmer_data
+        BEGIN
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'submissions' AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'farmer' AND value = CAST(OLD.farmer_id AS TEXT)
+              AND OLD.crop IS NOT NULL AND OLD.crop != '' AND OLD.farmer_id IS NOT NULL;
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'soil_type' AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'crop' AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'water_level' AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_rollups WHERE count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_rollup_update
+        AFTER UPDATE OF farmer_id, soil_type, water_level, crop ON farmer_data
+        BEGIN
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'submissions' AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'farmer' AND value = CAST(OLD.farmer_id AS TEXT)
+              AND OLD.crop IS NOT NULL AND OLD.crop != '' AND OLD.farmer_id IS NOT NULL;
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'soil_type' AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'crop' AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'water_level' AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_rollups WHERE count <= 0;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'submissions', '', 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'farmer', CAST(NEW.farmer_id AS TEXT), 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND NEW.farmer_id IS NOT NULL
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'soil_type', NEW.soil_type, 1 WHERE NEW.soil_type IS NOT NULL AND NEW.soil_type != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'crop', NEW.crop, 1 WHERE NEW.crop IS NOT NULL AND NEW.crop != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_rollups (dimension, value, count)
+            SELECT 'water_level', NEW.water_level, 1 WHERE NEW.water_level IS NOT NULL AND NEW.water_level != ''
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        INSERT INTO submission_rollups (dimension, value, count)
+        SELECT 'submissions', '', COUNT(*) FROM farmer_data
+        WHERE crop IS NOT NULL AND crop != '' GROUP BY 2
+        UNION ALL
+        SELECT 'farmer', CAST(farmer_id AS TEXT), COUNT(*) FROM farmer_data
+        WHERE crop IS NOT NULL AND crop != '' AND farmer_id IS NOT NULL GROUP BY 2
+        UNION ALL
+        SELECT 'soil_type', soil_type, COUNT(*) FROM farmer_data
+        WHERE soil_type IS NOT NULL AND soil_type != '' GROUP BY 2
+        UNION ALL
+        SELECT 'crop', crop, COUNT(*) FROM farmer_data
+        WHERE crop IS NOT NULL AND crop != '' GROUP BY 2
+        UNION ALL
+        SELECT 'water_level', water_level, COUNT(*) FROM farmer_data
+        WHERE water_level IS NOT NULL AND water_level != '' GROUP BY 2
+    """)
+
+
+def add_spatial_index(conn):
+    """Normalize coordinates to REAL/NULL and index them in an R*Tree (see geo.py)."""
+    conn.execute("""
+        UPDATE farmer_data SET latitude = NULL, longitude = NULL
+        WHERE (latitude IS NOT NULL OR longitude IS NOT NULL)
+          AND (typeof(latitude) NOT IN ('real', 'integer')
+               OR typeof(longitude) NOT IN ('real', 'integer')
+               OR abs(latitude) > 90 OR abs(longitude) > 180)
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS farmer_data_geo USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS farmer_data_geo_insert
+        AFTER INSERT ON farmer_data
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT INTO farmer_data_geo VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS farmer_data_geo_delete
+        AFTER DELETE ON farmer_data
+        BEGIN
+            DELETE FROM farmer_data_geo WHERE id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS farmer_data_geo_update
+        AFTER UPDATE OF latitude, longitude ON farmer_data
+        BEGIN
+            DELETE FROM farmer_data_geo WHERE id = OLD.id;
+            INSERT INTO farmer_data_geo
+            SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS districts (
+            name TEXT PRIMARY KEY COLLATE NOCASE,
+            south REAL NOT NULL,
+            west REAL NOT NULL,
+            north REAL NOT NULL,
+            east REAL NOT NULL
+        )
+    """)
+    conn.execute("DELETE FROM farmer_data_geo")
+    conn.execute("""
+        INSERT INTO farmer_data_geo
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM farmer_data
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+
+
+def add_table_versions(conn):
+    """Change counters that caches compare against to notice new writes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('farmer_data', 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS farmer_data_version_{event.lower()}
+            AFTER {event} ON farmer_data
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'farmer_data';
+            END
+        """)
+
+
+def install_trends(conn):
+    """Per-day counters behind the /reports trend charts, kept by triggers (see trends.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submission_trends (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_trend_insert
+        AFTER INSERT ON farmer_data
+        BEGIN
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'submissions', date(NEW.created_at), '', 1
+            WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'crop', date(NEW.created_at), NEW.crop, 1
+            WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'soil_type', date(NEW.created_at), NEW.soil_type, 1
+            WHERE NEW.soil_type IS NOT NULL AND NEW.soil_type != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'water_level', date(NEW.created_at), NEW.water_level, 1
+            WHERE NEW.water_level IS NOT NULL AND NEW.water_level != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_trend_delete
+        AFTER DELETE ON farmer_data
+        BEGIN
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'submissions' AND day = date(OLD.created_at) AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'crop' AND day = date(OLD.created_at) AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'soil_type' AND day = date(OLD.created_at) AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'water_level' AND day = date(OLD.created_at) AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_trends WHERE count <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_trend_update
+        AFTER UPDATE OF created_at, soil_type, water_level, crop ON farmer_data
+        BEGIN
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'submissions' AND day = date(OLD.created_at) AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'crop' AND day = date(OLD.created_at) AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'soil_type' AND day = date(OLD.created_at) AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'water_level' AND day = date(OLD.created_at) AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_trends WHERE count <= 0;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'submissions', date(NEW.created_at), '', 1
+            WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'crop', date(NEW.created_at), NEW.crop, 1
+            WHERE NEW.crop IS NOT NULL AND NEW.crop != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'soil_type', date(NEW.created_at), NEW.soil_type, 1
+            WHERE NEW.soil_type IS NOT NULL AND NEW.soil_type != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+            INSERT INTO submission_trends (dimension, day, value, count)
+            SELECT 'water_level', date(NEW.created_at), NEW.water_level, 1
+            WHERE NEW.water_level IS NOT NULL AND NEW.water_level != '' AND date(NEW.created_at) IS NOT NULL
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        INSERT INTO submission_trends (dimension, day, value, count)
+        SELECT 'submissions', date(created_at), '', COUNT(*) FROM farmer_data
+        WHERE crop IS NOT NULL AND crop != '' AND date(created_at) IS NOT NULL GROUP BY 2, 3
+        UNION ALL
+        SELECT 'crop', date(created_at), crop, COUNT(*) FROM farmer_data
+        WHERE crop IS NOT NULL AND crop != '' AND date(created_at) IS NOT NULL GROUP BY 2, 3
+        UNION ALL
+        SELECT 'soil_type', date(created_at), soil_type, COUNT(*) FROM farmer_data
+        WHERE soil_type IS NOT NULL AND soil_type != '' AND date(created_at) IS NOT NULL GROUP BY 2, 3
+        UNION ALL
+        SELECT 'water_level', date(created_at), water_level, COUNT(*) FROM farmer_data
+        WHERE water_level IS NOT NULL AND water_level != '' AND date(created_at) IS NOT NULL GROUP BY 2, 3
+    """)
+
+
+def add_archive_tiering(conn):
+    """Archive catalog, plus counters and guarded delete triggers that let archived rows keep counting.
+
+    The archiver deletes moved rows while ``archive_guard`` holds a row, and the
+    rollup and trend delete triggers skip those deletes (see archive.py).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archives (
+            season TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            starts TEXT NOT NULL,
+            ends TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archived_rollups (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archived_trends (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS archive_guard (active INTEGER NOT NULL)")
+    conn.execute("DROP TRIGGER IF EXISTS farmer_data_rollup_delete")
+    conn.execute("""
+        CREATE TRIGGER farmer_data_rollup_delete
+        AFTER DELETE ON farmer_data
+        WHEN NOT EXISTS (SELECT 1 FROM archive_guard)
+        BEGIN
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'submissions' AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'farmer' AND value = CAST(OLD.farmer_id AS TEXT)
+              AND OLD.crop IS NOT NULL AND OLD.crop != '' AND OLD.farmer_id IS NOT NULL;
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'soil_type' AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'crop' AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_rollups SET count = count - 1
+            WHERE dimension = 'water_level' AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_rollups WHERE count <= 0;
+        END
+    """)
+    conn.execute("DROP TRIGGER IF EXISTS farmer_data_trend_delete")
+    conn.execute("""
+        CREATE TRIGGER farmer_data_trend_delete
+        AFTER DELETE ON farmer_data
+        WHEN NOT EXISTS (SELECT 1 FROM archive_guard)
+        BEGIN
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'submissions' AND day = date(OLD.created_at) AND value = ''
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'crop' AND day = date(OLD.created_at) AND value = OLD.crop
+              AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'soil_type' AND day = date(OLD.created_at) AND value = OLD.soil_type
+              AND OLD.soil_type IS NOT NULL AND OLD.soil_type != '';
+            UPDATE submission_trends SET count = count - 1
+            WHERE dimension = 'water_level' AND day = date(OLD.created_at) AND value = OLD.water_level
+              AND OLD.water_level IS NOT NULL AND OLD.water_level != '';
+            DELETE FROM submission_trends WHERE count <= 0;
+        END
+    """)
+
+
+# How contact() packed the sender into farmer_data.name before step 10
+LEGACY_SENDER = re.compile(r'^(.*) \(([^()]*)\)$', re.S)
+
+
+def _legacy_sender(value):
+    """``'Ravi (ravi@example.com)'`` -> ``('Ravi', 'ravi@example.com')``; ``(None)`` means no email."""
+    match = LEGACY_SENDER.match(value or '')
+    if not match:
+        return value or None, None
+    email = match.group(2).strip()
+    return match.group(1).strip() or None, None if email in ('', 'None') else email
+
+
+def move_feedback_to_own_table(conn):
+    """Feedback gets its own FTS-indexed table; contact() used to write sparse farmer_data rows.
+
+    Feedback-only rows move over; rows that also carry a crop are real
+    submissions and stay.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            farmer_id INTEGER,
+            name TEXT,
+            email TEXT,
+            message TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback(created_at)")
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+            name, email, message,
+            content='feedback', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_insert AFTER INSERT ON feedback
+        BEGIN
+            INSERT INTO feedback_fts (rowid, name, email, message)
+            VALUES (NEW.id, NEW.name, NEW.email, NEW.message);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback
+        BEGIN
+            INSERT INTO feedback_fts (feedback_fts, rowid, name, email, message)
+            VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.message);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_update AFTER UPDATE OF name, email, message ON feedback
+        BEGIN
+            INSERT INTO feedback_fts (feedback_fts, rowid, name, email, message)
+            VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.message);
+            INSERT INTO feedback_fts (rowid, name, email, message)
+            VALUES (NEW.id, NEW.name, NEW.email, NEW.message);
+        END
+    """)
+    rows = conn.execute("""
+        SELECT id, name, feedback, created_at FROM farmer_data
+        WHERE feedback IS NOT NULL AND feedback != '' AND (crop IS NULL OR crop = '')
+        ORDER BY id
+    """).fetchall()
+    conn.executemany(
+        "INSERT INTO feedback (name, email, message, created_at) VALUES (?, ?, ?, ?)",
+        [(*_legacy_sender(row[1]), row[2], row[3]) for row in rows]
+    )
+    conn.executemany("DELETE FROM farmer_data WHERE id = ?", [(row[0],) for row in rows])
+
+
+def add_submission_search(conn):
+    """External-content FTS5 index over submission names, addresses and recommendations (see search.py)."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS submission_fts USING fts5(
+            name, farm_address, recommendation,
+            content='farmer_data', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS submission_fts_vocab USING fts5vocab(submission_fts, 'row')")
+    conn.execute("""
+        CREATE TRIGGER farmer_data_fts_insert AFTER INSERT ON farmer_data
+        BEGIN
+            INSERT INTO submission_fts (rowid, name, farm_address, recommendation)
+            VALUES (NEW.id, NEW.name, NEW.farm_address, NEW.recommendation);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_fts_delete AFTER DELETE ON farmer_data
+        BEGIN
+            INSERT INTO submission_fts (submission_fts, rowid, name, farm_address, recommendation)
+            VALUES ('delete', OLD.id, OLD.name, OLD.farm_address, OLD.recommendation);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_fts_update AFTER UPDATE OF id, name, farm_address, recommendation ON farmer_data
+        BEGIN
+            INSERT INTO submission_fts (submission_fts, rowid, name, farm_address, recommendation)
+            VALUES ('delete', OLD.id, OLD.name, OLD.farm_address, OLD.recommendation);
+            INSERT INTO submission_fts (rowid, name, farm_address, recommendation)
+            VALUES (NEW.id, NEW.name, NEW.farm_address, NEW.recommendation);
+        END
+    """)
+    conn.execute("INSERT INTO submission_fts (submission_fts) VALUES ('rebuild')")
+
+
+def add_recommendation_snapshots(conn):
+    """Existing rows get no snapshot; /suggestion computes theirs from the current knowledge base."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recommendation_snapshots (
+            digest TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+        ) WITHOUT ROWID
+    """)
+    _add_column(conn, 'farmer_data', 'snapshot', 'TEXT')
+
+
+def add_farmer_stats(conn):
+    """Per-farmer submission count and newest submission, kept by triggers (see registry.py).
+
+    A submission counts when it has a farmer and a crop. Archived rows count
+    through the archived ``farmer`` rollups, and the archiver's deletes are
+    skipped like the other counters' are.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS farmer_stats (
+            farmer_id INTEGER PRIMARY KEY,
+            submissions INTEGER NOT NULL DEFAULT 0,
+            latest_id INTEGER NOT NULL DEFAULT 0,
+            latest_at TEXT,
+            latest_crop TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_stats_submissions ON farmer_stats(submissions)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_farmer_stats_latest_id ON farmer_stats(latest_id)")
+    # A reused farmer id can already have submissions (orphans of a deleted farmer)
+    conn.execute("""
+        CREATE TRIGGER farmers_stats_insert AFTER INSERT ON farmers
+        BEGIN
+            INSERT OR IGNORE INTO farmer_stats (farmer_id, submissions, latest_id, latest_at, latest_crop)
+            SELECT NEW.id, COUNT(fd.id), COALESCE(MAX(fd.id), 0), fd.created_at, fd.crop
+            FROM farmer_data fd
+            WHERE fd.farmer_id = NEW.id AND fd.farmer_id IS NOT NULL AND fd.crop IS NOT NULL AND fd.crop != '';
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmers_stats_delete AFTER DELETE ON farmers
+        BEGIN
+            DELETE FROM farmer_stats WHERE farmer_id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_stats_insert AFTER INSERT ON farmer_data
+        BEGIN
+            UPDATE farmer_stats SET
+                submissions = submissions + 1,
+                latest_id = CASE WHEN latest_id < NEW.id THEN NEW.id ELSE latest_id END,
+                latest_at = CASE WHEN latest_id < NEW.id THEN NEW.created_at ELSE latest_at END,
+                latest_crop = CASE WHEN latest_id < NEW.id THEN NEW.crop ELSE latest_crop END
+            WHERE farmer_id = NEW.farmer_id AND NEW.farmer_id IS NOT NULL AND NEW.crop IS NOT NULL AND NEW.crop != '';
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_stats_delete AFTER DELETE ON farmer_data
+        WHEN NOT EXISTS (SELECT 1 FROM archive_guard)
+        BEGIN
+            UPDATE farmer_stats SET submissions = submissions - 1
+            WHERE farmer_id = OLD.farmer_id AND OLD.farmer_id IS NOT NULL AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE farmer_stats SET (latest_id, latest_at, latest_crop) = (
+                SELECT * FROM (
+                    SELECT fd.id, fd.created_at, fd.crop FROM farmer_data fd
+                    WHERE fd.farmer_id = OLD.farmer_id AND fd.farmer_id IS NOT NULL AND fd.crop IS NOT NULL AND fd.crop != ''
+                    ORDER BY fd.id DESC LIMIT 1
+                )
+                UNION ALL SELECT 0, NULL, NULL
+                LIMIT 1
+            )
+            WHERE farmer_id = OLD.farmer_id AND latest_id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER farmer_data_stats_update AFTER UPDATE OF farmer_id, crop, created_at ON farmer_data
+        BEGIN
+            UPDATE farmer_stats SET submissions = submissions - 1
+            WHERE farmer_id = OLD.farmer_id AND OLD.farmer_id IS NOT NULL AND OLD.crop IS NOT NULL AND OLD.crop != '';
+            UPDATE farmer_stats SET (latest_id, latest_at, latest_crop) = (
+                SELECT * FROM (
+                    SELECT fd.id, fd.created_at, fd.crop FROM farmer_data fd
+                    WHERE fd.farmer_id = OLD.farmer_id AND fd.farmer_id IS NOT NULL AND fd.crop IS NOT NULL AND fd.crop != ''
+                    ORDER BY fd.id DESC LIMIT 1
+                )
+                UNION ALL SELECT 0, NULL, NULL
+                LIMIT 1
+            )
+            WHERE farmer_id = OLD.farmer_id AND latest_id = OLD.id;
+            UPDATE farmer_stats SET
+                submissions = submissions + 1,
+                latest_id = CASE WHEN latest_id < NEW.id THEN NEW.id ELSE latest_id END,
+                latest_at = CASE WHEN latest_id < NEW.id THEN NEW.created_at ELSE latest_at END,
+                latest_crop = CASE WHEN latest_id < NEW.id THEN NEW.crop ELSE latest_crop END
+            WHERE farmer_id = NEW.farmer_id AND NEW.farmer_id IS NOT NULL AND NEW.crop IS NOT NULL AND NEW.crop != '';
+        END
+    """)
+    # With a single max(), SQLite takes the bare columns from the row holding the maximum
+    conn.execute("""
+        INSERT INTO farmer_stats (farmer_id, submissions, latest_id, latest_at, latest_crop)
+        SELECT f.id,
+               COUNT(fd.id) + COALESCE((SELECT a.count FROM archived_rollups a
+                                        WHERE a.dimension = 'farmer' AND a.value = CAST(f.id AS TEXT)), 0),
+               COALESCE(MAX(fd.id), 0), fd.created_at, fd.crop
+        FROM farmers f
+        LEFT JOIN farmer_data fd ON fd.farmer_id = f.id AND fd.farmer_id IS NOT NULL AND fd.crop IS NOT NULL AND fd.crop != ''
+        GROUP BY f.id
+    """)
+
+
+# (version, migration) pairs; append new steps, never edit or reorder old ones
+MIGRATIONS = [
+    (1, create_base_tables),
+    (2, reconcile_farmer_data_columns),
+    (3, add_farmer_foreign_key),
+    (4, add_lookup_indexes),
+    (5, install_rollups),
+    (6, add_spatial_index),
+    (7, add_table_versions),
+    (8, install_trends),
+    (9, add_archive_tiering),
+    (10, move_feedback_to_own_table),
+    (11, add_submission_search),
+    (12, add_recommendation_snapshots),
+    (13, add_farmer_stats),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply every pending migration up to ``target``; returns the versions applied."""
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version > target or version <= current_version(conn):
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have applied it while we waited for the lock
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def migrate_database(path, timeout=30.0):
+    """Open ``path``, apply pending migrations and close it again; returns the versions applied.
+
+    The connection is never pooled, so a pre-fork server that migrates in its
+    master process leaves no open SQLite handle for the workers to inherit.
+    A new file is switched to WAL here too, while no other process has it open.
+    """
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        return migrate(conn)
+    finally:
+        conn.close()
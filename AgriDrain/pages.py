@@ -0,0 +1,161 @@
+"""Pre-rendered guide pages served with validators and precompressed bodies.
+
+The home page and the crop/irrigation guides have no per-request content.
+The only exception is the navigation bar in base.html, which depends on
+whether a farmer or an admin is logged in. Each page is therefore rendered
+once per login state, on first hit, and kept in memory together with gzip
+(and, when the ``brotli`` package is installed, brotli) variants.
+
+Responses carry a strong ETag, Last-Modified and Cache-Control, and are
+answered with 304 Not Modified on revalidation. A cached page is dropped as
+soon as its template, or any template it extends or includes, changes on disk,
+or when ``flask build-assets`` writes a new asset manifest.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+
+from flask import current_app, render_template, request, session
+from jinja2 import meta
+
+import assets
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone is still a big win on 2G
+    brotli = None
+
+DEFAULT_CONFIG = {
+    'STATIC_PAGES_MAX_AGE': 300,
+}
+
+# How often (seconds) to stat the template files for changes
+RELOAD_CHECK_INTERVAL = 2.0
+# The nav bar in base.html is the only part of these pages that varies
+SESSION_FLAGS = ('admin_logged_in', 'farmer_logged_in')
+
+
+class RenderedPage:
+    """One rendered variant of a page with its precompressed encodings."""
+
+    def __init__(self, body, mtime):
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong ETags must differ per content-coding
+        self.etags = {encoding: digest if encoding == 'identity' else f"{digest}-{encoding}"
+                      for encoding in self.bodies}
+        self.last_modified = mtime
+
+    def negotiate(self, accept_encodings):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accept_encodings[encoding] > 0:
+                return encoding
+        return 'identity'
+
+
+class PageCache:
+    """Rendered pages keyed by (template, login state), invalidated by template mtimes."""
+
+    def __init__(self):
+        self._pages = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.hits = 0
+        self.renders = 0
+
+    def _template_files(self, env, name, seen=None):
+        """Paths of ``name`` and every template it extends/includes."""
+        seen = set() if seen is None else seen
+        if name in seen:
+            return []
+        seen.add(name)
+        source, filename, _ = env.loader.get_source(env, name)
+        files = [filename]
+        for child in meta.find_referenced_templates(env.parse(source)):
+            if child:
+                files.extend(self._template_files(env, child, seen))
+        return files
+
+    def _fingerprint(self, files):
+        return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0 for path in files)
+
+    def _check_sources(self):
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        with self._lock:
+            stale = []
+            for name, (files, fingerprint) in self._sources.items():
+                try:
+                    changed = self._fingerprint(files) != fingerprint
+                except OSError:
+                    changed = True
+                if changed:
+                    stale.append(name)
+            for name in stale:
+                del self._sources[name]
+                for key in [key for key in self._pages if key[0] == name]:
+                    del self._pages[key]
+
+    def get(self, name, variant):
+        self._check_sources()
+        key = (name, variant)
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+
+        app = current_app._get_current_object()
+        # Asset URLs in the page change with the build manifest
+        files = self._template_files(app.jinja_env, name) + [assets.manifest_path(app)]
+        fingerprint = self._fingerprint(files)
+        # Render against the login state only, never the visitor's whole session
+        body = render_template(name, session=dict(zip(SESSION_FLAGS, variant))).encode('utf-8')
+        page = RenderedPage(body, max(fingerprint) / 1e9)
+        with self._lock:
+            self.renders += 1
+            self._sources[name] = (files, fingerprint)
+            self._pages[key] = page
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._sources.clear()
+
+    def stats(self):
+        return {'pages': len(self._pages), 'hits': self.hits, 'renders': self.renders,
+                'encodings': ['br', 'gzip'] if brotli is not None else ['gzip']}
+
+
+page_cache = PageCache()
+
+
+def serve(name):
+    """Response for a static page, or 304 when the client's copy is still current."""
+    variant = tuple(bool(session.get(flag)) for flag in SESSION_FLAGS)
+    page = page_cache.get(name, variant)
+    encoding = page.negotiate(request.accept_encodings)
+
+    response = current_app.response_class(page.bodies[encoding], mimetype='text/html')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(page.etags[encoding])
+    response.headers['Last-Modified'] = formatdate(page.last_modified, usegmt=True)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['STATIC_PAGES_MAX_AGE']
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
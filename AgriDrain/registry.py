@@ -0,0 +1,195 @@
+"""Farmer registry: registered farmers with their submission stats, one page at a time.
+
+``farmer_stats`` holds one row per farmer: the number of submissions and the
+id, date and crop of the newest one. Triggers on farmers and farmer_data,
+created by migrations.py, keep it current as they do for the category counts
+in rollups.py, so /farmer_data reads one page of farmers and their stats
+through an index instead of grouping farmer_data on every request.
+Submissions are counted by the rollups' rule (rows with a crop), and rows
+moved to an archive keep counting: the archiver's deletes run under
+``archive_guard``, which the delete trigger skips.
+
+Pages use a keyset cursor on (sort value, farmer id), so the last page of a
+100k-farmer registry costs the same as the first.
+"""
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+# sort name -> (column, farmer id column of the same table); each pair is an index
+SORTS = {
+    'id': ('f.id', None),
+    'name': ('f.name', 'f.id'),
+    'submissions': ('s.submissions', 's.farmer_id'),
+    'latest': ('s.latest_id', 's.farmer_id'),
+}
+DEFAULT_SORT = 'id'
+
+COUNTED = "{row}.farmer_id IS NOT NULL AND {row}.crop IS NOT NULL AND {row}.crop != ''"
+
+
+def _raw_stats(conn):
+    """``{farmer_id: (submissions, latest_id, latest_at, latest_crop)}`` from the raw tables.
+
+    Archived submissions count through the rollups' archived ``farmer`` counts.
+    The archives are not opened here, so a stored latest submission newer than
+    any hot one is kept: it can only be a row that has since been archived.
+    """
+    archived = {
+        int(row[0]): row[1] for row in conn.execute(
+            "SELECT value, count FROM archived_rollups WHERE dimension = 'farmer'")
+    }
+    stored = {row[0]: tuple(row[1:]) for row in conn.execute(
+        "SELECT farmer_id, latest_id, latest_at, latest_crop FROM farmer_stats")}
+    stats = {}
+    # With a single max(), SQLite takes the bare columns from the row holding the maximum
+    rows = conn.execute(f"""
+        SELECT f.id, COUNT(fd.id), MAX(fd.id), fd.created_at, fd.crop
+        FROM farmers f
+        LEFT JOIN farmer_data fd ON fd.farmer_id = f.id AND {COUNTED.format(row='fd')}
+        GROUP BY f.id
+    """).fetchall()
+    for farmer_id, count, latest_id, latest_at, latest_crop in rows:
+        total = count + archived.get(farmer_id, 0)
+        kept = stored.get(farmer_id, (0, None, None))
+        if latest_id and latest_id >= kept[0]:
+            stats[farmer_id] = (total, latest_id, latest_at, latest_crop)
+        elif total:
+            stats[farmer_id] = (total, *kept)
+        else:
+            stats[farmer_id] = (0, 0, None, None)
+    return stats
+
+
+def count_archived(conn, table, where, params=(), sign=1):
+    """Like rollups.count_archived, for farmer_stats.
+
+    Taking rows back moves a farmer's latest submission, when it is one of
+    them, to their newest other hot or ``table`` row. Adding rows makes the
+    newest of them the latest where it is newer.
+    """
+    counted = f"({where}) AND {COUNTED.format(row='fd')}"
+    if sign < 0:
+        conn.execute(f"""
+            UPDATE farmer_stats SET (latest_id, latest_at, latest_crop) = (
+                SELECT * FROM (
+                    SELECT * FROM (
+                        SELECT fd.id, fd.created_at, fd.crop FROM main.farmer_data fd
+                        WHERE fd.farmer_id = farmer_stats.farmer_id AND {COUNTED.format(row='fd')}
+                        UNION ALL
+                        SELECT fd.id, fd.created_at, fd.crop FROM {table} fd
+                        WHERE fd.farmer_id = farmer_stats.farmer_id AND {COUNTED.format(row='fd')}
+                          AND NOT ({where})
+                    )
+                    ORDER BY 1 DESC LIMIT 1
+                )
+                UNION ALL SELECT 0, NULL, NULL
+                LIMIT 1
+            )
+            WHERE latest_id IN (SELECT fd.id FROM {table} fd WHERE {counted})
+        """, (*params, *params))
+    conn.execute(f"""
+        UPDATE farmer_stats SET submissions = submissions + {int(sign)} * changed.count
+        FROM (SELECT fd.farmer_id, COUNT(*) AS count FROM {table} fd WHERE {counted} GROUP BY 1) AS changed
+        WHERE farmer_stats.farmer_id = changed.farmer_id
+    """, params)
+    if sign > 0:
+        conn.execute(f"""
+            UPDATE farmer_stats SET (latest_id, latest_at, latest_crop) = (
+                SELECT fd.id, fd.created_at, fd.crop FROM {table} fd
+                WHERE fd.farmer_id = farmer_stats.farmer_id AND {counted}
+                ORDER BY fd.id DESC LIMIT 1
+            )
+            WHERE latest_id < (SELECT MAX(fd.id) FROM {table} fd
+                               WHERE fd.farmer_id = farmer_stats.farmer_id AND {counted})
+        """, (*params, *params))
+
+
+def rebuild(conn):
+    """Throw away the stats and recompute them from the raw tables."""
+    stats = _raw_stats(conn)
+    conn.execute("DELETE FROM farmer_stats")
+    conn.executemany(
+        "INSERT INTO farmer_stats (farmer_id, submissions, latest_id, latest_at, latest_crop) VALUES (?, ?, ?, ?, ?)",
+        [(farmer_id, *values) for farmer_id, values in stats.items()]
+    )
+
+
+def check(conn):
+    """Compare the stats with the raw tables.
+
+    Returns ``(farmer_id, stored, raw)`` for every mismatch, where stored and
+    raw are ``(submissions, latest_id, latest_at, latest_crop)`` or None; an
+    empty list means the stats are consistent.
+    """
+    raw = _raw_stats(conn)
+    stored = {row[0]: tuple(row[1:]) for row in conn.execute(
+        "SELECT farmer_id, submissions, latest_id, latest_at, latest_crop FROM farmer_stats")}
+    return [(farmer_id, stored.get(farmer_id), raw.get(farmer_id))
+            for farmer_id in sorted(set(raw) | set(stored))
+            if stored.get(farmer_id) != raw.get(farmer_id)]
+
+
+def _search_filter(q):
+    """Name or mobile number starting with ``q``, as index range scans."""
+    if not q:
+        return "1", []
+    upper = q + '\U0010ffff'
+    return "((f.name >= ? AND f.name < ?) OR (f.mobile >= ? AND f.mobile < ?))", [q, upper, q, upper]
+
+
+def fetch_page(conn, sort=DEFAULT_SORT, descending=False, before=None, after=None, per_page=PER_PAGE, q=''):
+    """One page of farmers with their stats, ordered by ``sort`` then farmer id.
+
+    ``after`` (a farmer id, the last row of the current page) continues in the
+    sort order and ``before`` (the first row) walks back, like the dashboard's
+    cursors. Returns ``{'rows', 'next_cursor', 'prev_cursor'}``.
+    """
+    column, tiebreak = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    where, params = _search_filter(q)
+    key = f"{column}, {tiebreak}" if tiebreak else column
+
+    cursor_id = after if after is not None else before
+    backwards = after is None and before is not None
+    if cursor_id is not None:
+        row = conn.execute(f"""
+            SELECT {key} FROM farmers f JOIN farmer_stats s ON s.farmer_id = f.id WHERE f.id = ?
+        """, (cursor_id,)).fetchone()
+        if row is not None:
+            # Past the cursor in the direction we are walking
+            forward_op = '<' if descending else '>'
+            op = {'<': '>', '>': '<'}[forward_op] if backwards else forward_op
+            where += f" AND ({key}) {op} ({', '.join('?' for _ in row)})"
+            params += list(row)
+        else:
+            cursor_id, backwards = None, False
+
+    ascending = descending == backwards
+    direction = "ASC" if ascending else "DESC"
+    order = ", ".join(f"{part} {direction}" for part in key.split(", "))
+    rows = conn.execute(f"""
+        SELECT f.id, f.name, f.mobile, f.password,
+               s.submissions, s.latest_id, s.latest_at, s.latest_crop
+        FROM farmers f
+        JOIN farmer_stats s ON s.farmer_id = f.id
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ?
+    """, params + [per_page + 1]).fetchall()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = cursor_id is not None, has_more
+    return {
+        'rows': rows,
+        'next_cursor': rows[-1]['id'] if rows and has_next else None,
+        'prev_cursor': rows[0]['id'] if rows and has_prev else None,
+    }
+
+
+def get_total(conn, q=''):
+    where, params = _search_filter(q)
+    return conn.execute(f"SELECT COUNT(*) FROM farmers f WHERE {where}", params).fetchone()[0]
@@ -0,0 +1,412 @@
+"""Reporting snapshot: a read-only copy of the database for the admin analytics.
+
+With ``REPORTING_SNAPSHOT`` on, /reports, the trend series, the dashboard's
+summary cards and the CSV/NDJSON exports read a copy of the database instead
+of the live file that /farmer and /contact write to. Their long scans then
+neither compete with the writers' pages in the live file's cache nor hold a
+read transaction there that keeps the WAL from being checkpointed.
+
+The copy is taken with SQLite's online backup API, in a single step. In WAL
+mode that is one read transaction on the live file, so writers carry on
+while it runs. The backup goes to ``<snapshot>.tmp``, which is stamped with
+its start time and then renamed over the snapshot. Readers open the snapshot
+with ``mode=ro&immutable=1``, so it is never locked or written. A connection
+keeps reading the file it opened until it is returned to the pool, and a
+refreshed file is picked up by the next acquire.
+
+One refresher thread per process checks every ``REPORTING_POLL_SECONDS``
+whether the snapshot is due: it is missing, its schema version differs from
+the live file's, it is ``REPORTING_REFRESH_SECONDS`` old, or
+``REPORTING_REFRESH_WRITES`` farmer_data writes (see ``table_versions``) have
+landed since it was taken.
+Worker processes share the file, and a lock file makes sure only one of them
+copies at a time. Until the first snapshot exists, the analytics read the
+live database. ``flask refresh-reporting-snapshot`` takes one on demand, e.g.
+from cron when both refresh settings are 0.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from flask import current_app, g
+
+import db
+import migrations
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+DEFAULT_CONFIG = {
+    'REPORTING_SNAPSHOT': os.environ.get('AGRIDRAIN_REPORTING_SNAPSHOT', '') == '1',
+    # Default: <database>.reporting.db next to the database file
+    'REPORTING_SNAPSHOT_PATH': None,
+    # Refresh a snapshot this old (0: never by age)
+    'REPORTING_REFRESH_SECONDS': 300,
+    # Refresh once this many farmer_data writes happened since the snapshot (0: never by writes)
+    'REPORTING_REFRESH_WRITES': 1000,
+    'REPORTING_POLL_SECONDS': 5,
+    'REPORTING_POOL_SIZE': 4,
+}
+
+META_TABLE = 'reporting_snapshot'
+
+
+def enabled(app=None):
+    return bool((app or current_app).config['REPORTING_SNAPSHOT'])
+
+
+def snapshot_path(app=None):
+    app = app or current_app
+    return app.config['REPORTING_SNAPSHOT_PATH'] or os.path.splitext(app.config['DATABASE'])[0] + '.reporting.db'
+
+
+def _written(conn):
+    """Total of the write counters in ``table_versions``."""
+    return conn.execute("SELECT COALESCE(SUM(version), 0) FROM table_versions").fetchone()[0]
+
+
+def _open_snapshot(path):
+    return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True,
+                           check_same_thread=False, factory=db.TrackedConnection)
+
+
+def _stamp(conn):
+    """``(taken_at, schema_version, written)`` of an open snapshot."""
+    taken_at = conn.execute(f"SELECT taken_at FROM {META_TABLE}").fetchone()[0]
+    return taken_at, migrations.current_version(conn), _written(conn)
+
+
+def read_stamp(path):
+    """The stamp of the snapshot at ``path``, or None if there is no usable one."""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = _open_snapshot(path)
+    except sqlite3.Error:
+        return None
+    try:
+        return _stamp(conn)
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def take_snapshot(source, target, busy_timeout_ms=5000):
+    """Copy ``source`` to ``target`` with the backup API; returns the new snapshot's stamp.
+
+    ``target`` is replaced in one rename, so readers see the old snapshot or
+    the new one, never a partial copy.
+    """
+    tmp = target + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    src = sqlite3.connect(source, timeout=busy_timeout_ms / 1000.0)
+    dst = sqlite3.connect(tmp)
+    try:
+        taken_at = time.time()
+        # All pages in one step: a multi-step backup restarts whenever a writer commits in between
+        src.backup(dst)
+        # The copy inherits WAL mode; an immutable reader needs a plain rollback-journal file
+        dst.execute("PRAGMA journal_mode=DELETE")
+        dst.execute("PRAGMA synchronous=OFF")
+        dst.execute(f"CREATE TABLE {META_TABLE} (taken_at REAL NOT NULL)")
+        dst.execute(f"INSERT INTO {META_TABLE} (taken_at) VALUES (?)", (taken_at,))
+        dst.commit()
+        stamp = _stamp(dst)
+    except BaseException:
+        dst.close()
+        os.remove(tmp)
+        raise
+    finally:
+        src.close()
+    dst.close()
+    os.replace(tmp, target)
+    return stamp
+
+
+@contextmanager
+def _refresh_lock(target):
+    """Yields True if this process may refresh ``target`` now, False if another one is at it."""
+    if fcntl is None:
+        yield True
+        return
+    with open(target + '.lock', 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SnapshotRefresher:
+    """Background thread that re-takes the snapshot when it is due."""
+
+    def __init__(self, source, target, refresh_seconds=300, refresh_writes=1000, poll_seconds=5,
+                 busy_timeout_ms=5000):
+        self.source = source
+        self.target = target
+        self.refresh_seconds = refresh_seconds
+        self.refresh_writes = refresh_writes
+        self.poll_seconds = poll_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pid = os.getpid()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'refreshes': 0,
+            'failures': 0,
+            'last_reason': None,
+            'last_seconds': None,
+            'last_error': None,
+        }
+        self._thread = threading.Thread(target=self._run, name='agridrain-reporting-snapshot', daemon=True)
+        self._thread.start()
+
+    def due(self, stamp):
+        """Why the snapshot with ``stamp`` should be re-taken, or None if it is fresh enough."""
+        if stamp is None:
+            return 'missing'
+        taken_at, schema_version, written = stamp
+        conn = sqlite3.connect(self.source, timeout=self.busy_timeout_ms / 1000.0)
+        try:
+            if schema_version != migrations.current_version(conn):
+                return 'schema'
+            if self.refresh_seconds and time.time() - taken_at >= self.refresh_seconds:
+                return 'age'
+            if self.refresh_writes and _written(conn) - written >= self.refresh_writes:
+                return 'writes'
+        finally:
+            conn.close()
+        return None
+
+    def refresh_if_due(self):
+        """Re-take the snapshot if it is due and no other process is doing it; returns the reason."""
+        with _refresh_lock(self.target) as mine:
+            if not mine:
+                return None
+            # Read under the lock: another process may have just refreshed it
+            reason = self.due(read_stamp(self.target))
+            if reason is None:
+                return None
+            start = time.perf_counter()
+            take_snapshot(self.source, self.target, self.busy_timeout_ms)
+            with self._lock:
+                self._stats['refreshes'] += 1
+                self._stats['last_reason'] = reason
+                self._stats['last_seconds'] = round(time.perf_counter() - start, 3)
+            return reason
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Check straight away, so a fresh deployment gets its first snapshot without waiting
+        while True:
+            try:
+                self.refresh_if_due()
+            except (sqlite3.Error, OSError) as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                    self._stats['last_error'] = str(e)
+            if self._stop.wait(self.poll_seconds):
+                return
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class SnapshotPool:
+    """Read-only connections to the current snapshot, with the live pool as fallback.
+
+    Has the ``acquire``/``release`` interface of ``db.ConnectionPool``, so the
+    exports can stream from it. ``acquire`` hands out a live connection while
+    there is no usable snapshot.
+    """
+
+    def __init__(self, app, path, size=4):
+        self.app = app
+        self.path = path
+        self.size = size
+        self.database = app.config['DATABASE']
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _identity(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def connect(self, identity):
+        conn = _open_snapshot(self.path)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA cache_size=-{int(self.app.config['DB_CACHE_SIZE_KB'])}")
+            conn.execute(f"PRAGMA mmap_size={int(self.app.config['DB_MMAP_SIZE'])}")
+            taken_at, schema_version, _ = _stamp(conn)
+        except sqlite3.Error:
+            conn.close()
+            return None
+        if schema_version != migrations.LATEST_VERSION:
+            conn.close()
+            return None
+        conn.identity = identity
+        conn.snapshot_taken_at = taken_at
+        return conn
+
+    def acquire_snapshot(self):
+        """A connection to the newest snapshot, or None if there is no usable one."""
+        identity = self._identity()
+        if identity is None:
+            return None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect(identity)
+            if conn.identity == identity:
+                return conn
+            # Opened on a snapshot that has since been replaced
+            conn.close()
+
+    def acquire(self):
+        return self.acquire_snapshot() or db.get_pool(self.app).acquire()
+
+    def release(self, conn):
+        if taken_at(conn) is None:
+            db.get_pool(self.app).release(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _create_refresher(app):
+    return SnapshotRefresher(
+        app.config['DATABASE'], snapshot_path(app),
+        refresh_seconds=app.config['REPORTING_REFRESH_SECONDS'],
+        refresh_writes=app.config['REPORTING_REFRESH_WRITES'],
+        poll_seconds=app.config['REPORTING_POLL_SECONDS'],
+        busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+    )
+
+
+def get_refresher(app=None):
+    """Return the app's refresher, starting a new thread after a fork; None when refreshes are manual."""
+    app = app or current_app
+    if not (app.config['REPORTING_REFRESH_SECONDS'] or app.config['REPORTING_REFRESH_WRITES']):
+        return None
+    refresher = app.extensions.get('agridrain_reporting_refresher')
+    if refresher is None or refresher.pid != os.getpid() or refresher.source != app.config['DATABASE']:
+        if refresher is not None and refresher.pid == os.getpid():
+            refresher.stop()
+        refresher = app.extensions['agridrain_reporting_refresher'] = _create_refresher(app)
+    return refresher
+
+
+def get_pool(app=None):
+    """Pool for the analytics reads: the snapshot pool when enabled, else the live pool."""
+    app = app or current_app
+    if not enabled(app):
+        return db.get_pool(app)
+    pool = app.extensions.get('agridrain_reporting')
+    if pool is None or pool.pid != os.getpid() or pool.database != app.config['DATABASE']:
+        if pool is not None and pool.pid == os.getpid():
+            pool.close_all()
+        pool = app.extensions['agridrain_reporting'] = SnapshotPool(
+            app, snapshot_path(app), app.config['REPORTING_POOL_SIZE'])
+    return pool
+
+
+def get_report_db():
+    """Connection for the current request's analytics: the snapshot if there is one, else ``get_db()``."""
+    if not enabled():
+        return db.get_db()
+    if 'report_db' not in g:
+        g.report_db = get_pool().acquire_snapshot()
+        if g.report_db is not None:
+            g.report_db.observer = current_app.extensions.get('agridrain_sql_observer')
+    return g.report_db if g.report_db is not None else db.get_db()
+
+
+def close_report_db(exception=None):
+    conn = g.pop('report_db', None)
+    if conn is not None:
+        conn.observer = None
+        get_pool().release(conn)
+
+
+def taken_at(conn):
+    """Unix time the snapshot behind ``conn`` was taken, or None for a live connection."""
+    return getattr(conn, 'snapshot_taken_at', None)
+
+
+def snapshot_info(conn):
+    """``{'taken_at': datetime, 'age_seconds': int}`` for a snapshot connection, None for live data."""
+    when = taken_at(conn)
+    if when is None:
+        return None
+    return {'taken_at': datetime.fromtimestamp(when), 'age_seconds': max(0, int(time.time() - when))}
+
+
+def stats(app=None):
+    """Snapshot age and refresher counters for /db_stats."""
+    app = app or current_app
+    stamp = read_stamp(snapshot_path(app))
+    result = {
+        'path': snapshot_path(app),
+        'age_seconds': round(time.time() - stamp[0], 1) if stamp else None,
+    }
+    refresher = get_refresher(app)
+    if refresher is not None:
+        result.update(refresher.stats())
+    return result
+
+
+def refresh(app=None):
+    """Take a snapshot now; returns its stamp, or None if another process is taking one."""
+    app = app or current_app
+    target = snapshot_path(app)
+    with _refresh_lock(target) as mine:
+        if not mine:
+            return None
+        return take_snapshot(app.config['DATABASE'], target, app.config['DB_BUSY_TIMEOUT_MS'])
+
+
+def _start_refresher():
+    get_refresher()
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if not app.config['REPORTING_SNAPSHOT']:
+        return
+    # Started by the first request of each process, not at import: a pre-fork
+    # server's master would otherwise own the thread and its workers none
+    app.before_request(_start_refresher)
+    app.teardown_appcontext(close_report_db)
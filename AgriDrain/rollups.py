@@ -0,0 +1,132 @@
+"""Summary counters for farmer_data, kept up to date by SQLite triggers.
+
+Every insert, update and delete on farmer_data adjusts the matching rows in
+``submission_rollups`` so the dashboard cards and /reports read a handful of
+category counts instead of scanning the whole table. The table and its
+triggers are created by migrations.py; this module reads, rebuilds and checks
+them.
+
+Rows moved to an archive database (see archive.py) still count: the archiver
+deletes them while a row sits in ``archive_guard``, which the delete trigger
+skips, and adds their counts to ``archived_rollups``. Rebuilds and checks use
+farmer_data plus those archived counts as the source of truth.
+"""
+
+# dimension -> (value expression, condition); ``{row}`` is NEW, OLD or the table alias
+DIMENSIONS = {
+    'submissions': ("''", "{row}.crop IS NOT NULL AND {row}.crop != ''"),
+    'farmer': ("CAST({row}.farmer_id AS TEXT)", "{row}.crop IS NOT NULL AND {row}.crop != '' AND {row}.farmer_id IS NOT NULL"),
+    'soil_type': ("{row}.soil_type", "{row}.soil_type IS NOT NULL AND {row}.soil_type != ''"),
+    'crop': ("{row}.crop", "{row}.crop IS NOT NULL AND {row}.crop != ''"),
+    'water_level': ("{row}.water_level", "{row}.water_level IS NOT NULL AND {row}.water_level != ''"),
+}
+
+
+def _raw_counts(conn):
+    """Recompute every rollup straight from farmer_data plus the archived counts."""
+    counts = {
+        (row[0], row[1]): row[2]
+        for row in conn.execute("SELECT dimension, value, count FROM archived_rollups")
+    }
+    for dimension, (value, condition) in DIMENSIONS.items():
+        rows = conn.execute(f"""
+            SELECT {value.format(row='fd')} AS value, COUNT(*) AS count
+            FROM farmer_data fd
+            WHERE {condition.format(row='fd')}
+            GROUP BY 1
+        """)
+        for row in rows:
+            counts[(dimension, row[0])] = counts.get((dimension, row[0]), 0) + row[1]
+    return counts
+
+
+def add_archived(conn, where, params=()):
+    """Move the counts of the farmer_data rows matching ``where`` (alias ``fd``) to archived_rollups.
+
+    Call it in the archiver's transaction, before those rows are deleted.
+    """
+    for dimension, (value, condition) in DIMENSIONS.items():
+        conn.execute(f"""
+            INSERT INTO archived_rollups (dimension, value, count)
+            SELECT '{dimension}', {value.format(row='fd')}, COUNT(*)
+            FROM farmer_data fd
+            WHERE ({where}) AND {condition.format(row='fd')}
+            GROUP BY 2
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count
+        """, params)
+
+
+def count_archived(conn, table, where, params=(), sign=1):
+    """Add (``sign=1``) or take back (``sign=-1``) the rows of an archive ``table`` matching ``where``.
+
+    Archived rows count in both submission_rollups and archived_rollups, so
+    deleting one, or handing it to another farmer, changes both.
+    """
+    for target in ('submission_rollups', 'archived_rollups'):
+        for dimension, (value, condition) in DIMENSIONS.items():
+            conn.execute(f"""
+                INSERT INTO {target} (dimension, value, count)
+                SELECT '{dimension}', {value.format(row='fd')}, {int(sign)} * COUNT(*)
+                FROM {table} fd
+                WHERE ({where}) AND {condition.format(row='fd')}
+                GROUP BY 2
+                ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count
+            """, params)
+        conn.execute(f"DELETE FROM {target} WHERE count <= 0")
+
+
+def rebuild(conn):
+    """Throw away the rollups and recompute them from the raw table."""
+    conn.execute("DELETE FROM submission_rollups")
+    conn.executemany(
+        "INSERT INTO submission_rollups (dimension, value, count) VALUES (?, ?, ?)",
+        [(dimension, value, count) for (dimension, value), count in _raw_counts(conn).items()]
+    )
+
+
+def check(conn):
+    """Compare the rollups with the raw table.
+
+    Returns a list of ``(dimension, value, rollup_count, raw_count)`` tuples
+    for every mismatch; an empty list means the rollups are consistent.
+    """
+    raw = _raw_counts(conn)
+    stored = {
+        (row[0], row[1]): row[2]
+        for row in conn.execute("SELECT dimension, value, count FROM submission_rollups")
+    }
+    mismatches = []
+    for key in sorted(set(raw) | set(stored)):
+        if raw.get(key, 0) != stored.get(key, 0):
+            mismatches.append((key[0], key[1], stored.get(key, 0), raw.get(key, 0)))
+    return mismatches
+
+
+def get_counts(conn, dimension):
+    """Category counts for one dimension, most common first."""
+    return conn.execute("""
+        SELECT value, count FROM submission_rollups
+        WHERE dimension = ?
+        ORDER BY count DESC, value
+    """, (dimension,)).fetchall()
+
+
+def get_total(conn, dimension='submissions'):
+    row = conn.execute(
+        "SELECT COALESCE(SUM(count), 0) FROM submission_rollups WHERE dimension = ?",
+        (dimension,)
+    ).fetchone()
+    return row[0]
+
+
+def get_summary(conn):
+    """Dashboard summary cards read from the rollups."""
+    unique_farmers = conn.execute(
+        "SELECT COUNT(*) FROM submission_rollups WHERE dimension = 'farmer'"
+    ).fetchone()[0]
+    soils = get_counts(conn, 'soil_type')
+    return {
+        'total_submissions': get_total(conn),
+        'unique_farmers': unique_farmers,
+        'most_common_soil': soils[0][0] if soils else None,
+    }
@@ -0,0 +1,409 @@
+"""Vectorized irrigation scheduling: day-by-day irrigation plans from the crop knowledge base.
+
+A plan is a daily root-zone water balance in the style of FAO-56, driven by
+the knowledge base's ``irrigation_profiles``:
+
+* crops: growth stage lengths in days (initial, development, mid-season,
+  late), crop coefficients Kc (initial, mid, end), rooting depth and the
+  fraction of available water that may be used before irrigating; ``ponded``
+  crops (rice) also lose the soil's percolation every day;
+* soils: plant-available water per metre of root zone and percolation;
+* water levels: capillary rise from the water table, and the irrigation
+  method suggested for that level with its application efficiency;
+* climate: monthly reference evapotranspiration (ET0) and rainfall of an
+  average year, of which the effective part is used.
+
+From the sowing day, with the root zone at field capacity, each day's crop
+water use (Kc x ET0) minus effective rain and capillary rise deepens the
+depletion. When it reaches the allowed fraction, the plan irrigates the root
+zone back to field capacity. Net depths are what the root zone needs; gross
+depths divide by the method's efficiency.
+
+Plans depend only on (crop, soil, water level, sowing week), and are
+computed for the first day of the sowing week. The engine keeps them in an
+LRU keyed that way. A batch encodes its farms into integer keys and
+simulates every key not yet cached in one NumPy pass: the days run in a
+loop, and the keys are vectors. The plans are then mapped back to the farms.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from itertools import repeat
+
+import numpy as np
+
+import knowledge
+
+STAGES = ('initial', 'development', 'mid-season', 'late')
+# Sowing weeks 0-52 of the year; week 52 is the last day or two of December
+WEEKS = 53
+DAYS_IN_YEAR = 365
+MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Room for every key of the shipped knowledge base (20 crops x 5 soils x 4 levels x 53 weeks)
+CACHE_SIZE = 32768
+# Keys simulated together; bounds the (keys x days) work arrays to a few MB
+CHUNK_SIZE = 2048
+
+
+def effective_rainfall(monthly_mm):
+    """USDA-SCS effective part of monthly rainfall (mm)."""
+    p = np.asarray(monthly_mm, dtype=np.float32)
+    return np.where(p <= 250, p * (125 - 0.2 * p) / 125, 125 + 0.1 * p)
+
+
+def daily_climate(et0_monthly, rainfall_monthly):
+    """Per-day ET0 and effective rain (mm/day) for days 0-364 of an average year.
+
+    ET0 is interpolated between mid-month values; effective rain is spread
+    evenly over each month.
+    """
+    starts = np.cumsum((0,) + MONTH_DAYS[:-1])
+    mids = starts + np.asarray(MONTH_DAYS) / 2.0
+    et0 = np.asarray(et0_monthly, dtype=np.float32)
+    # Wrap December and January around the year end
+    x = np.concatenate(([mids[-1] - DAYS_IN_YEAR], mids, [mids[0] + DAYS_IN_YEAR]))
+    y = np.concatenate(([et0[-1]], et0, [et0[0]]))
+    days = np.arange(DAYS_IN_YEAR)
+    rain = np.repeat(effective_rainfall(rainfall_monthly) / np.asarray(MONTH_DAYS), MONTH_DAYS)
+    return np.interp(days, x, y).astype(np.float32), rain.astype(np.float32)
+
+
+def sowing_week(day):
+    return min((day.timetuple().tm_yday - 1) // 7, WEEKS - 1)
+
+
+def week_start(year, week):
+    return date(year, 1, 1) + timedelta(days=7 * week)
+
+
+class Plan:
+    """Irrigation plan for one (crop, soil, water level, sowing week) key.
+
+    ``days`` are irrigation days counted from sowing (day 0), with the net
+    depth for each in ``net_mm``.
+    """
+    __slots__ = ('crop', 'soil_type', 'water_level', 'sowing_week', 'stage_ends', 'method', 'efficiency',
+                 'days', 'net_mm', 'water_use_mm', 'rain_mm', 'capillary_mm')
+
+    def __init__(self, crop, soil_type, water_level, week, stage_ends, method, efficiency,
+                 days, net_mm, water_use_mm, rain_mm, capillary_mm):
+        self.crop = crop
+        self.soil_type = soil_type
+        self.water_level = water_level
+        self.sowing_week = week
+        self.stage_ends = stage_ends
+        self.method = method
+        self.efficiency = efficiency
+        self.days = days
+        self.net_mm = net_mm
+        self.water_use_mm = water_use_mm
+        self.rain_mm = rain_mm
+        self.capillary_mm = capillary_mm
+
+    @property
+    def season_days(self):
+        return int(self.stage_ends[-1])
+
+    @property
+    def irrigations(self):
+        return len(self.days)
+
+    @property
+    def gross_mm(self):
+        return self.net_mm / self.efficiency
+
+    def stage(self, day):
+        return STAGES[min(int(np.searchsorted(self.stage_ends, day, side='right')), len(STAGES) - 1)]
+
+    def summary(self):
+        return {
+            'season_days': self.season_days,
+            'irrigations': self.irrigations,
+            'water_use_mm': round(self.water_use_mm, 1),
+            'effective_rain_mm': round(self.rain_mm, 1),
+            'capillary_rise_mm': round(self.capillary_mm, 1),
+            'net_irrigation_mm': round(float(self.net_mm.sum()), 1),
+            'gross_irrigation_mm': round(float(self.gross_mm.sum()), 1),
+        }
+
+    def stages(self, sowing):
+        starts = (0,) + tuple(int(end) for end in self.stage_ends[:-1])
+        return [
+            {'stage': name, 'start': (sowing + timedelta(days=start)).isoformat(),
+             'end': (sowing + timedelta(days=int(end) - 1)).isoformat(), 'days': int(end) - start}
+            for name, start, end in zip(STAGES, starts, self.stage_ends)
+        ]
+
+    def events(self, sowing):
+        """The irrigations as dated rows for a crop sown on ``sowing``."""
+        return [
+            {'day': day + 1, 'date': (sowing + timedelta(days=day)).isoformat(), 'stage': self.stage(day),
+             'net_mm': round(net, 1), 'gross_mm': round(gross, 1)}
+            for day, net, gross in zip(self.days.tolist(), self.net_mm.tolist(), self.gross_mm.tolist())
+        ]
+
+
+class ScheduleEngine:
+    def __init__(self, kb, cache_size=CACHE_SIZE):
+        self.kb = kb
+        profiles = kb.irrigation_profiles
+        crop_profiles = profiles.get('crops', {})
+        soil_profiles = profiles.get('soils', {})
+        water_profiles = profiles.get('water_levels', {})
+
+        # Only categories with a profile can be scheduled
+        self.crops = tuple(crop for crop in kb.crops if crop in crop_profiles)
+        self.soils = tuple(soil for soil in kb.soil_types if soil in soil_profiles)
+        self.water_levels = tuple(water for water in kb.water_levels if water in water_profiles)
+        self.crop_index = {crop: i for i, crop in enumerate(self.crops)}
+        self.soil_index = {soil: i for i, soil in enumerate(self.soils)}
+        self.water_index = {water: i for i, water in enumerate(self.water_levels)}
+        self.sowing_weeks = dict(profiles.get('sowing_week', {}))
+
+        crops = [crop_profiles[crop] for crop in self.crops]
+        self.stage_ends = np.cumsum([c['stage_days'] for c in crops], axis=1).astype(np.int32).reshape(-1, len(STAGES))
+        self.kc = np.asarray([c['kc'] for c in crops], dtype=np.float32).reshape(-1, 3)
+        self.root_depth = np.asarray([c['root_depth_m'] for c in crops], dtype=np.float32)
+        self.depletion_fraction = np.asarray([c['depletion_fraction'] for c in crops], dtype=np.float32)
+        self.ponded = np.asarray([bool(c.get('ponded')) for c in crops], dtype=np.float32)
+
+        soils = [soil_profiles[soil] for soil in self.soils]
+        self.available_water = np.asarray([s['available_water_mm_per_m'] for s in soils], dtype=np.float32)
+        self.percolation = np.asarray([s['percolation_mm_day'] for s in soils], dtype=np.float32)
+
+        waters = [water_profiles[water] for water in self.water_levels]
+        self.capillary = np.asarray([w['capillary_rise_mm_day'] for w in waters], dtype=np.float32)
+        self.efficiency = np.asarray([w['application_efficiency'] for w in waters], dtype=np.float32)
+        self.methods = tuple(w['method'] for w in waters)
+
+        climate = profiles.get('climate', {})
+        self.et0, self.rain = daily_climate(climate.get('et0_mm_day', [0.0] * 12),
+                                            climate.get('rainfall_mm', [0.0] * 12))
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    # --- input encoding ---
+    @staticmethod
+    def _encode(index, values):
+        return np.fromiter(map(index.get, values, repeat(-1)), dtype=np.int64)
+
+    def encode(self, crops, soils, water_levels, weeks):
+        """Integer plan keys for farms; -1 where a category has no profile."""
+        crop_idx = self._encode(self.crop_index, crops)
+        soil_idx = self._encode(self.soil_index, soils)
+        water_idx = self._encode(self.water_index, water_levels)
+        weeks = np.clip(np.asarray(weeks, dtype=np.int64), 0, WEEKS - 1)
+        keys = ((crop_idx * len(self.soils) + soil_idx) * len(self.water_levels) + water_idx) * WEEKS + weeks
+        return np.where((crop_idx >= 0) & (soil_idx >= 0) & (water_idx >= 0), keys, -1)
+
+    def decode(self, keys):
+        keys, week = np.divmod(keys, WEEKS)
+        keys, water_idx = np.divmod(keys, len(self.water_levels))
+        crop_idx, soil_idx = np.divmod(keys, len(self.soils))
+        return crop_idx, soil_idx, water_idx, week
+
+    # --- simulation ---
+    def simulate(self, keys, record=False):
+        """Run the water balance for ``keys``; returns ``(irrigation, totals, series)``.
+
+        ``irrigation`` is a ``(keys, days)`` matrix of net depths; ``totals``
+        are per-key crop water use, effective rain and capillary rise. With
+        ``record``, ``series`` holds the daily ET, rain and depletion matrices.
+        """
+        crop_idx, soil_idx, water_idx, week = self.decode(np.asarray(keys, dtype=np.int64))
+        ends = self.stage_ends[crop_idx]
+        n_days = int(ends[:, -1].max())
+        t = np.arange(n_days, dtype=np.float32)[None, :]
+        l1, l2, l3, l4 = (ends[:, i:i + 1].astype(np.float32) for i in range(len(STAGES)))
+        kc_ini, kc_mid, kc_end = (self.kc[crop_idx, i:i + 1] for i in range(3))
+        kc = np.select(
+            [t < l1, t < l2, t < l3, t < l4],
+            [kc_ini,
+             kc_ini + (kc_mid - kc_ini) * (t - l1) / np.maximum(l2 - l1, 1),
+             kc_mid,
+             kc_mid + (kc_end - kc_mid) * (t - l3) / np.maximum(l4 - l3, 1)],
+            0.0,
+        ).astype(np.float32)
+        growing = (t < l4).astype(np.float32)
+        day_of_year = (week[:, None] * 7 + np.arange(n_days)[None, :]) % DAYS_IN_YEAR
+        et = kc * self.et0[day_of_year]
+        rain = self.rain[day_of_year] * growing
+        capillary = self.capillary[water_idx][:, None] * growing
+        losses = et + (self.percolation[soil_idx] * self.ponded[crop_idx])[:, None] * growing
+        change = losses - rain - capillary
+
+        total = self.available_water[soil_idx] * self.root_depth[crop_idx]
+        allowed = self.depletion_fraction[crop_idx] * total
+        depletion = np.zeros(len(crop_idx), dtype=np.float32)
+        irrigation = np.zeros_like(change)
+        recorded = np.zeros_like(change) if record else None
+        for day in range(n_days):
+            # Water above field capacity drains away; the root zone cannot dry past empty
+            depletion = np.clip(depletion + change[:, day], 0.0, total)
+            due = depletion >= allowed
+            irrigation[:, day] = np.where(due, depletion, 0.0)
+            depletion[due] = 0.0
+            if record:
+                recorded[:, day] = depletion
+        totals = {'water_use_mm': et.sum(axis=1), 'rain_mm': rain.sum(axis=1), 'capillary_mm': capillary.sum(axis=1)}
+        series = {'et_mm': et, 'rain_mm': rain, 'depletion_mm': recorded} if record else None
+        return irrigation, totals, series
+
+    def _build(self, keys):
+        """Plans for ``keys`` (all valid), simulated in chunks."""
+        plans = []
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            irrigation, totals, _ = self.simulate(chunk)
+            rows, days = np.nonzero(irrigation)
+            bounds = np.searchsorted(rows, np.arange(len(chunk) + 1))
+            crop_idx, soil_idx, water_idx, week = self.decode(chunk)
+            for i in range(len(chunk)):
+                lo, hi = bounds[i], bounds[i + 1]
+                c, s, w = int(crop_idx[i]), int(soil_idx[i]), int(water_idx[i])
+                plans.append(Plan(
+                    self.crops[c], self.soils[s], self.water_levels[w], int(week[i]),
+                    self.stage_ends[c], self.methods[w], float(self.efficiency[w]),
+                    days[lo:hi].astype(np.int16), irrigation[i, days[lo:hi]],
+                    float(totals['water_use_mm'][i]), float(totals['rain_mm'][i]),
+                    float(totals['capillary_mm'][i]),
+                ))
+        return plans
+
+    def lookup(self, keys):
+        """``(plans, inverse)``: one plan (or None) per distinct key, and each farm's index into it.
+
+        Keys already in the LRU are reused; all the others are simulated in
+        one batch.
+        """
+        unique, inverse = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+        plans = [None] * len(unique)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(unique.tolist()):
+                if key < 0:
+                    continue
+                plan = self._cache.get(key)
+                if plan is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    plans[i] = plan
+            self._stats['hits'] += len(unique) - len(missing)
+            self._stats['misses'] += len(missing)
+        if missing:
+            built = self._build(unique[missing])
+            with self._lock:
+                for i, plan in zip(missing, built):
+                    plans[i] = plan
+                    self._cache[int(unique[i])] = plan
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return plans, inverse.reshape(-1)
+
+    def plans(self, crops, soils, water_levels, weeks):
+        """One plan (or None for unknown categories) per farm."""
+        plans, inverse = self.lookup(self.encode(crops, soils, water_levels, weeks))
+        return [plans[i] for i in inverse.tolist()]
+
+    def plan(self, crop, soil_type, water_level, week):
+        return self.plans([crop], [soil_type], [water_level], [week])[0]
+
+    def daily(self, plan, sowing):
+        """Day-by-day water balance rows for ``plan`` sown on ``sowing``."""
+        key = self.encode([plan.crop], [plan.soil_type], [plan.water_level], [plan.sowing_week])
+        irrigation, _, series = self.simulate(key, record=True)
+        days = plan.season_days
+        return [
+            {'day': day + 1, 'date': (sowing + timedelta(days=day)).isoformat(),
+             'et_mm': round(et, 2), 'rain_mm': round(rain, 2), 'depletion_mm': round(depletion, 1),
+             'irrigation_mm': round(net, 1)}
+            for day, et, rain, depletion, net in zip(
+                range(days), series['et_mm'][0, :days].tolist(), series['rain_mm'][0, :days].tolist(),
+                series['depletion_mm'][0, :days].tolist(), irrigation[0, :days].tolist())
+        ]
+
+    def cache_info(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._cache), capacity=self.cache_size)
+
+    def default_sowing(self, season, today=None):
+        """Start of the season's usual sowing week nearest to ``today``."""
+        today = today or date.today()
+        week = self.sowing_weeks.get(season, sowing_week(today))
+        return min((week_start(year, week) for year in (today.year - 1, today.year, today.year + 1)),
+                   key=lambda day: abs((day - today).days))
+
+
+_engine = None
+
+
+def get_engine():
+    """Scheduling engine for the current knowledge base, rebuilt (with an empty cache) after a reload."""
+    global _engine
+    kb = knowledge.get_knowledge_base()
+    engine = _engine
+    if engine is None or engine.kb is not kb:
+        engine = _engine = ScheduleEngine(kb)
+    return engine
+
+
+def in_season(kb, crop, season):
+    grown_in = kb.crop_seasons.get(kb.key(crop))
+    return not grown_in or season in grown_in
+
+
+def schedule_submissions(conn, where='1', params=(), today=None, limit=-1, batch_size=10000):
+    """Plans for the farmer_data rows matching ``where`` whose crop is still in the field on ``today``.
+
+    A submission's creation date is taken as its sowing date; rows whose
+    created_at SQLite cannot read as a date are skipped. Yields
+    ``(submission_id, sowing_date, plan, next_index)`` in id order, where
+    ``next_index`` is the plan's first irrigation on or after ``today``
+    (``plan.irrigations`` if none is left).
+    """
+    engine = get_engine()
+    today = today or date.today()
+    today64 = np.datetime64(today, 'D')
+    # No plan runs longer than the longest crop, so older rows need not be read
+    longest = int(engine.stage_ends[:, -1].max()) if len(engine.crops) else 0
+    earliest = (today - timedelta(days=longest)).isoformat()
+    cursor = conn.execute(f"""
+        SELECT fd.id, fd.crop, fd.soil_type, fd.water_level, date(fd.created_at)
+        FROM farmer_data fd
+        WHERE ({where}) AND fd.created_at >= ? AND date(fd.created_at) IS NOT NULL
+          AND fd.crop IS NOT NULL AND fd.crop != ''
+        ORDER BY fd.id
+    """, list(params) + [earliest])
+    remaining = limit
+    while remaining:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        sown = np.array([row[4] for row in rows], dtype='datetime64[D]')
+        day_of_year = (sown - sown.astype('datetime64[Y]')).astype(np.int64)
+        weeks = np.minimum(day_of_year // 7, WEEKS - 1)
+        plans, inverse = engine.lookup(engine.encode(
+            [row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows], weeks))
+
+        # Irrigation days of every distinct plan, padded, so each farm's next one is one comparison
+        width = max([plan.irrigations for plan in plans if plan is not None] + [1])
+        padded = np.full((len(plans), width), np.iinfo(np.int32).max, dtype=np.int32)
+        season_days = np.zeros(len(plans), dtype=np.int64)
+        for i, plan in enumerate(plans):
+            if plan is not None:
+                padded[i, :plan.irrigations] = plan.days
+                season_days[i] = plan.season_days
+        elapsed = (today64 - sown).astype(np.int64)
+        running = (elapsed >= 0) & (elapsed < season_days[inverse])
+        next_index = (padded[inverse] < elapsed[:, None]).sum(axis=1)
+
+        for i in np.nonzero(running)[0].tolist():
+            yield rows[i][0], sown[i].item(), plans[inverse[i]], int(next_index[i])
+            remaining -= 1
+            if not remaining:
+                break
@@ -0,0 +1,209 @@
+"""Vectorized crop suitability scoring.
+
+The knowledge base's soil x water-level crop lists are turned into a dense
+suitability tensor ``[soil, water, crop]`` and a ``[season, crop]`` factor
+matrix, so thousands of farms can be ranked with a few NumPy operations
+instead of one dict lookup per farm.
+
+Water levels can be the form's category strings or numbers in metres on the
+same scale as those labels (Low < 2 m, Moderate 2-5 m, High > 5 m, with
+Waterlogged beyond High). Numbers are spread over the two nearest categories
+so a 4.8 m farm scores close to both Moderate and High crops.
+"""
+from datetime import date
+
+import numpy as np
+
+import knowledge
+
+SEASONS = ('Kharif', 'Rabi', 'Zaid')
+
+# Centre of each water-level category on the metre scale, in knowledge-base order
+WATER_LEVEL_CENTRES = {
+    'Low (Below 2m)': 1.0,
+    'Moderate (2m - 5m)': 3.5,
+    'High (Above 5m)': 6.5,
+    'Waterlogged Area': 10.0,
+}
+
+# Each position further down a crop list costs this much suitability
+RANK_DECAY = 0.08
+# Share of suitability a crop keeps in the water categories next to a listed one
+NEIGHBOUR_CREDIT = 0.35
+# Multiplier for crops grown outside the requested season
+OFF_SEASON_FACTOR = 0.25
+
+CHUNK_SIZE = 65536
+
+
+def current_season(today=None):
+    month = (today or date.today()).month
+    if 6 <= month <= 10:
+        return 'Kharif'
+    if month >= 11 or month <= 3:
+        return 'Rabi'
+    return 'Zaid'
+
+
+class ScoringEngine:
+    def __init__(self, kb):
+        self.kb = kb
+        self.soils = kb.soil_types
+        self.water_levels = kb.water_levels
+        self.crops = kb.crops
+        self._crop_names = np.array(self.crops, dtype=object)
+        self.soil_index = {soil: i for i, soil in enumerate(self.soils)}
+        self.water_index = {water: i for i, water in enumerate(self.water_levels)}
+        self.season_index = {season: i for i, season in enumerate(SEASONS)}
+        crop_index = {crop: i for i, crop in enumerate(self.crops)}
+
+        n_soil, n_water, n_crop = len(self.soils), len(self.water_levels), len(self.crops)
+        listed = np.zeros((n_soil, n_water, n_crop), dtype=np.float32)
+        for s, soil in enumerate(self.soils):
+            for w, water in enumerate(self.water_levels):
+                for rank, crop in enumerate(kb.recommendations(soil, water)):
+                    listed[s, w, crop_index[crop]] = max(0.1, 1.0 - RANK_DECAY * rank)
+
+        # Spill a little suitability into neighbouring water categories
+        suitability = listed.copy()
+        if n_water > 1:
+            suitability[:, 1:, :] = np.maximum(suitability[:, 1:, :], NEIGHBOUR_CREDIT * listed[:, :-1, :])
+            suitability[:, :-1, :] = np.maximum(suitability[:, :-1, :], NEIGHBOUR_CREDIT * listed[:, 1:, :])
+        self.suitability = suitability
+
+        # Row ``len(SEASONS)`` is the "any season" row of ones
+        season_factor = np.ones((len(SEASONS) + 1, n_crop), dtype=np.float32)
+        for c, crop in enumerate(self.crops):
+            grown_in = kb.crop_seasons.get(crop)
+            if grown_in:
+                for season, i in self.season_index.items():
+                    if season not in grown_in:
+                        season_factor[i, c] = OFF_SEASON_FACTOR
+        self.season_factor = season_factor
+
+        centres = [WATER_LEVEL_CENTRES.get(water, float(i)) for i, water in enumerate(self.water_levels)]
+        self.water_centres = np.asarray(centres, dtype=np.float32)
+
+    # --- input encoding ---
+    def encode_soils(self, soils):
+        return np.fromiter((self.soil_index.get(s, -1) for s in soils), dtype=np.int32)
+
+    def encode_seasons(self, seasons, n):
+        any_season = len(SEASONS)
+        if seasons is None or isinstance(seasons, str):
+            return np.full(n, self.season_index.get(seasons, any_season), dtype=np.int32)
+        return np.fromiter((self.season_index.get(s, any_season) for s in seasons), dtype=np.int32)
+
+    def water_membership(self, water_levels):
+        """(n, n_water) membership weights from category names and/or metres."""
+        values = list(water_levels)
+        n, n_water = len(values), len(self.water_levels)
+        membership = np.zeros((n, n_water), dtype=np.float32)
+
+        metres = np.full(n, np.nan, dtype=np.float32)
+        for i, value in enumerate(values):
+            w = self.water_index.get(value) if isinstance(value, str) else None
+            if w is not None:
+                membership[i, w] = 1.0
+            elif value is not None and not isinstance(value, str):
+                metres[i] = value
+            elif isinstance(value, str):
+                try:
+                    metres[i] = float(value)
+                except ValueError:
+                    pass
+
+        numeric = ~np.isnan(metres)
+        if numeric.any() and n_water:
+            centres = self.water_centres
+            x = np.clip(metres[numeric], centres[0], centres[-1])
+            upper = np.clip(np.searchsorted(centres, x, side='left'), 1, max(n_water - 1, 1))
+            lower = upper - 1
+            span = centres[upper] - centres[lower]
+            weight = np.where(span > 0, (x - centres[lower]) / np.where(span > 0, span, 1), 0.0)
+            rows = np.nonzero(numeric)[0]
+            membership[rows, lower] = 1.0 - weight
+            membership[rows, upper] += weight
+        return membership
+
+    # --- scoring ---
+    def score_encoded(self, soil_idx, membership, season_idx):
+        """Score matrix (n, n_crop) for already-encoded farms; unknown soils score 0."""
+        n = len(soil_idx)
+        scores = np.zeros((n, len(self.crops)), dtype=np.float32)
+        for start in range(0, n, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, n)
+            soils = soil_idx[start:stop]
+            known = soils >= 0
+            per_farm = self.suitability[np.where(known, soils, 0)]
+            chunk = np.einsum('fw,fwc->fc', membership[start:stop], per_farm)
+            chunk *= self.season_factor[season_idx[start:stop]]
+            chunk[~known] = 0.0
+            scores[start:stop] = chunk
+        return scores
+
+    def score(self, soils, water_levels, seasons=None):
+        soils = list(soils)
+        soil_idx = self.encode_soils(soils)
+        return self.score_encoded(soil_idx, self.water_membership(water_levels),
+                                  self.encode_seasons(seasons, len(soils)))
+
+    def top_k(self, scores, k=5):
+        """Indices and scores of the ``k`` best crops per row, best first."""
+        k = max(1, min(k, scores.shape[1]))
+        if k < scores.shape[1]:
+            idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        top = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(-top, axis=1, kind='stable')
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def rank(self, soils, water_levels, seasons=None, k=5):
+        """Ranked ``[(crop, score), ...]`` lists, one per farm, zero scores dropped."""
+        idx, top = self.top_k(self.score(soils, water_levels, seasons), k)
+        names = self._crop_names[idx].tolist()
+        values = np.round(top.astype(np.float64), 4).tolist()
+        return [
+            [(crop, value) for crop, value in zip(row_names, row_values) if value > 0]
+            for row_names, row_values in zip(names, values)
+        ]
+
+    def rank_one(self, soil, water_level, season=None, k=5):
+        return self.rank([soil], [water_level], [season], k)[0]
+
+
+_engine = None
+
+
+def get_engine():
+    """Scoring engine for the current knowledge base, rebuilt after a reload."""
+    global _engine
+    kb = knowledge.get_knowledge_base()
+    engine = _engine
+    if engine is None or engine.kb is not kb:
+        engine = _engine = ScoringEngine(kb)
+    return engine
+
+
+def score_submissions(conn, where='1', params=(), season=None, k=5, limit=-1, batch_size=10000):
+    """Rank crops for every farmer_data row matching ``where``, one batch at a time.
+
+    Yields ``(submission_id, [(crop, score), ...])`` so callers can stream
+    results for a whole district without holding them all in memory.
+    """
+    engine = get_engine()
+    cursor = conn.execute(f"""
+        SELECT fd.id, fd.soil_type, fd.water_level
+        FROM farmer_data fd
+        WHERE {where}
+        ORDER BY fd.id
+        LIMIT ?
+    """, list(params) + [limit])
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        ranked = engine.rank([r[1] for r in rows], [r[2] for r in rows], season, k)
+        for row, crops in zip(rows, ranked):
+            yield row[0], crops
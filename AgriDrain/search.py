@@ -0,0 +1,188 @@
+"""Full-text search over submissions with facet counts, for the admin dashboard.
+
+``submission_fts`` is an external-content FTS5 index over farmer_data's name,
+farm_address and recommendation columns. Triggers keep it in sync on insert,
+update and delete, including the deletes made by the archiver, so archived
+seasons drop out of the index. A search runs as one statement. It takes the
+newest ``MAX_CANDIDATES`` matching submissions (an FTS doclist walk in rowid
+order, so it stops early), counts crop, soil type and water level over them,
+and returns one page ranked by bm25. Total and facets are therefore exact up
+to ``MAX_CANDIDATES`` matches and reported as "more than" beyond that.
+
+Words found in more than half of the submissions ("village", "farmer") are
+dropped from the query, as MySQL's natural-language full-text search does. For
+ranking they carry almost no weight, yet bm25 would scan their whole doclist
+on every query to weigh them. A query made only of such words is still run,
+newest first. The list is cached per process and refreshed every
+``COMMON_TERMS_REFRESH_WRITES`` writes to farmer_data.
+"""
+import re
+import sqlite3
+import threading
+
+import db
+import feedback
+
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+# Matches ranked and faceted per query; beyond this only the newest are considered
+MAX_CANDIDATES = 2000
+FACETS = ('crop', 'soil_type', 'water_level')
+INDEXED_COLUMNS = ('name', 'farm_address', 'recommendation')
+
+COMMON_TERM_SHARE = 0.5
+# Below this many submissions every word is searched, however common
+COMMON_TERMS_MIN_DOCS = 1000
+COMMON_TERMS_REFRESH_WRITES = 10000
+
+# A word, optionally followed by * for a prefix search
+SEARCH_TERM = re.compile(r'(\w+)(\*?)', re.UNICODE)
+
+
+def rebuild(conn):
+    """Re-index every submission from farmer_data."""
+    conn.execute("INSERT INTO submission_fts (submission_fts) VALUES ('rebuild')")
+
+
+def check(conn):
+    """Compare the index with farmer_data; returns a list of problems, empty when consistent."""
+    try:
+        conn.execute("INSERT INTO submission_fts (submission_fts, rank) VALUES ('integrity-check', 1)")
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    return []
+
+
+def common_terms(conn):
+    """Indexed words found in more than ``COMMON_TERM_SHARE`` of the submissions."""
+    docs = conn.execute("SELECT COUNT(*) FROM farmer_data").fetchone()[0]
+    if docs < COMMON_TERMS_MIN_DOCS:
+        return frozenset()
+    rows = conn.execute("SELECT term FROM submission_fts_vocab WHERE doc > ?", (docs * COMMON_TERM_SHARE,))
+    return frozenset(row[0] for row in rows)
+
+
+class CommonTermsCache:
+    """``common_terms`` per process, recomputed once farmer_data has seen enough writes."""
+
+    def __init__(self, refresh_writes=COMMON_TERMS_REFRESH_WRITES):
+        self.refresh_writes = refresh_writes
+        self._terms = frozenset()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, conn):
+        version = db.table_version(conn, 'farmer_data')
+        with self._lock:
+            if (version is not None and self._version is not None
+                    and 0 <= version - self._version < self.refresh_writes):
+                return self._terms
+        terms = common_terms(conn)
+        with self._lock:
+            self._terms, self._version = terms, version
+        return terms
+
+
+common_terms_cache = CommonTermsCache()
+
+
+def parse_query(text, common=frozenset()):
+    """``(match expression, ranked, ignored words)`` for free text, or None without words.
+
+    Words are quoted, so FTS syntax typed by a user never raises a syntax
+    error; a trailing ``*`` keeps its prefix meaning. Common words are left
+    out unless nothing else remains, in which case the results are not ranked.
+    """
+    terms = [(word, star) for word, star in SEARCH_TERM.findall(text or '')]
+    if not terms:
+        return None
+    kept = [(word, star) for word, star in terms if star or word.lower() not in common]
+    if not kept:
+        return " ".join(f'"{word}"' for word, _ in terms), False, []
+    ignored = [word for word, star in terms if (word, star) not in kept]
+    return " ".join(f'"{word}"{star}' for word, star in kept), True, ignored
+
+
+def search(conn, text, where='1', params=(), page=1, per_page=PER_PAGE):
+    """One ranked page of submissions matching ``text`` plus facet counts.
+
+    ``where``/``params`` narrow the matches further (alias ``fd``, as built for
+    the dashboard filters). Returns ``{'rows', 'total', 'capped', 'facets',
+    'page', 'pages', 'per_page', 'ignored'}``. ``facets`` maps each of
+    ``FACETS`` to ``[(value, count), ...]``, most common first. ``capped`` means
+    more than ``MAX_CANDIDATES`` submissions matched, and total, facets and
+    ranking cover the newest ``MAX_CANDIDATES`` of them.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    result = {'rows': [], 'total': 0, 'capped': False, 'facets': {facet: [] for facet in FACETS},
+              'page': 1, 'pages': 1, 'per_page': per_page, 'ignored': []}
+    query = parse_query(text, common_terms_cache.get(conn))
+    if query is None:
+        return result
+    expression, ranked, result['ignored'] = query
+
+    # Pages past the candidate cap do not exist, so clamp before querying
+    last_page = -(-MAX_CANDIDATES // per_page)
+    page = max(1, min(page, last_page))
+    score = "bm25(submission_fts)" if ranked else "0"
+    facet_selects = "".join(f"""
+        UNION ALL
+        SELECT '{facet}', {facet}, COUNT(*) FROM hits GROUP BY {facet}""" for facet in FACETS)
+    rows = conn.execute(f"""
+        WITH hits AS MATERIALIZED (
+            SELECT fd.id, {", ".join(f"fd.{facet}" for facet in FACETS)}, {score} AS score
+            FROM submission_fts
+            JOIN farmer_data fd ON fd.id = submission_fts.rowid
+            WHERE submission_fts MATCH ? AND ({where})
+            ORDER BY submission_fts.rowid DESC
+            LIMIT ?
+        )
+        SELECT 'total', NULL, COUNT(*) FROM hits
+        {facet_selects}
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'hit', id, score FROM hits ORDER BY score, id DESC LIMIT ? OFFSET ?
+        )
+    """, [expression, *params, MAX_CANDIDATES + 1, per_page, (page - 1) * per_page]).fetchall()
+
+    hits = []
+    for kind, value, count in rows:
+        if kind == 'total':
+            result['capped'] = count > MAX_CANDIDATES
+            result['total'] = min(count, MAX_CANDIDATES)
+        elif kind == 'hit':
+            hits.append(value)
+        elif value is not None and value != '':
+            result['facets'][kind].append((value, count))
+    for facet in FACETS:
+        result['facets'][facet].sort(key=lambda item: (-item[1], item[0]))
+    result['pages'] = max(1, -(-result['total'] // per_page))
+    if page > result['pages']:
+        # Asked past the last page of this result; show the last page instead
+        return search(conn, text, where, params, result['pages'], per_page)
+    result['page'] = page
+    result['rows'] = fetch_hits(conn, hits, expression)
+    return result
+
+
+def fetch_hits(conn, ids, expression):
+    """Full farmer_data rows for ``ids``, in that order, with the matched words highlighted."""
+    if not ids:
+        return []
+    marks = ", ".join("?" for _ in ids)
+    rows = {row['id']: dict(row) for row in conn.execute(
+        f"SELECT * FROM farmer_data WHERE id IN ({marks})", ids
+    )}
+    highlighted = ", ".join(
+        f"highlight(submission_fts, {n}, '{feedback.HIGHLIGHT_START}', '{feedback.HIGHLIGHT_END}')"
+        for n in range(len(INDEXED_COLUMNS))
+    )
+    for row in conn.execute(f"""
+        SELECT rowid, {highlighted} FROM submission_fts
+        WHERE submission_fts MATCH ? AND rowid IN ({marks})
+    """, [expression, *ids]):
+        rows[row[0]]['highlights'] = {
+            column: feedback.highlight(value)
+            for column, value in zip(INDEXED_COLUMNS, row[1:]) if value and feedback.HIGHLIGHT_START in value
+        }
+    return [rows[i] for i in ids if i in rows]
@@ -0,0 +1,86 @@
+"""Recommendation snapshots: the suggestion payload shown for each submission, as stored.
+
+When a farmer submits, /farmer stores the crop recommendations, planting guide
+and tips computed from the knowledge base at that moment. /suggestion/<id> then
+shows exactly what the farmer was told, after logout and after the knowledge
+base has been edited, and the session only has to carry the submission id.
+
+Most submissions repeat one of a few hundred (soil, water, crop) combinations,
+so ``recommendation_snapshots`` holds each distinct payload once, keyed by a
+digest of its canonical JSON, and ``farmer_data.snapshot`` holds the digest.
+Snapshots are never deleted, so rows moved to a season archive still resolve.
+Each process remembers the digests it has already stored, so a submission only
+writes a snapshot row the first time its payload is seen.
+"""
+import hashlib
+import json
+import threading
+
+from flask import current_app
+
+import knowledge
+
+DIGEST_SIZE = 16
+
+
+def digest(payload_json):
+    return hashlib.blake2b(payload_json.encode('utf-8'), digest_size=DIGEST_SIZE).hexdigest()
+
+
+class KnownDigests:
+    """Digests this process has already stored in one database."""
+
+    def __init__(self):
+        self._digests = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, value):
+        with self._lock:
+            return value in self._digests
+
+    def add(self, value):
+        with self._lock:
+            self._digests.add(value)
+
+
+def _known(app):
+    known = app.extensions.get('agridrain_snapshots')
+    if known is None:
+        known = app.extensions['agridrain_snapshots'] = KnownDigests()
+    return known
+
+
+def store(conn, soil_type, water_level, crop, app=None):
+    """Make sure the current payload for this submission is stored; returns its digest.
+
+    Commits on ``conn`` when a new snapshot row had to be written.
+    """
+    payload_json = knowledge.suggestion_json(soil_type, water_level, crop)
+    value = digest(payload_json)
+    known = _known(app or current_app)
+    if value not in known:
+        conn.execute("INSERT OR IGNORE INTO recommendation_snapshots (digest, payload) VALUES (?, ?)",
+                     (value, payload_json))
+        conn.commit()
+        known.add(value)
+    return value
+
+
+def load(conn, value):
+    """The stored payload for a digest, or None if there is none."""
+    if not value:
+        return None
+    row = conn.execute("SELECT payload FROM recommendation_snapshots WHERE digest = ?", (value,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def payload_for(conn, submission):
+    """Suggestion payload for a farmer_data row: its snapshot, else computed now.
+
+    Rows from before snapshots existed, and bulk-imported rows, have none.
+    """
+    payload = load(conn, submission['snapshot'])
+    if payload is None:
+        payload = knowledge.thaw(knowledge.suggestion_payload(
+            submission['soil_type'], submission['water_level'], submission['crop']))
+    return payload
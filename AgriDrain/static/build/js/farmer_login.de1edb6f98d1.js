@@ -0,0 +1,25 @@
+function togglePassword() {
+const passwordInput = document.getElementById('password');
+const toggleBtn = document.querySelector('.toggle-password');
+if (passwordInput.type === 'password') {
+passwordInput.type = 'text';
+toggleBtn.textContent = '👁️‍🗨️';
+} else {
+passwordInput.type = 'password';
+toggleBtn.textContent = '👁️';
+}
+}
+document.querySelectorAll('input').forEach(input => {
+input.addEventListener('focus', function() {
+this.parentElement.classList.add('focused');
+});
+input.addEventListener('blur', function() {
+if (!this.value) {
+this.parentElement.classList.remove('focused');
+}
+});
+});
+document.querySelector('.login-form').addEventListener('submit', function(e) {
+const btn = this.querySelector('.login-btn');
+btn.classList.add('loading');
+});
\ No newline at end of file
@@ -0,0 +1,51 @@
+function togglePassword() {
+const passwordInput = document.getElementById('password');
+const toggleBtn = document.querySelector('.toggle-password');
+if (passwordInput.type === 'password') {
+passwordInput.type = 'text';
+toggleBtn.textContent = '👁️‍🗨️';
+} else {
+passwordInput.type = 'password';
+toggleBtn.textContent = '👁️';
+}
+}
+document.getElementById('password').addEventListener('input', function() {
+const password = this.value;
+const strengthFill = document.getElementById('strength-fill');
+const strengthText = document.getElementById('strength-text');
+let strength = 0;
+let color = '#f44336';
+let text = 'Weak';
+if (password.length >= 6) strength += 25;
+if (password.match(/[a-z]/) && password.match(/[A-Z]/)) strength += 25;
+if (password.match(/\d/)) strength += 25;
+if (password.match(/[^a-zA-Z\d]/)) strength += 25;
+if (strength >= 75) {
+color = '#4caf50';
+text = 'Strong';
+} else if (strength >= 50) {
+color = '#ff9800';
+text = 'Medium';
+} else if (strength >= 25) {
+color = '#ffeb3b';
+text = 'Fair';
+}
+strengthFill.style.width = strength + '%';
+strengthFill.style.background = color;
+strengthText.textContent = text;
+strengthText.style.color = color;
+});
+document.querySelectorAll('input').forEach(input => {
+input.addEventListener('focus', function() {
+this.parentElement.classList.add('focused');
+});
+input.addEventListener('blur', function() {
+if (!this.value) {
+this.parentElement.classList.remove('focused');
+}
+});
+});
+document.querySelector('.registration-form').addEventListener('submit', function(e) {
+const btn = this.querySelector('.register-btn');
+btn.classList.add('loading');
+});
\ No newline at end of file
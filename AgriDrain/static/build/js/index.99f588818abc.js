@@ -0,0 +1,12 @@
+document.addEventListener("DOMContentLoaded", function() {
+let currentIndex = 0;
+const banners = document.querySelectorAll('.image-slider img');
+if (banners.length > 0) {
+banners[0].classList.add('active');
+setInterval(() => {
+banners[currentIndex].classList.remove('active');
+currentIndex = (currentIndex + 1) % banners.length;
+banners[currentIndex].classList.add('active');
+}, 4000);
+}
+});
\ No newline at end of file
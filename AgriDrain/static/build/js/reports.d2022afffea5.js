@@ -0,0 +1,184 @@
+const sampleSoilData = [
+{"soil_type": "Black Soil", "count": 45},
+{"soil_type": "Red Soil", "count": 32},
+{"soil_type": "Alluvial Soil", "count": 28},
+{"soil_type": "Laterite Soil", "count": 15},
+{"soil_type": "Marshy and Peaty Soil", "count": 8}
+];
+const sampleCropData = [
+{"crop": "Rice", "count": 38},
+{"crop": "Wheat", "count": 35},
+{"crop": "Cotton", "count": 22},
+{"crop": "Sugarcane", "count": 18},
+{"crop": "Groundnut", "count": 15},
+{"crop": "Maize", "count": 12},
+{"crop": "Pulses", "count": 10}
+];
+const soilData = REPORT_DATA.soil || sampleSoilData;
+const cropData = REPORT_DATA.crop || sampleCropData;
+document.getElementById('soilTypesCount').textContent = soilData.length;
+document.getElementById('cropVarietiesCount').textContent = cropData.length;
+document.getElementById('totalRecords').textContent =
+soilData.reduce((sum, item) => sum + item.count, 0) +
+cropData.reduce((sum, item) => sum + item.count, 0);
+if (soilData.length > 0) {
+const mostCommonSoil = soilData.reduce((max, item) => item.count > max.count ? item : max, soilData[0]);
+document.getElementById('mostCommonSoil').textContent = mostCommonSoil.soil_type;
+document.getElementById('totalSoilSamples').textContent = soilData.reduce((sum, item) => sum + item.count, 0);
+}
+if (cropData.length > 0) {
+const topCrop = cropData.reduce((max, item) => item.count > max.count ? item : max, cropData[0]);
+document.getElementById('topCrop').textContent = topCrop.crop;
+document.getElementById('totalCropPlantings').textContent = cropData.reduce((sum, item) => sum + item.count, 0);
+}
+const soilLabels = soilData.map(row => row.soil_type);
+const soilCounts = soilData.map(row => row.count);
+const cropLabels = cropData.map(row => row.crop);
+const cropCounts = cropData.map(row => row.count);
+const soilBarColors = [
+'rgba(139, 69, 19, 0.9)',   // Rich Brown
+'rgba(160, 82, 45, 0.9)',   // Sienna
+'rgba(222, 184, 135, 0.9)', // Wheat
+'rgba(210, 105, 30, 0.9)',  // Chocolate
+'rgba(188, 143, 143, 0.9)', // RosyBrown
+'rgba(205, 133, 63, 0.9)',  // Peru
+'rgba(218, 165, 32, 0.9)',  // GoldenRod
+'rgba(184, 134, 11, 0.9)'   // DarkGoldenRod
+];
+const soilPieColors = [
+'#8B4513', '#A0522D', '#DEB887', '#D2691E',
+'#BC8F8F', '#CD853F', '#DAA520', '#B8860B'
+];
+const cropBarColors = [
+'rgba(255, 193, 7, 0.9)',   // Amber
+'rgba(255, 152, 0, 0.9)',   // Orange
+'rgba(255, 87, 34, 0.9)',   // Deep Orange
+'rgba(76, 175, 80, 0.9)',   // Green
+'rgba(139, 195, 74, 0.9)',  // Light Green
+'rgba(205, 220, 57, 0.9)',  // Lime
+'rgba(255, 235, 59, 0.9)',  // Yellow
+'rgba(255, 167, 38, 0.9)'   // Orange Accent
+];
+const cropPieColors = [
+'#FFC107', '#FF9800', '#FF5722', '#4CAF50',
+'#8BC34A', '#CDDC39', '#FFEB3B', '#FFA726'
+];
+const createChart = (ctx, type, labels, data, colors, borderColors) => {
+return new Chart(ctx, {
+type: type,
+data: {
+labels: labels,
+datasets: [{
+data: data,
+backgroundColor: colors,
+borderColor: borderColors || colors.map(color => color.replace('0.9', '1')),
+borderWidth: 3,
+borderRadius: type === 'bar' ? 12 : 0,
+borderJoinStyle: 'round',
+}]
+},
+options: {
+responsive: true,
+maintainAspectRatio: false,
+animation: {
+duration: 2000,
+easing: 'easeOutQuart'
+},
+plugins: {
+legend: {
+display: type === 'pie',
+position: 'bottom',
+labels: {
+padding: 25,
+usePointStyle: true,
+pointStyle: 'circle',
+font: {
+size: 12,
+weight: '600'
+}
+}
+},
+tooltip: {
+backgroundColor: 'rgba(0, 0, 0, 0.8)',
+titleFont: { size: 13, weight: '600' },
+bodyFont: { size: 12 },
+padding: 12,
+cornerRadius: 8,
+displayColors: true
+}
+},
+scales: type === 'bar' ? {
+y: {
+beginAtZero: true,
+grid: {
+color: 'rgba(0, 0, 0, 0.1)',
+drawBorder: false
+},
+ticks: {
+font: { size: 11, weight: '600' }
+}
+},
+x: {
+grid: { display: false },
+ticks: {
+font: { size: 11, weight: '600' },
+maxRotation: 45
+}
+}
+} : {}
+}
+});
+};
+document.addEventListener('DOMContentLoaded', function() {
+if (soilData.length > 0) {
+const soilBarCtx = document.getElementById('soilBarChart');
+const soilPieCtx = document.getElementById('soilPieChart');
+if (soilBarCtx) {
+createChart(soilBarCtx, 'bar', soilLabels, soilCounts, soilBarColors);
+}
+if (soilPieCtx) {
+createChart(soilPieCtx, 'pie', soilLabels, soilCounts, soilPieColors);
+}
+}
+if (cropData.length > 0) {
+const cropBarCtx = document.getElementById('cropBarChart');
+const cropPieCtx = document.getElementById('cropPieChart');
+if (cropBarCtx) {
+createChart(cropBarCtx, 'bar', cropLabels, cropCounts, cropBarColors);
+}
+if (cropPieCtx) {
+createChart(cropPieCtx, 'pie', cropLabels, cropCounts, cropPieColors);
+}
+}
+setTimeout(() => {
+document.querySelectorAll('.chart-container').forEach(container => {
+container.style.opacity = '1';
+container.style.transform = 'translateY(0)';
+});
+}, 500);
+});
+function downloadChart(canvasId, filename) {
+const canvas = document.getElementById(canvasId);
+if (canvas) {
+const link = document.createElement('a');
+link.download = filename;
+link.href = canvas.toDataURL('image/png');
+link.click();
+} else {
+alert('Chart not available for download.');
+}
+}
+function generateFullReport() {
+alert('📊 Generating comprehensive agricultural report...\nThis would include detailed analysis and recommendations.');
+}
+function shareAnalytics() {
+if (navigator.share) {
+navigator.share({
+title: 'Agricultural Analytics Report',
+text: 'Check out these farming insights from Agri Drain Analytics!',
+url: window.location.href
+});
+} else {
+alert('🔗 Share this page URL to distribute the analytics insights!');
+}
+}
\ No newline at end of file
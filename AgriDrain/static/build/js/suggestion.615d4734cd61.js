@@ -0,0 +1,87 @@
+const cropDatabase = {
+"Rice": {
+season: "Kharif (June-October)",
+icon: "🌾",
+timing: "Sow: June-July, Harvest: October-November",
+soil: "Clayey loam with good water retention",
+water: "Requires standing water, ideal for high water levels",
+care: "Transplant seedlings, control weeds, manage water levels"
+},
+"Cotton": {
+season: "Kharif (June-December)",
+icon: "🧵",
+timing: "Sow: June-July, Harvest: December-January",
+soil: "Black soil preferred, well-drained",
+water: "Moderate water requirements",
+care: "Regular weeding, pest control for bollworms"
+},
+};
+document.addEventListener('DOMContentLoaded', function() {
+loadRecommendedCrops();
+loadCropGuide();
+});
+function cropDetails(cropName) {
+if (cropName === SUGGESTION.guideCrop && SUGGESTION.cropGuide) {
+return SUGGESTION.cropGuide;
+}
+return cropDatabase[cropName];
+}
+function loadRecommendedCrops() {
+const soilType = SUGGESTION.soilType;
+const waterLevel = SUGGESTION.waterLevel;
+const selectedCrop = SUGGESTION.selectedCrop;
+const recommendedCrops = SUGGESTION.recommendedCrops.length
+? SUGGESTION.recommendedCrops
+: getRecommendedCrops(soilType, waterLevel);
+const cropsGrid = document.getElementById('recommended-crops');
+cropsGrid.innerHTML = '';
+recommendedCrops.forEach(crop => {
+const cropInfo = cropDetails(crop) || {
+season: "Varies by region",
+icon: "🌱"
+};
+const cropCard = document.createElement('div');
+cropCard.className = `crop-card ${crop === selectedCrop ? 'selected' : ''}`;
+cropCard.innerHTML = `
+<div class="crop-icon">${cropInfo.icon}</div>
+<div class="crop-name">${crop}</div>
+<div class="crop-season">${cropInfo.season}</div>
+`;
+cropCard.onclick = function() {
+updateCropGuide(crop);
+};
+cropsGrid.appendChild(cropCard);
+});
+}
+function loadCropGuide() {
+const selectedCrop = SUGGESTION.guideCrop;
+updateCropGuide(selectedCrop);
+}
+function updateCropGuide(cropName) {
+const cropInfo = cropDetails(cropName) || {
+timing: "Information not available",
+soil: "Information not available",
+water: "Information not available",
+care: "Information not available"
+};
+document.getElementById('guide-crop-name').textContent = cropName;
+document.getElementById('season-info').innerHTML = `<p>${cropInfo.timing}</p>`;
+document.getElementById('soil-info').innerHTML = `<p>${cropInfo.soil}</p>`;
+document.getElementById('water-info').innerHTML = `<p>${cropInfo.water}</p>`;
+document.getElementById('care-info').innerHTML = `<p>${cropInfo.care}</p>`;
+}
+function openTab(tabName) {
+const tabContents = document.getElementsByClassName('tab-content');
+for (let i = 0; i < tabContents.length; i++) {
+tabContents[i].classList.remove('active');
+}
+const tabButtons = document.getElementsByClassName('tab-btn');
+for (let i = 0; i < tabButtons.length; i++) {
+tabButtons[i].classList.remove('active');
+}
+document.getElementById(tabName).classList.add('active');
+event.currentTarget.classList.add('active');
+}
+function getRecommendedCrops(soil, water) {
+return ["Rice", "Wheat", "Cotton", "Sugarcane"].slice(0, 4);
+}
\ No newline at end of file
@@ -0,0 +1,59 @@
+const TREND_COLORS = [
+'#2e7d32', '#1976d2', '#f57c00', '#7b1fa2', '#c62828',
+'#00838f', '#6d4c41', '#9e9d24', '#455a64'
+];
+const trendCharts = {};
+function trendLabel(bucket, grain) {
+const day = new Date(bucket + 'T00:00:00');
+if (grain === 'month') {
+return day.toLocaleDateString(undefined, { month: 'short', year: 'numeric' });
+}
+return day.toLocaleDateString(undefined, { day: 'numeric', month: 'short' });
+}
+function loadTrend(canvas) {
+const params = new URLSearchParams({
+dimension: canvas.dataset.dimension,
+grain: canvas.dataset.grain
+});
+fetch(`${REPORT_DATA.trendsUrl}?${params}`)
+.then(response => response.json())
+.then(data => {
+if (data.error) {
+return;
+}
+const datasets = data.series.map((series, i) => ({
+label: series.value || 'All submissions',
+data: series.counts,
+borderColor: TREND_COLORS[i % TREND_COLORS.length],
+backgroundColor: TREND_COLORS[i % TREND_COLORS.length],
+tension: 0.3,
+fill: false
+}));
+if (trendCharts[canvas.id]) {
+trendCharts[canvas.id].destroy();
+}
+trendCharts[canvas.id] = new Chart(canvas, {
+type: 'line',
+data: {
+labels: data.buckets.map(bucket => trendLabel(bucket, data.grain)),
+datasets: datasets
+},
+options: {
+responsive: true,
+maintainAspectRatio: false,
+interaction: { mode: 'index', intersect: false },
+scales: { y: { beginAtZero: true, ticks: { precision: 0 } } }
+}
+});
+});
+}
+document.addEventListener('DOMContentLoaded', function() {
+document.querySelectorAll('canvas[data-dimension]').forEach(loadTrend);
+document.querySelectorAll('.trend-grain').forEach(select => {
+select.addEventListener('change', function() {
+const canvas = document.getElementById(this.dataset.chart);
+canvas.dataset.grain = this.value;
+loadTrend(canvas);
+});
+});
+});
\ No newline at end of file
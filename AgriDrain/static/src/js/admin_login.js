@@ -0,0 +1,31 @@
+function togglePassword() {
+  const passwordInput = document.getElementById('password');
+  const toggleIcon = document.querySelector('.toggle-icon');
+
+  if (passwordInput.type === 'password') {
+    passwordInput.type = 'text';
+    toggleIcon.textContent = '👁️‍🗨️';
+  } else {
+    passwordInput.type = 'password';
+    toggleIcon.textContent = '👁️';
+  }
+}
+
+// Add focus effects
+document.querySelectorAll('.admin-input').forEach(input => {
+  input.addEventListener('focus', function() {
+    this.parentElement.classList.add('focused');
+  });
+
+  input.addEventListener('blur', function() {
+    if (!this.value) {
+      this.parentElement.classList.remove('focused');
+    }
+  });
+});
+
+// Form submission loading
+document.querySelector('.admin-login-form').addEventListener('submit', function(e) {
+  const btn = this.querySelector('.admin-login-btn');
+  btn.classList.add('loading');
+});
@@ -0,0 +1,141 @@
+let modalMap;
+
+function viewOnMap(lat, lng, farmerName) {
+  document.getElementById('farmerName').textContent = farmerName;
+  document.getElementById('mapCoordinates').textContent = lat.toFixed(6) + ', ' + lng.toFixed(6);
+
+  const modal = document.getElementById('mapModal');
+  modal.style.display = 'block';
+
+  // Initialize or update map
+  if (!modalMap) {
+    modalMap = L.map('modalMap').setView([lat, lng], 13);
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+      attribution: '© OpenStreetMap contributors'
+    }).addTo(modalMap);
+  } else {
+    modalMap.setView([lat, lng], 13);
+  }
+
+  // Clear existing markers and add new one
+  modalMap.eachLayer((layer) => {
+    if (layer instanceof L.Marker) {
+      modalMap.removeLayer(layer);
+    }
+  });
+
+  L.marker([lat, lng])
+    .addTo(modalMap)
+    .bindPopup(`<b>${farmerName}</b><br>Farm Location`)
+    .openPopup();
+}
+
+function closeMapModal() {
+  document.getElementById('mapModal').style.display = 'none';
+}
+
+function copyCoordinates(lat, lng) {
+  const text = lat + ', ' + lng;
+  navigator.clipboard.writeText(text).then(() => {
+    alert('Coordinates copied to clipboard!');
+  });
+}
+
+function viewFarmerDetails(farmerId) {
+  alert('View details for submission ID: ' + farmerId);
+  // Implement detailed view functionality
+}
+
+// --- Bulk actions ---
+function selectAllRows(box) {
+  document.querySelectorAll('input[name="ids"][form="bulkForm"]').forEach((c) => { c.checked = box.checked; });
+}
+
+function toggleBulkFields(action) {
+  document.querySelectorAll('#bulkForm .bulk-field').forEach((field) => {
+    field.hidden = !field.classList.contains('bulk-' + action);
+  });
+}
+
+function confirmBulk(form) {
+  const selected = document.querySelectorAll('input[name="ids"][form="bulkForm"]:checked').length;
+  const district = form.district.value.trim();
+  if (!selected && !district) {
+    alert('Tick at least one submission or enter a district.');
+    return false;
+  }
+  const target = district ? 'every submission in ' + district : selected + ' submission(s)';
+  return form.elements['action'].value !== 'delete_submissions' || confirm('Delete ' + target + '? This cannot be undone.');
+}
+
+function exportToCSV() {
+  // Streams every submission matching the current filters
+  window.location.href = DASHBOARD.exportCsvUrl;
+}
+
+// --- All farms overview map ---
+let overviewMap;
+let clusterLayer;
+
+function breakdownHtml(title, counts) {
+  const items = Object.entries(counts)
+    .sort((a, b) => b[1] - a[1])
+    .slice(0, 5)
+    .map(([name, count]) => `${name}: ${count}`)
+    .join('<br>');
+  return items ? `<b>${title}</b><br>${items}` : '';
+}
+
+function loadClusters() {
+  const bounds = overviewMap.getBounds();
+  const params = new URLSearchParams({
+    south: bounds.getSouth(),
+    west: bounds.getWest(),
+    north: bounds.getNorth(),
+    east: bounds.getEast(),
+    z: overviewMap.getZoom()
+  });
+  fetch(`${DASHBOARD.clustersUrl}?${params}`)
+    .then(response => response.json())
+    .then(data => {
+      clusterLayer.clearLayers();
+      (data.features || []).forEach(feature => {
+        const [lng, lat] = feature.geometry.coordinates;
+        const props = feature.properties;
+        L.circleMarker([lat, lng], {
+          radius: 6 + Math.log2(props.count) * 3,
+          color: '#1b5e20',
+          fillColor: '#4caf50',
+          fillOpacity: 0.6
+        })
+          .bindPopup(`<b>${props.count} farm(s)</b><br>${breakdownHtml('Crops', props.crops)}<br>${breakdownHtml('Soils', props.soils)}`)
+          .addTo(clusterLayer);
+      });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  overviewMap = L.map('overviewMap').setView([19.7515, 75.7139], 6);
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    attribution: '© OpenStreetMap contributors'
+  }).addTo(overviewMap);
+  clusterLayer = L.layerGroup().addTo(overviewMap);
+  overviewMap.on('moveend', loadClusters);
+  loadClusters();
+});
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+  const modal = document.getElementById('mapModal');
+  if (event.target === modal) {
+    closeMapModal();
+  }
+}
+
+// Auto-hide flash messages after 5 seconds
+setTimeout(function() {
+  const flashMessages = document.querySelectorAll('.flash-message');
+  flashMessages.forEach(function(message) {
+    message.style.display = 'none';
+  });
+}, 5000);
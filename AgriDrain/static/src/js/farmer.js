@@ -0,0 +1,268 @@
+let map;
+let marker;
+let currentLat = 19.7515; // Maharashtra center
+let currentLng = 75.7139;
+
+// Crop suggestions database
+const cropSuggestions = {
+  // Black Soil (Regur) - Great for cotton, cereals
+  "Black Soil": {
+    "Low (Below 2m)": ["Cotton", "Groundnut", "Jowar (Sorghum)", "Soybean"],
+    "Moderate (2m - 5m)": ["Cotton", "Soybean", "Jowar (Sorghum)", "Wheat", "Sunflower"],
+    "High (Above 5m)": ["Sugarcane", "Rice", "Turmeric", "Banana"],
+    "Waterlogged Area": ["Rice", "Sugarcane"]
+  },
+  // Laterite Soil - Good for plantation crops
+  "Laterite Soil": {
+    "Low (Below 2m)": ["Cashew", "Groundnut", "Bajra (Pearl Millet)"],
+    "Moderate (2m - 5m)": ["Cashew", "Sugarcane", "Turmeric", "Mango"],
+    "High (Above 5m)": ["Rice", "Sugarcane", "Banana"],
+    "Waterlogged Area": ["Rice"]
+  },
+  // Alluvial Soil - Very fertile, good for most crops
+  "Alluvial Soil": {
+    "Low (Below 2m)": ["Wheat", "Gram (Chana)", "Barley", "Mustard"],
+    "Moderate (2m - 5m)": ["Wheat", "Rice", "Sugarcane", "Cotton", "Maize"],
+    "High (Above 5m)": ["Rice", "Sugarcane", "Banana", "Turmeric"],
+    "Waterlogged Area": ["Rice", "Jute"]
+  },
+  // Red Soil - Good for millets, pulses
+  "Red Soil": {
+    "Low (Below 2m)": ["Groundnut", "Bajra (Pearl Millet)", "Ragi", "Gram (Chana)"],
+    "Moderate (2m - 5m)": ["Groundnut", "Jowar (Sorghum)", "Cotton", "Maize"],
+    "High (Above 5m)": ["Rice", "Sugarcane"],
+    "Waterlogged Area": ["Rice"]
+  },
+  // Marshy and Peaty Soil - Good for rice, aquaculture
+  "Marshy and Peaty Soil": {
+    "Low (Below 2m)": ["Rice", "Jute", "Sugarcane"],
+    "Moderate (2m - 5m)": ["Rice", "Sugarcane", "Banana"],
+    "High (Above 5m)": ["Rice", "Sugarcane", "Aquaculture"],
+    "Waterlogged Area": ["Rice", "Aquaculture", "Jute"]
+  }
+};
+
+// Function to suggest crops based on soil and water
+function suggestCrops() {
+  const soil = document.getElementById('soil').value;
+  const water = document.getElementById('water').value;
+  const suggestionsDiv = document.getElementById('crop-suggestions');
+  const cropsList = document.getElementById('suggested-crops-list');
+
+  if (soil && water && cropSuggestions[soil] && cropSuggestions[soil][water]) {
+    const suggestedCrops = cropSuggestions[soil][water];
+
+    cropsList.innerHTML = '';
+    suggestedCrops.forEach(crop => {
+      const badge = document.createElement('div');
+      badge.className = 'crop-badge';
+      badge.textContent = crop;
+      badge.onclick = function() {
+        document.getElementById('crop').value = crop;
+      };
+      cropsList.appendChild(badge);
+    });
+
+    suggestionsDiv.style.display = 'block';
+  } else {
+    suggestionsDiv.style.display = 'none';
+  }
+}
+
+// Initialize map
+function initMap() {
+  map = L.map('map').setView([currentLat, currentLng], 7);
+
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    attribution: '© OpenStreetMap contributors'
+  }).addTo(map);
+
+  // Add click event to map
+  map.on('click', function(e) {
+    const { lat, lng } = e.latlng;
+    updateMarker(lat, lng);
+    reverseGeocode(lat, lng);
+  });
+
+  // Add initial marker
+  marker = L.marker([currentLat, currentLng]).addTo(map)
+    .bindPopup('Your farm location')
+    .openPopup();
+}
+
+// Update marker position
+function updateMarker(lat, lng) {
+  if (marker) {
+    map.removeLayer(marker);
+  }
+  marker = L.marker([lat, lng]).addTo(map)
+    .bindPopup('Your farm location')
+    .openPopup();
+
+  document.getElementById('latitude').value = lat;
+  document.getElementById('longitude').value = lng;
+  currentLat = lat;
+  currentLng = lng;
+}
+
+// Get current location using GPS
+function getLocation() {
+  const locationBtn = document.querySelector('.location-btn');
+  const originalText = locationBtn.textContent;
+
+  locationBtn.textContent = '📍 Getting Location...';
+  locationBtn.disabled = true;
+
+  if (!navigator.geolocation) {
+    showLocationError('Geolocation is not supported by this browser.');
+    locationBtn.textContent = originalText;
+    locationBtn.disabled = false;
+    return;
+  }
+
+  navigator.geolocation.getCurrentPosition(
+    function(position) {
+      const lat = position.coords.latitude;
+      const lng = position.coords.longitude;
+
+      updateMarker(lat, lng);
+      map.setView([lat, lng], 15);
+      reverseGeocode(lat, lng);
+
+      locationBtn.textContent = originalText;
+      locationBtn.disabled = false;
+    },
+    function(error) {
+      let errorMessage = 'Unable to retrieve your location.';
+      switch(error.code) {
+        case error.PERMISSION_DENIED:
+          errorMessage = 'Location access denied. Please allow location access.';
+          break;
+        case error.POSITION_UNAVAILABLE:
+          errorMessage = 'Location information unavailable.';
+          break;
+        case error.TIMEOUT:
+          errorMessage = 'Location request timed out.';
+          break;
+      }
+      showLocationError(errorMessage);
+      locationBtn.textContent = originalText;
+      locationBtn.disabled = false;
+    },
+    {
+      enableHighAccuracy: true,
+      timeout: 10000,
+      maximumAge: 60000
+    }
+  );
+}
+
+// Reverse geocoding to get address
+function reverseGeocode(lat, lng) {
+  const addressInput = document.getElementById('farm-address');
+  addressInput.value = 'Getting address...';
+
+  fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lng}`)
+    .then(response => response.json())
+    .then(data => {
+      if (data && data.display_name) {
+        addressInput.value = data.display_name;
+      } else {
+        addressInput.value = `Location: ${lat.toFixed(6)}, ${lng.toFixed(6)}`;
+      }
+    })
+    .catch(error => {
+      console.error('Geocoding error:', error);
+      addressInput.value = `Location: ${lat.toFixed(6)}, ${lng.toFixed(6)}`;
+    });
+}
+
+// Show location error
+function showLocationError(message) {
+  let errorDiv = document.querySelector('.location-error');
+  if (!errorDiv) {
+    errorDiv = document.createElement('div');
+    errorDiv.className = 'location-error';
+    document.querySelector('.location-input-group').after(errorDiv);
+  }
+  errorDiv.textContent = message;
+
+  setTimeout(() => {
+    errorDiv.remove();
+  }, 5000);
+}
+
+// Popup functions
+function showPopup(id) {
+  document.getElementById(id).style.display = "block";
+}
+
+function hidePopup(id) {
+  document.getElementById(id).style.display = "none";
+}
+
+// Initialize map when page loads
+document.addEventListener('DOMContentLoaded', function() {
+  initMap();
+
+  // Your existing custom dropdown code here...
+  const soilImages = {
+    "Black Soil": "https://indorenursery.com/wp-content/uploads/2023/08/black-soil-1.webp",
+    "Laterite Soil": "https://5.imimg.com/data5/OR/HC/MY-37907573/laterite.jpg",
+    "Alluvial Soil": "https://www.shutterstock.com/image-photo/saline-alluvial-soil-summertime-dry-600nw-2500781017.jpg",
+    "Red Soil": "https://5.imimg.com/data5/ANDROID/Default/2023/9/344476666/MX/OD/KK/21503568/product-jpeg.jpg",
+    "Marshy and Peaty Soil": "https://placehold.co/40x40/5C4033/FFFFFF?text=M",
+  };
+
+  const container = document.querySelector(".custom-select-container");
+  if (!container) return;
+
+  const originalSelect = container.querySelector("select");
+  const options = originalSelect.getElementsByTagName("option");
+
+  const selectedDiv = document.createElement("DIV");
+  selectedDiv.setAttribute("class", "select-selected");
+  selectedDiv.innerHTML = `<span>${options[originalSelect.selectedIndex].innerHTML}</span>`;
+  container.appendChild(selectedDiv);
+
+  const optionsList = document.createElement("DIV");
+  optionsList.setAttribute("class", "select-items select-hide");
+
+  for (let i = 1; i < options.length; i++) {
+    const option = options[i];
+    const itemDiv = document.createElement("DIV");
+    itemDiv.setAttribute("class", "select-item");
+    const imageUrl = soilImages[option.innerHTML] || "https://placehold.co/40x40/cccccc/FFFFFF?text=?";
+
+    itemDiv.innerHTML = `<img src="${imageUrl}" alt="${option.innerHTML}"><span>${option.innerHTML}</span>`;
+
+    itemDiv.addEventListener("click", function() {
+      originalSelect.selectedIndex = i;
+      selectedDiv.innerHTML = this.innerHTML;
+      closeAllSelect();
+      suggestCrops(); // Update crop suggestions when soil changes
+    });
+    optionsList.appendChild(itemDiv);
+  }
+  container.appendChild(optionsList);
+
+  selectedDiv.addEventListener("click", function(e) {
+    e.stopPropagation();
+    closeAllSelect(this);
+    this.nextSibling.classList.toggle("select-hide");
+    this.classList.toggle("select-arrow-active");
+  });
+
+  function closeAllSelect(elmnt) {
+    const allSelectItems = document.getElementsByClassName("select-items");
+    const allSelected = document.getElementsByClassName("select-selected");
+    for (let i = 0; i < allSelectItems.length; i++) {
+      if (allSelected[i] != elmnt) {
+        allSelected[i].classList.remove("select-arrow-active");
+        allSelectItems[i].classList.add("select-hide");
+      }
+    }
+  }
+
+  document.addEventListener("click", closeAllSelect);
+});
@@ -0,0 +1,40 @@
+// Copy to clipboard function
+function copyToClipboard(text) {
+  navigator.clipboard.writeText(text).then(() => {
+    // Show temporary feedback
+    const event = new Event('copySuccess');
+    document.dispatchEvent(event);
+  }).catch(err => {
+    console.error('Failed to copy: ', err);
+  });
+}
+
+// Copy success feedback
+document.addEventListener('copySuccess', () => {
+  // You can add a toast notification here if needed
+  console.log('Password copied to clipboard');
+});
+
+// Bulk delete confirmation
+function confirmBulkDelete(form) {
+  const selected = document.querySelectorAll('input[name="ids"][form="bulkForm"]:checked').length;
+  if (!selected) {
+    alert('Tick at least one farmer first.');
+    return false;
+  }
+  const target = form.reassign_to.value
+    ? 'Their submissions will move to farmer #' + form.reassign_to.value + '.'
+    : 'Their submissions will be deleted too.';
+  return confirm('Delete ' + selected + ' farmer(s)? ' + target);
+}
+
+// Auto-hide flash messages after 5 seconds
+setTimeout(function() {
+  const flashMessages = document.querySelectorAll('.flash-message');
+  flashMessages.forEach(function(message) {
+    message.style.animation = 'slideOut 0.3s ease forwards';
+    setTimeout(() => {
+      message.style.display = 'none';
+    }, 300);
+  });
+}, 5000);
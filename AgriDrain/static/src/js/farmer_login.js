@@ -0,0 +1,31 @@
+function togglePassword() {
+  const passwordInput = document.getElementById('password');
+  const toggleBtn = document.querySelector('.toggle-password');
+
+  if (passwordInput.type === 'password') {
+    passwordInput.type = 'text';
+    toggleBtn.textContent = '👁️‍🗨️';
+  } else {
+    passwordInput.type = 'password';
+    toggleBtn.textContent = '👁️';
+  }
+}
+
+// Add floating animation to input focus
+document.querySelectorAll('input').forEach(input => {
+  input.addEventListener('focus', function() {
+    this.parentElement.classList.add('focused');
+  });
+
+  input.addEventListener('blur', function() {
+    if (!this.value) {
+      this.parentElement.classList.remove('focused');
+    }
+  });
+});
+
+// Form submission animation
+document.querySelector('.login-form').addEventListener('submit', function(e) {
+  const btn = this.querySelector('.login-btn');
+  btn.classList.add('loading');
+});
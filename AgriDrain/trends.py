@@ -0,0 +1,191 @@
+"""Submission trends over time, kept up to date by SQLite triggers.
+
+``submission_trends`` holds one counter per (dimension, day, value), where
+dimension is submissions, crop, soil_type or water_level. Triggers on
+farmer_data, created by migrations.py, keep the counters in step with every
+insert, update and delete. Weekly and monthly series are summed from the day
+rows when they are read. That touches at most a few thousand small rollup rows
+and never farmer_data. It also keeps the per-insert trigger work to one upsert
+per dimension rather than one per dimension and grain.
+
+Archived rows keep their trend counts the same way as the rollups do:
+``archived_trends`` holds their counts, and the archiver's deletes are skipped.
+"""
+from datetime import date, datetime, timedelta
+
+import rollups
+
+GRAINS = ('day', 'week', 'month')
+DIMENSIONS = {name: rollups.DIMENSIONS[name] for name in ('submissions', 'crop', 'soil_type', 'water_level')}
+
+# Longest series one request may ask for, per grain
+MAX_BUCKETS = {'day': 366, 'week': 260, 'month': 120}
+# Weeks start on Monday; months on the 1st
+BUCKET_SQL = {
+    'day': "day",
+    'week': "date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "strftime('%Y-%m-01', day)",
+}
+
+
+def _day(row):
+    return f"date({row}.created_at)"
+
+
+def _raw_counts(conn):
+    """Recompute every day counter straight from farmer_data plus the archived counts."""
+    counts = {
+        (row[0], row[1], row[2]): row[3]
+        for row in conn.execute("SELECT dimension, day, value, count FROM archived_trends")
+    }
+    for dimension, (value, condition) in DIMENSIONS.items():
+        rows = conn.execute(f"""
+            SELECT {_day('fd')} AS day, {value.format(row='fd')} AS value, COUNT(*) AS count
+            FROM farmer_data fd
+            WHERE {condition.format(row='fd')} AND {_day('fd')} IS NOT NULL
+            GROUP BY 1, 2
+        """)
+        for row in rows:
+            key = (dimension, row[0], row[1])
+            counts[key] = counts.get(key, 0) + row[2]
+    return counts
+
+
+def add_archived(conn, where, params=()):
+    """Like rollups.add_archived, for the day counters."""
+    for dimension, (value, condition) in DIMENSIONS.items():
+        conn.execute(f"""
+            INSERT INTO archived_trends (dimension, day, value, count)
+            SELECT '{dimension}', {_day('fd')}, {value.format(row='fd')}, COUNT(*)
+            FROM farmer_data fd
+            WHERE ({where}) AND {condition.format(row='fd')} AND {_day('fd')} IS NOT NULL
+            GROUP BY 2, 3
+            ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + excluded.count
+        """, params)
+
+
+def count_archived(conn, table, where, params=(), sign=1):
+    """Like rollups.count_archived, for the day counters."""
+    for target in ('submission_trends', 'archived_trends'):
+        for dimension, (value, condition) in DIMENSIONS.items():
+            conn.execute(f"""
+                INSERT INTO {target} (dimension, day, value, count)
+                SELECT '{dimension}', {_day('fd')}, {value.format(row='fd')}, {int(sign)} * COUNT(*)
+                FROM {table} fd
+                WHERE ({where}) AND {condition.format(row='fd')} AND {_day('fd')} IS NOT NULL
+                GROUP BY 2, 3
+                ON CONFLICT(dimension, day, value) DO UPDATE SET count = count + excluded.count
+            """, params)
+        conn.execute(f"DELETE FROM {target} WHERE count <= 0")
+
+
+def rebuild(conn):
+    """Throw away the trend counters and recompute them from the raw table."""
+    conn.execute("DELETE FROM submission_trends")
+    conn.executemany(
+        "INSERT INTO submission_trends (dimension, day, value, count) VALUES (?, ?, ?, ?)",
+        [(dimension, day, value, count) for (dimension, day, value), count in _raw_counts(conn).items()]
+    )
+
+
+def check(conn):
+    """``(dimension, day, value, stored, raw)`` for every counter that disagrees with farmer_data."""
+    raw = _raw_counts(conn)
+    stored = {
+        (row[0], row[1], row[2]): row[3]
+        for row in conn.execute("SELECT dimension, day, value, count FROM submission_trends")
+    }
+    return [
+        (*key, stored.get(key, 0), raw.get(key, 0))
+        for key in sorted(set(raw) | set(stored))
+        if raw.get(key, 0) != stored.get(key, 0)
+    ]
+
+
+def bucket_start(day, grain):
+    """First day of the bucket containing ``day`` (a date)."""
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    if grain == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, grain):
+    if grain == 'week':
+        return day + timedelta(days=7)
+    if grain == 'month':
+        return date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+
+def buckets_between(start, end, grain):
+    buckets = []
+    current = bucket_start(start, grain)
+    while current <= end:
+        buckets.append(current.isoformat())
+        current = next_bucket(current, grain)
+    return buckets
+
+
+def _parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def series(conn, dimension, grain='week', date_from=None, date_to=None, top=8):
+    """Zero-filled counts per bucket for the ``top`` values of ``dimension``.
+
+    Values outside the top are folded into ``Other``. Without an explicit
+    range, the series runs from the first to the latest submission, capped
+    at the last ``MAX_BUCKETS[grain]`` buckets.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+
+    first, latest = conn.execute(
+        "SELECT MIN(day), MAX(day) FROM submission_trends WHERE dimension = ?", (dimension,)
+    ).fetchone()
+    if date_to is None:
+        date_to = _parse_day(latest) if latest else date.today()
+    if date_from is None:
+        earliest = bucket_start(date_to, grain)
+        for _ in range(MAX_BUCKETS[grain] - 1):
+            earliest = bucket_start(earliest - timedelta(days=1), grain)
+        date_from = max(earliest, _parse_day(first)) if first else date_to
+    if date_from > date_to:
+        raise ValueError("date_from must not be after date_to")
+    buckets = buckets_between(date_from, date_to, grain)
+    if len(buckets) > MAX_BUCKETS[grain]:
+        raise ValueError(f"at most {MAX_BUCKETS[grain]} {grain} buckets per request; narrow the range")
+
+    rows = conn.execute(f"""
+        SELECT {BUCKET_SQL[grain]} AS bucket, value, SUM(count) AS count
+        FROM submission_trends
+        WHERE dimension = ? AND day BETWEEN ? AND ?
+        GROUP BY bucket, value
+    """, (dimension, buckets[0], date_to.isoformat())).fetchall()
+
+    totals = {}
+    for row in rows:
+        totals[row['value']] = totals.get(row['value'], 0) + row['count']
+    ranked = sorted(totals, key=lambda value: (-totals[value], value))
+    kept = set(ranked[:top])
+
+    index = {bucket: i for i, bucket in enumerate(buckets)}
+    values = {}
+    for row in rows:
+        name = row['value'] if row['value'] in kept else 'Other'
+        counts = values.setdefault(name, [0] * len(buckets))
+        counts[index[row['bucket']]] += row['count']
+
+    order = [value for value in ranked[:top] if value in values]
+    if 'Other' in values and 'Other' not in kept:
+        order.append('Other')
+    return {
+        'dimension': dimension,
+        'grain': grain,
+        'buckets': buckets,
+        'series': [{'value': value, 'counts': values[value], 'total': sum(values[value])} for value in order],
+    }
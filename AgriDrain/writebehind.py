@@ -0,0 +1,281 @@
+"""Write-behind queue that turns many small farmer_data inserts into group commits.
+
+When ``WRITE_BEHIND`` is enabled, /farmer hands its row to an in-process
+bounded queue instead of inserting and committing it itself. One background
+writer thread per process drains the queue and commits it in groups. A group
+is flushed after ``WRITE_BEHIND_BATCH_ROWS`` rows, or ``WRITE_BEHIND_MAX_DELAY_MS``
+after its first row arrived, whichever comes first. With the default delay of
+0 the writer commits as soon as the queue runs dry, and rows that arrive during
+a commit form the next group. So a burst of submissions takes the SQLite write
+lock (and syncs the WAL) once per group, not once per row, and a lone
+submission is not held back waiting for company.
+
+Acknowledgement modes:
+
+* ``committed`` - the request waits until its row's group has been committed
+  (or has failed), so a success message is only shown for stored data.
+* ``queued`` - the request returns as soon as the row is queued. Rows still
+  in the queue are lost if the process is killed before the next flush.
+
+When the queue is full, ``submit`` blocks for up to ``WRITE_BEHIND_PUT_TIMEOUT_MS``
+and then raises QueueFull, which the route turns into a 503. On interpreter exit
+the queue is closed: queued rows are flushed and the writer is joined.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+import db
+
+DEFAULT_CONFIG = {
+    'WRITE_BEHIND': os.environ.get('AGRIDRAIN_WRITE_BEHIND', '') == '1',
+    'WRITE_BEHIND_ACK': 'committed',
+    'WRITE_BEHIND_BATCH_ROWS': 256,
+    # Extra time the writer lingers for more rows once the queue is empty
+    'WRITE_BEHIND_MAX_DELAY_MS': 0,
+    'WRITE_BEHIND_QUEUE_SIZE': 10000,
+    'WRITE_BEHIND_PUT_TIMEOUT_MS': 1000,
+    # How long a 'committed' ack waits for the writer before giving up
+    'WRITE_BEHIND_ACK_TIMEOUT_MS': 10000,
+}
+
+ACK_MODES = ('committed', 'queued')
+
+SUBMISSION_COLUMNS = ('farmer_id', 'name', 'soil_type', 'water_level', 'crop',
+                      'farm_address', 'latitude', 'longitude', 'created_at', 'snapshot')
+INSERT_SUBMISSION = (
+    f"INSERT INTO farmer_data ({', '.join(SUBMISSION_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(SUBMISSION_COLUMNS))})"
+)
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """The write-behind queue stayed full for the whole put timeout."""
+
+
+class QueueClosed(Exception):
+    """The write-behind queue is shutting down and accepts no more rows."""
+
+
+class Ticket:
+    """Handle for one queued row; ``wait`` blocks until its group is committed."""
+    __slots__ = ('row', 'row_id', 'error', '_done')
+
+    def __init__(self, row):
+        self.row = row
+        self.row_id = None
+        self.error = None
+        self._done = threading.Event()
+
+    def resolve(self, row_id=None, error=None):
+        self.row_id = row_id
+        self.error = error
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Return the new farmer_data id, or raise the error that rejected the row."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("submission was not committed in time")
+        if self.error is not None:
+            raise self.error
+        return self.row_id
+
+
+class WriteBehindQueue:
+    """Bounded queue of farmer_data rows drained by a single group-commit writer."""
+
+    def __init__(self, connect, batch_rows=256, max_delay_ms=0, maxsize=10000, put_timeout_ms=1000):
+        self.connect = connect
+        self.batch_rows = batch_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.put_timeout = put_timeout_ms / 1000.0
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'queued': 0,
+            'committed': 0,
+            'failed': 0,
+            'rejected_full': 0,
+            'groups': 0,
+            'largest_group': 0,
+            'commit_seconds': 0.0,
+        }
+        self._writer = threading.Thread(target=self._run, name='agridrain-write-behind', daemon=True)
+        self._writer.start()
+
+    def submit(self, row):
+        """Queue one row (a tuple in SUBMISSION_COLUMNS order) and return its Ticket."""
+        if self._closed:
+            raise QueueClosed("write-behind queue is closed")
+        ticket = Ticket(row)
+        try:
+            self._queue.put(ticket, timeout=self.put_timeout)
+        except queue.Full:
+            self._bump('rejected_full')
+            raise QueueFull(f"write-behind queue is full ({self._queue.maxsize} rows)") from None
+        self._bump('queued')
+        return ticket
+
+    def close(self, timeout=30):
+        """Stop accepting rows, flush everything queued and join the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.pid != os.getpid():
+            # A forked child never owns the parent's writer thread
+            return
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+
+    def _next_group(self, first):
+        group = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                ticket = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if ticket is _STOP:
+                return group, True
+            group.append(ticket)
+        return group, False
+
+    def _run(self):
+        conn = self.connect()
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                group, stopping = self._next_group(first)
+                self._commit(conn, group)
+            # Rows queued behind the stop marker by racing submitters
+            leftovers = []
+            while True:
+                try:
+                    ticket = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if ticket is not _STOP:
+                    leftovers.append(ticket)
+            if leftovers:
+                self._commit(conn, leftovers)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, group):
+        start = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row_ids = []
+            for ticket in group:
+                row_ids.append(self._insert(conn, ticket))
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for ticket in group:
+                ticket.resolve(error=e)
+            self._record(group, failed=len(group), seconds=time.perf_counter() - start)
+            return
+        failed = 0
+        for ticket, row_id in zip(group, row_ids):
+            if ticket.error is not None:
+                failed += 1
+            ticket.resolve(row_id, ticket.error)
+        self._record(group, failed=failed, seconds=time.perf_counter() - start)
+
+    @staticmethod
+    def _insert(conn, ticket):
+        # A constraint error only rejects its own row, not the rest of the group
+        conn.execute("SAVEPOINT row")
+        try:
+            row_id = conn.execute(INSERT_SUBMISSION, ticket.row).lastrowid
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK TO row")
+            ticket.error = e
+            row_id = None
+        conn.execute("RELEASE row")
+        return row_id
+
+    def _record(self, group, failed, seconds):
+        with self._lock:
+            self._stats['groups'] += 1
+            self._stats['committed'] += len(group) - failed
+            self._stats['failed'] += failed
+            self._stats['largest_group'] = max(self._stats['largest_group'], len(group))
+            self._stats['commit_seconds'] += seconds
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_group'] = round(stats['committed'] / stats['groups'], 2) if stats['groups'] else 0.0
+        stats['commit_seconds'] = round(stats['commit_seconds'], 6)
+        stats['pending'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        stats['closed'] = self._closed
+        return stats
+
+
+def _create_queue(app):
+    pool = db.get_pool(app)
+    wbq = WriteBehindQueue(
+        pool.connect,
+        batch_rows=app.config['WRITE_BEHIND_BATCH_ROWS'],
+        max_delay_ms=app.config['WRITE_BEHIND_MAX_DELAY_MS'],
+        maxsize=app.config['WRITE_BEHIND_QUEUE_SIZE'],
+        put_timeout_ms=app.config['WRITE_BEHIND_PUT_TIMEOUT_MS'],
+    )
+    atexit.register(wbq.close)
+    return wbq
+
+
+def enabled(app=None):
+    return bool((app or current_app).config['WRITE_BEHIND'])
+
+
+def get_queue(app=None):
+    """Return the app's write-behind queue, starting a new writer after a fork."""
+    app = app or current_app
+    wbq = app.extensions.get('agridrain_write_behind')
+    if wbq is None or wbq.pid != os.getpid() or wbq._closed:
+        wbq = app.extensions['agridrain_write_behind'] = _create_queue(app)
+    return wbq
+
+
+def submit(row, app=None):
+    """Queue a submission; waits for its group commit when the ack mode is 'committed'.
+
+    Returns the new row id, or None when the ack mode is 'queued'.
+    """
+    app = app or current_app
+    ticket = get_queue(app).submit(row)
+    if app.config['WRITE_BEHIND_ACK'] == 'queued':
+        return None
+    return ticket.wait(app.config['WRITE_BEHIND_ACK_TIMEOUT_MS'] / 1000.0)
+
+
+def init_app(app):
+    for key, value in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, value)
+    if app.config['WRITE_BEHIND_ACK'] not in ACK_MODES:
+        raise ValueError(f"WRITE_BEHIND_ACK must be one of {', '.join(ACK_MODES)}")
@@ -0,0 +1,19 @@
+"""WSGI entry point for production servers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The schema is not migrated here. gunicorn.conf.py migrates once in the master
+process (or run ``flask migrate`` as a deploy step), so workers importing
+this module never take the schema lock. The read-only caches every worker
+would otherwise build on its first request are loaded here instead; with
+``preload_app`` that happens once in the master and the forked workers
+share the memory.
+"""
+import knowledge
+import scoring
+from app import create_app
+
+app = create_app({'AUTO_MIGRATE': False})
+
+knowledge.get_knowledge_base()
+scoring.get_engine()